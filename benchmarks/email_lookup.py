@@ -0,0 +1,84 @@
+"""
+Benchmark user lookups by email, as done by password grants.
+
+Seeds a test database with a large user table, and compares the time taken
+by `get_user_by_email` using the email column of the user table and using the
+indexed `UserEmail` table (`OAUTH_EMAIL_LOOKUP_INDEX`).
+
+Usage:
+
+    python benchmarks/email_lookup.py --users 200000 --lookups 500
+
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import argparse
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'tests.settings')
+
+import django  # pylint: disable=wrong-import-position
+django.setup()
+
+import mock  # pylint: disable=wrong-import-position
+from django.contrib.auth.models import User  # pylint: disable=wrong-import-position
+from django.db import connection  # pylint: disable=wrong-import-position
+
+from edx_oauth2_provider.forms import get_user_by_email  # pylint: disable=wrong-import-position
+from edx_oauth2_provider.models import UserEmail  # pylint: disable=wrong-import-position
+
+CHUNK_SIZE = 5000
+
+
+def seed(count):
+    """ Create `count` users, and their `UserEmail` rows. """
+    for start in range(0, count, CHUNK_SIZE):
+        stop = min(start + CHUNK_SIZE, count)
+        User.objects.bulk_create([
+            User(username='user_{}'.format(i), email='User_{}@Example.com'.format(i))
+            for i in range(start, stop)
+        ])
+
+    last_pk = 0
+    while True:
+        users = list(User.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', 'email')[:CHUNK_SIZE])
+        if not users:
+            break
+        last_pk = users[-1][0]
+        UserEmail.objects.bulk_create([UserEmail(user_id=pk, email=UserEmail.normalize(email)) for pk, email in users])
+
+
+def measure(emails, indexed):
+    """ Return the average time in milliseconds to look up each of `emails`. """
+    with mock.patch('edx_oauth2_provider.constants.EMAIL_LOOKUP_INDEX', indexed):
+        total = timeit.timeit(lambda: [get_user_by_email(email) for email in emails], number=1)
+    return 1000 * total / len(emails)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=200000, help='Number of users to seed.')
+    parser.add_argument('--lookups', type=int, default=500, help='Number of lookups to time.')
+    args = parser.parse_args()
+
+    connection.creation.create_test_db(verbosity=0)
+    try:
+        seed(args.users)
+
+        hits = ['User_{}@Example.com'.format(random.randrange(args.users)) for _ in range(args.lookups)]
+        misses = ['nobody_{}@example.com'.format(i) for i in range(args.lookups)]
+
+        print('{} users, {} lookups each'.format(args.users, args.lookups))
+        print('{:<24}{:>14}{:>14}'.format('', 'user table', 'UserEmail'))
+        for name, emails in (('existing email (ms)', hits), ('unknown email (ms)', misses)):
+            print('{:<24}{:>14.3f}{:>14.3f}'.format(name, measure(emails, False), measure(emails, True)))
+    finally:
+        connection.creation.destroy_test_db(connection.settings_dict['NAME'], verbosity=0)
+
+
+if __name__ == '__main__':
+    main()
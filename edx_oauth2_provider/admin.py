@@ -5,7 +5,7 @@ from __future__ import absolute_import, division, print_function, unicode_litera
 
 from django.contrib import admin
 
-from .models import TrustedClient
+from .models import ClientQuota, TrustedClient
 
 
 class TrustedClientAdmin(admin.ModelAdmin):
@@ -14,3 +14,11 @@ class TrustedClientAdmin(admin.ModelAdmin):
 
 
 admin.site.register(TrustedClient, TrustedClientAdmin)
+
+
+class ClientQuotaAdmin(admin.ModelAdmin):
+    "Django admin configuration for `ClientQuota` model"
+    list_display = ('client', 'requests', 'period')
+
+
+admin.site.register(ClientQuota, ClientQuotaAdmin)
@@ -0,0 +1,266 @@
+"""
+Asynchronous audit stream of token issuance and UserInfo access.
+
+Audit events are added to an in-process queue, holding up to
+`OAUTH_AUDIT_QUEUE_SIZE` events, and written by a background thread to the
+sink configured in `OAUTH_AUDIT_SINK`, so requests never wait for the sink.
+Events are written in batches of up to `OAUTH_AUDIT_BATCH_SIZE` events, at
+most `OAUTH_AUDIT_FLUSH_INTERVAL` seconds after they are queued.
+
+When the sink falls behind and the queue is full, events are dropped
+according to `OAUTH_AUDIT_DROP_POLICY`: 'newest' drops the new event, and
+'oldest' the oldest queued one. Dropped events, queue sizes and sink
+failures are counted, see :func:`stats`.
+
+Sinks are classes instantiated without arguments, with a `write` method
+receiving a list of events. Each event is a dictionary with the `event`
+name, its `timestamp`, and the fields of the event.
+
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import atexit
+import io
+import json
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from six.moves import queue  # pylint: disable=import-error
+
+from . import constants
+from .models import AuditEvent
+
+log = logging.getLogger(__name__)
+
+# Seconds to wait at exit for the background thread to write its last batch.
+CLOSE_TIMEOUT = 10
+
+
+class JsonLinesSink(object):
+    """ Appends events, one JSON object per line, to the file at `OAUTH_AUDIT_LOG_PATH`. """
+
+    def __init__(self, path=None):
+        self.path = path or constants.AUDIT_LOG_PATH
+
+    def write(self, events):
+        """ Append `events` to the file, with a single write. """
+        lines = ''.join(json.dumps(event, sort_keys=True, default=str) + '\n' for event in events)
+        with io.open(self.path, 'a', encoding='utf-8') as audit_file:
+            audit_file.write(lines)
+
+
+class DatabaseSink(object):
+    """ Inserts events in the `AuditEvent` table, with one query per batch. """
+
+    columns = ('event', 'client_id', 'user_id', 'scope', 'timestamp')
+
+    def write(self, events):
+        """ Insert `events` with a bulk insert. """
+        AuditEvent.objects.bulk_create([self.make_event(event) for event in events])
+
+    def make_event(self, event):
+        """ Return an unsaved `AuditEvent` for `event`. """
+        created = datetime.fromtimestamp(event['timestamp'], timezone.utc)
+        if not settings.USE_TZ:
+            created = timezone.make_naive(created)
+
+        return AuditEvent(
+            event=event['event'],
+            client_id=event.get('client_id') or '',
+            user_id=event.get('user_id'),
+            scope=event.get('scope') or '',
+            created=created,
+            data=json.dumps(
+                {key: value for key, value in event.items() if key not in self.columns}, sort_keys=True, default=str
+            ),
+        )
+
+
+class AuditStream(object):
+    """
+    Bounded queue of audit events, written to `sink` in batches.
+
+    Events are only written by the background thread once :meth:`start` is
+    called, or by :meth:`flush`. :meth:`close` stops the thread and writes
+    the remaining events.
+
+    """
+
+    def __init__(self, sink, maxsize, batch_size, interval, drop_policy='newest'):
+        self.sink = sink
+        self.batch_size = batch_size
+        self.interval = interval
+        self.drop_policy = drop_policy
+        self.queue = queue.Queue(maxsize)
+        self.counts = Counter()
+        self.lock = threading.Lock()
+        self.write_lock = threading.Lock()
+        self.stopping = threading.Event()
+        self.thread = None
+
+    def record(self, event):
+        """ Queue `event`, dropping an event if the queue is full. """
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            if self.drop_policy != 'oldest' or not self._replace_oldest(event):
+                self._count(dropped=1)
+                return
+
+        self._count(queued=1)
+        with self.lock:
+            self.counts['max_queue_size'] = max(self.counts['max_queue_size'], self.queue.qsize())
+
+    def _replace_oldest(self, event):
+        """ Drop the oldest queued event to queue `event`. Returns whether `event` was queued. """
+        try:
+            self.queue.get_nowait()
+        except queue.Empty:
+            pass
+        else:
+            self._count(dropped=1)
+
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            return False
+        return True
+
+    def start(self):
+        """ Start the background thread writing the queued events. """
+        self.thread = threading.Thread(target=self._run, name='oauth2-audit')
+        self.thread.daemon = True
+        self.thread.start()
+
+    def close(self, timeout=None):
+        """ Stop the background thread, once it wrote its current batch, and write the remaining events. """
+        self.stopping.set()
+        if self.thread is not None:
+            self.thread.join(timeout)
+        self.flush()
+
+    def flush(self):
+        """ Write all the queued events from the current thread. """
+        while True:
+            batch = self._next_batch(block=False)
+            if not batch:
+                break
+            self._write(batch)
+
+    def stats(self):
+        """
+        Return the counters of the stream: events `queued`, `written` and
+        `dropped`, events lost to sink `failures`, the number of `batches`
+        written, and the current and maximum queue sizes.
+
+        """
+        with self.lock:
+            counts = dict(self.counts)
+        counts['queue_size'] = self.queue.qsize()
+        return counts
+
+    def _run(self):
+        """ Write batches of queued events until the stream is closed. """
+        while not self.stopping.is_set():
+            batch = self._next_batch()
+            if batch:
+                try:
+                    self._write(batch)
+                finally:
+                    # Release the database connection of the thread, as request threads do.
+                    close_old_connections()
+
+    def _next_batch(self, block=True):
+        """
+        Return the next batch of events. If `block` is True, wait up to the
+        flush interval for a first event, and then for more events until the
+        batch is full or the flush interval has passed.
+
+        """
+        batch = []
+        deadline = None
+        while len(batch) < self.batch_size:
+            try:
+                if not block:
+                    batch.append(self.queue.get_nowait())
+                elif deadline is None:
+                    # Wake up regularly to check if the stream is closed.
+                    batch.append(self.queue.get(timeout=max(self.interval, 0.1)))
+                    deadline = time.time() + self.interval
+                else:
+                    batch.append(self.queue.get(timeout=max(deadline - time.time(), 0)))
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch):
+        """ Write a batch of events to the sink, counting the events lost to failures. """
+        with self.write_lock:
+            try:
+                self.sink.write(batch)
+            except Exception:  # pylint: disable=broad-except
+                log.exception('Failed to write %d OAuth2 audit events.', len(batch))
+                self._count(failures=len(batch))
+            else:
+                self._count(written=len(batch), batches=1)
+
+    def _count(self, **counts):
+        """ Add to the counters of the stream. """
+        with self.lock:
+            self.counts.update(counts)
+
+
+_stream = None
+_stream_pid = None
+_stream_lock = threading.Lock()
+
+
+def get_stream():
+    """ Return the audit stream of the current process, starting it if needed, or None if auditing is disabled. """
+    global _stream, _stream_pid  # pylint: disable=global-statement
+
+    if not constants.AUDIT_SINK:
+        return None
+
+    # Threads do not survive a fork, so each worker process starts its own stream.
+    if _stream is None or _stream_pid != os.getpid():
+        with _stream_lock:
+            if _stream is None or _stream_pid != os.getpid():
+                stream = AuditStream(
+                    import_string(constants.AUDIT_SINK)(),
+                    constants.AUDIT_QUEUE_SIZE,
+                    constants.AUDIT_BATCH_SIZE,
+                    constants.AUDIT_FLUSH_INTERVAL,
+                    constants.AUDIT_DROP_POLICY,
+                )
+                stream.start()
+                atexit.register(stream.close, CLOSE_TIMEOUT)
+                _stream, _stream_pid = stream, os.getpid()
+
+    return _stream
+
+
+def record_event(event, **fields):
+    """ Queue an audit `event` with the given fields, if auditing is enabled. """
+    stream = get_stream()
+    if stream is not None:
+        stream.record(dict(fields, event=event, timestamp=time.time()))
+
+
+def stats():
+    """ Return the counters of the audit stream, see :meth:`AuditStream.stats`. """
+    return _stream.stats() if _stream is not None else {}
+
+
+def flush():
+    """ Write the queued audit events. """
+    if _stream is not None:
+        _stream.flush()
@@ -4,9 +4,67 @@ OAuth2 provider `django-oauth2-provider` authentication backends
 """
 from __future__ import absolute_import, division, print_function, unicode_literals
 
+import base64
+import binascii
+
+from .clients import authenticate_client
 from .forms import PublicPasswordGrantForm
 
 
+def get_basic_credentials(request):
+    """ Return the client id and secret in the HTTP Basic authorization header, or None. """
+    auth = request.META.get('HTTP_AUTHORIZATION', '')
+
+    try:
+        scheme, encoded = auth.split(' ')
+        client_id, client_secret = base64.b64decode(encoded).decode('utf-8').split(':')
+    except (binascii.Error, TypeError, UnicodeDecodeError, ValueError):
+        return None
+
+    if scheme.lower() != 'basic':
+        return None
+
+    return client_id, client_secret
+
+
+class BasicClientBackend(object):
+    """
+    Client authentication backend using the HTTP Basic authorization header,
+    like `provider.oauth2.backends.BasicClientBackend`, but reading clients
+    through the client cache.
+
+    """
+
+    def authenticate(self, request=None):
+        """ Returns client if correctly authenticated. Otherwise returns None """
+
+        if request is None:
+            return None
+
+        credentials = get_basic_credentials(request)
+        if credentials is None:
+            return None
+
+        return authenticate_client(*credentials)
+
+
+class RequestParamsClientBackend(object):
+    """
+    Client authentication backend using the `client_id` and `client_secret`
+    POST parameters, like `provider.oauth2.backends.RequestParamsClientBackend`,
+    but reading clients through the client cache.
+
+    """
+
+    def authenticate(self, request=None):
+        """ Returns client if correctly authenticated. Otherwise returns None """
+
+        if request is None or request.method != 'POST':
+            return None
+
+        return authenticate_client(request.POST.get('client_id'), request.POST.get('client_secret'))
+
+
 class PublicPasswordBackend(object):
     """
     Simple client authentication wrapper backends that delegates to
@@ -0,0 +1,90 @@
+"""
+Cached lookups of OAuth2 clients.
+
+Clients are a small, read-mostly set of rows needed by every token request.
+They are kept in the Django cache, keyed by `client_id`, for
+`OAUTH_CLIENT_CACHE_TIMEOUT` seconds. Cached clients are invalidated when
+they are saved or deleted.
+
+When a client registry snapshot is configured, it is used before the cache,
+unless a client changed since it was written, see `edx_oauth2_provider.registry`.
+
+Client lookups missing from the cache always read the primary database, so a
+lagging read replica never fills the cache with stale clients.
+
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import hashlib
+
+from django.core.cache import cache
+from django.utils.crypto import constant_time_compare
+from django.utils.encoding import force_bytes
+from provider.oauth2.models import Client
+
+from . import constants, registry
+from .routers import use_read_replica
+
+# Bump when the cached representation of clients changes.
+CACHE_VERSION = 1
+
+CACHE_KEY = 'edx_oauth2_provider.client.{version}.{digest}'
+
+
+def get_client(client_id):
+    """ Return the :class:`Client` with the given `client_id`, or None if it does not exist. """
+    if not client_id:
+        return None
+
+    client_registry = registry.get_registry()
+    if client_registry is not None:
+        client = client_registry.get_client(client_id)
+        if client is not None:
+            return client
+
+    key = _cache_key(client_id)
+    client = cache.get(key)
+
+    if client is None:
+        try:
+            client = Client.objects.get(client_id=client_id)
+        except Client.DoesNotExist:
+            return None
+        cache.set(key, client, constants.CLIENT_CACHE_TIMEOUT)
+
+    return client
+
+
+def authenticate_client(client_id, client_secret):
+    """ Return the :class:`Client` matching `client_id` and `client_secret`, or None. """
+    client = get_client(client_id)
+
+    if client is None or not client_secret or not constant_time_compare(client.client_secret, client_secret):
+        return None
+
+    return client
+
+
+def is_trusted(client):
+    """ Return whether `client` is a trusted client, which does not require user consent. """
+    client_registry = registry.get_registry()
+    if client_registry is not None:
+        trusted = client_registry.is_trusted(client.client_id)
+        if trusted is not None:
+            return trusted
+
+    with use_read_replica():
+        return client.trustedclient_set.exists()
+
+
+def invalidate_client(client_id):
+    """ Remove the client with the given `client_id` from the cache, and mark the registry snapshot stale. """
+    if client_id:
+        cache.delete(_cache_key(client_id))
+        registry.mark_changed()
+
+
+def _cache_key(client_id):
+    """ Return the cache key of a client. Client ids are hashed, so any value is a valid key. """
+    digest = hashlib.sha1(force_bytes(client_id)).hexdigest()
+    return CACHE_KEY.format(version=CACHE_VERSION, digest=digest)
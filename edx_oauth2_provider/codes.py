@@ -0,0 +1,73 @@
+"""
+Self-contained authorization codes.
+
+Signed codes carry the client, user, scope, redirect URI and nonce of the
+authorization themselves, signed with the Django secret key, so they are
+never stored as `Grant` rows. They expire after `OAUTH_EXPIRE_CODE_DELTA`,
+like stored grants. Each code has a random identifier, added to the Django
+cache when the code is exchanged, so a code can only be used once as long
+as every process shares the same cache.
+
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+from django.core import signing
+from django.core.cache import cache
+from django.utils.crypto import get_random_string
+from provider.constants import EXPIRE_CODE_DELTA
+from provider.oauth2.models import Grant
+
+SALT = 'edx_oauth2_provider.codes'
+
+USED_CODE_CACHE_KEY = 'edx_oauth2_provider.used_code.{code_id}'
+
+
+def encode_code(grant):
+    """ Return a signed authorization code for an unsaved `grant`. """
+    data = {
+        'id': get_random_string(16),
+        'client': grant.client.client_id,
+        'user': grant.user.pk,
+        'scope': grant.scope,
+        'redirect_uri': grant.redirect_uri,
+        'nonce': grant.nonce,
+    }
+    return signing.dumps(data, salt=SALT, compress=True)
+
+
+def is_signed_code(code):
+    """ Return whether `code` is a signed code, rather than a stored grant code. """
+    # Stored grant codes are hexadecimal, and signed values always contain a separator.
+    return ':' in code
+
+
+def decode_code(code, client):
+    """
+    Return an unsaved `Grant` for a signed authorization code of `client`,
+    or None if the code is invalid, expired or was already used.
+
+    Using the code marks it as used.
+
+    """
+    max_age = EXPIRE_CODE_DELTA.total_seconds()
+
+    try:
+        data = signing.loads(code, salt=SALT, max_age=max_age)
+    except signing.BadSignature:
+        return None
+
+    if data['client'] != client.client_id:
+        return None
+
+    # Keep used codes until they would have expired anyway.
+    if not cache.add(USED_CODE_CACHE_KEY.format(code_id=data['id']), True, int(max_age) + 1):
+        return None
+
+    return Grant(
+        client=client,
+        user_id=data['user'],
+        code=code,
+        scope=data['scope'],
+        redirect_uri=data['redirect_uri'],
+        nonce=data['nonce'],
+    )
@@ -59,6 +59,28 @@ DEFAULT_USERINFO_HANDLERS = (
 ID_TOKEN_HANDLERS = getattr(settings, 'OAUTH_OIDC_ID_TOKEN_HANDLERS', DEFAULT_ID_TOKEN_HANDLERS)
 USERINFO_HANDLERS = getattr(settings, 'OAUTH_OIDC_USERINFO_HANDLERS', DEFAULT_USERINFO_HANDLERS)
 
+# Claim handlers marked as `independent` are evaluated concurrently in a
+# thread pool of at most this many workers. Zero disables concurrent
+# evaluation, so all handlers run one after another.
+HANDLER_MAX_WORKERS = getattr(settings, 'OAUTH_OIDC_HANDLER_MAX_WORKERS', 0)
+
+# Seconds to wait for an independent handler before dropping its claims.
+HANDLER_TIMEOUT = getattr(settings, 'OAUTH_OIDC_HANDLER_TIMEOUT', 5)
+
+# Time budgets, in seconds, for specific handlers, keyed by the dotted path
+# of the handler class. They override the `timeout` attribute of a handler.
+HANDLER_TIMEOUTS = getattr(settings, 'OAUTH_OIDC_HANDLER_TIMEOUTS', {})
+
+# Maximum number of parsed claims requests kept in memory, and maximum length
+# of the claims request parameter for it to be cached.
+CLAIMS_CACHE_SIZE = getattr(settings, 'OAUTH_OIDC_CLAIMS_CACHE_SIZE', 128)
+CLAIMS_CACHE_MAX_LENGTH = getattr(settings, 'OAUTH_OIDC_CLAIMS_CACHE_MAX_LENGTH', 4096)
+
+# Maximum number of memoized results of handler methods that do not depend on
+# the user, and seconds they are kept.
+HANDLER_CACHE_SIZE = getattr(settings, 'OAUTH_OIDC_HANDLER_CACHE_SIZE', 1024)
+HANDLER_CACHE_TIMEOUT = getattr(settings, 'OAUTH_OIDC_HANDLER_CACHE_TIMEOUT', 300)
+
 
 # Override django-oauth2-provider scopes (OAUTH_SCOPES)
 #
@@ -83,4 +105,110 @@ provider.scope.SCOPE_VALUE_DICT = SCOPE_VALUE_DICT
 provider.oauth2.forms.SCOPES = SCOPES
 provider.oauth2.forms.SCOPE_NAMES = SCOPE_NAMES
 
+# Seconds relying parties may cache the OpenID Connect discovery document.
+DISCOVERY_MAX_AGE = getattr(settings, 'OAUTH_OIDC_DISCOVERY_MAX_AGE', 24 * 60 * 60)
+
+# Seconds relying parties may cache UserInfo responses, bounded by the
+# remaining lifetime of the access token.
+USERINFO_MAX_AGE = getattr(settings, 'OAUTH_OIDC_USERINFO_MAX_AGE', 60)
+
+# Maximum number of users per request to the batch UserInfo endpoint.
+USERINFO_BATCH_MAX_SIZE = getattr(settings, 'OAUTH_OIDC_USERINFO_BATCH_MAX_SIZE', 1000)
+
+# Carry authorization requests between views in signed URL parameters,
+# instead of the session, and the number of seconds they are valid for.
+SIGNED_AUTHORIZATION_REQUESTS = getattr(settings, 'OAUTH_SIGNED_AUTHORIZATION_REQUESTS', False)
+SIGNED_AUTHORIZATION_REQUEST_MAX_AGE = getattr(settings, 'OAUTH_SIGNED_AUTHORIZATION_REQUEST_MAX_AGE', 10 * 60)
+
+# Issue signed authorization codes, checked without the grant table.
+SIGNED_AUTHORIZATION_CODES = getattr(settings, 'OAUTH_SIGNED_AUTHORIZATION_CODES', False)
+
+# Return cached tokens to client credentials grants, while they have more
+# than the minimum lifetime, in seconds, left.
+CLIENT_CREDENTIALS_TOKEN_REUSE = getattr(settings, 'OAUTH_CLIENT_CREDENTIALS_TOKEN_REUSE', False)
+CLIENT_CREDENTIALS_MIN_LIFETIME = getattr(settings, 'OAUTH_CLIENT_CREDENTIALS_MIN_LIFETIME', 60)
+
 AUTHORIZED_CLIENTS_SESSION_KEY = getattr(settings, 'OAUTH_OIDC_AUTHORIZED_CLIENTS_SESSION_KEY', 'authorized_clients')
+
+# Maximum number of authorized clients remembered in the session. The oldest
+# clients are forgotten first. If 0, no clients are remembered, and the single
+# sign-out page does not log the user out of any client.
+AUTHORIZED_CLIENTS_MAX = getattr(settings, 'OAUTH_OIDC_AUTHORIZED_CLIENTS_MAX', 50)
+
+# Seconds the single sign-out page waits for the client logout pages to load.
+LOGOUT_TIMEOUT = getattr(settings, 'OAUTH_OIDC_LOGOUT_TIMEOUT', 5)
+
+# Seconds OAuth2 clients are kept in the Django cache. Zero disables caching.
+CLIENT_CACHE_TIMEOUT = getattr(settings, 'OAUTH_CLIENT_CACHE_TIMEOUT', 300)
+
+# Path of the client registry snapshot written by the `compile_client_registry`
+# management command, and seconds between checks for a new snapshot.
+CLIENT_REGISTRY_PATH = getattr(settings, 'OAUTH_CLIENT_REGISTRY_PATH', None)
+CLIENT_REGISTRY_CHECK_INTERVAL = getattr(settings, 'OAUTH_CLIENT_REGISTRY_CHECK_INTERVAL', 5)
+
+# Permissions of the client registry snapshot, which holds the client secrets.
+# Only its owner can read it by default.
+CLIENT_REGISTRY_FILE_MODE = getattr(settings, 'OAUTH_CLIENT_REGISTRY_FILE_MODE', None)
+
+# Throttle password grants before checking any credentials. Each rate is a
+# `(capacity, period)` tuple: up to `capacity` attempts at once, refilled at
+# `capacity` attempts per `period` seconds. Scopes missing from the rates
+# are not throttled.
+THROTTLE_PASSWORD_GRANTS = getattr(settings, 'OAUTH_THROTTLE_PASSWORD_GRANTS', False)
+PASSWORD_GRANT_RATES = getattr(settings, 'OAUTH_PASSWORD_GRANT_RATES', {
+    'username': (10, 600),
+    'ip': (100, 60),
+})
+
+# Number of reverse proxies in front of the provider, each adding the
+# address of its client to `X-Forwarded-For`, or the dotted path of a
+# function returning the IP address of a request. By default, the address
+# is `REMOTE_ADDR`.
+TRUSTED_PROXY_COUNT = getattr(settings, 'OAUTH_TRUSTED_PROXY_COUNT', 0)
+CLIENT_IP_RESOLVER = getattr(settings, 'OAUTH_CLIENT_IP_RESOLVER', None)
+
+# Enforce per-client request quotas on the token and protected endpoints.
+# `CLIENT_QUOTA` is the `(requests, period)` default quota of every client,
+# or None for no default. Clients can be given their own quota with the
+# `ClientQuota` model.
+CLIENT_QUOTAS = getattr(settings, 'OAUTH_CLIENT_QUOTAS', False)
+CLIENT_QUOTA = getattr(settings, 'OAUTH_CLIENT_QUOTA', None)
+
+# Number of authentication failures of each reason logged every
+# `AUTH_FAILURE_LOG_INTERVAL` seconds. The others are only counted.
+AUTH_FAILURE_LOG_LIMIT = getattr(settings, 'OAUTH_AUTH_FAILURE_LOG_LIMIT', 10)
+AUTH_FAILURE_LOG_INTERVAL = getattr(settings, 'OAUTH_AUTH_FAILURE_LOG_INTERVAL', 60)
+
+# Database alias used by `routers.ReadReplicaRouter` for the reads of
+# read-only requests, and seconds newly issued tokens are only read from the
+# default database.
+READ_REPLICA_DATABASE = getattr(settings, 'OAUTH_READ_REPLICA_DATABASE', None)
+READ_YOUR_WRITES_WINDOW = getattr(settings, 'OAUTH_READ_YOUR_WRITES_WINDOW', 0)
+
+# Index new access tokens by a compact digest, and look them up with it.
+# Run the `sync_access_token_digests` management command after enabling it.
+# Every issued token then also inserts a row in the digest table.
+TOKEN_DIGEST_INDEX = getattr(settings, 'OAUTH_TOKEN_DIGEST_INDEX', False)
+
+# Look up the tokens missing from the digest table with the token column.
+# Disable it once `sync_access_token_digests` has run, so that invalid tokens
+# only cost the digest query.
+TOKEN_DIGEST_FALLBACK = getattr(settings, 'OAUTH_TOKEN_DIGEST_FALLBACK', True)
+
+# Look up users by email using the indexed `UserEmail` table, instead of the
+# unindexed email column of the user table. Run the `sync_user_emails`
+# management command after enabling it.
+EMAIL_LOOKUP_INDEX = getattr(settings, 'OAUTH_EMAIL_LOOKUP_INDEX', False)
+
+# Audit stream of token issuance and UserInfo access. `AUDIT_SINK` is the
+# dotted path of the sink class, and auditing is disabled without one.
+# Events are queued, up to the queue size, and written by a background
+# thread in batches, at most the flush interval, in seconds, after they are
+# queued. `AUDIT_DROP_POLICY` is either 'newest' or 'oldest', the event
+# dropped when the queue is full.
+AUDIT_SINK = getattr(settings, 'OAUTH_AUDIT_SINK', None)
+AUDIT_LOG_PATH = getattr(settings, 'OAUTH_AUDIT_LOG_PATH', None)
+AUDIT_QUEUE_SIZE = getattr(settings, 'OAUTH_AUDIT_QUEUE_SIZE', 10000)
+AUDIT_BATCH_SIZE = getattr(settings, 'OAUTH_AUDIT_BATCH_SIZE', 500)
+AUDIT_FLUSH_INTERVAL = getattr(settings, 'OAUTH_AUDIT_FLUSH_INTERVAL', 1)
+AUDIT_DROP_POLICY = getattr(settings, 'OAUTH_AUDIT_DROP_POLICY', 'newest')
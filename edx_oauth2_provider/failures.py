@@ -0,0 +1,112 @@
+"""
+Logging of authentication failures.
+
+Failed logins are expected in large numbers during credential stuffing
+attacks, so logging every one of them would amplify the attack. Failures are
+counted by reason, and only the first `OAUTH_AUTH_FAILURE_LOG_LIMIT` failures
+of each reason are logged in each `OAUTH_AUTH_FAILURE_LOG_INTERVAL` seconds.
+At the end of an interval the counts of all the failures, including the ones
+that were not logged, are logged in a summary, by a timer started with the
+first failure of the interval. The last counts are also logged when the
+process exits.
+
+Events are logged with the fields of the failure in the `oauth2_failure`
+attribute of the log record, for structured log handlers. The message is
+only formatted when a handler emits it.
+
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import atexit
+import json
+import logging
+import threading
+import time
+from collections import Counter
+
+from . import constants
+
+log = logging.getLogger(__name__)
+
+
+class LazyJson(object):
+    """ Log message argument formatted as JSON only when the message is emitted. """
+
+    def __init__(self, value):
+        self.value = value
+
+    def __str__(self):
+        return json.dumps(self.value, sort_keys=True, default=str)
+
+
+class FailureLog(object):
+    """ Per-reason failure counters, and the sampling of logged failures. """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.counts = Counter()
+        self.timer = None
+
+    def record(self, reason, fields, now=None):
+        """ Count a failure, and log it if its reason is within the log limit of the interval. """
+        now = time.time() if now is None else now
+
+        with self.lock:
+            if now - self.started >= constants.AUTH_FAILURE_LOG_INTERVAL:
+                self._flush(now)
+            self.counts[reason] += 1
+            sampled = self.counts[reason] <= constants.AUTH_FAILURE_LOG_LIMIT
+            self._schedule(now)
+
+        if sampled:
+            event = dict(fields, reason=reason)
+            log.warning('OAuth2 authentication failure: %s', LazyJson(event), extra={'oauth2_failure': event})
+
+    def flush(self, now=None):
+        """ Log the counts of the current interval, and start a new one. """
+        with self.lock:
+            self._flush(time.time() if now is None else now)
+
+    def _schedule(self, now):
+        """ Start a timer logging the counts at the end of the interval, if none is running. Needs the lock. """
+        if self.timer is None:
+            delay = max(self.started + constants.AUTH_FAILURE_LOG_INTERVAL - now, 0)
+            self.timer = threading.Timer(delay, self._on_timer)
+            self.timer.daemon = True
+            self.timer.start()
+
+    def _on_timer(self):
+        """ Log the counts if the interval ended, or wait for its end if a failure started a new one. """
+        with self.lock:
+            self.timer = None
+            now = time.time()
+            if now - self.started >= constants.AUTH_FAILURE_LOG_INTERVAL:
+                self._flush(now)
+            elif self.counts:
+                self._schedule(now)
+
+    def _flush(self, now):
+        """ Log and reset the counts. Must be called with the lock held. """
+        if self.counts:
+            counts = dict(self.counts)
+            log.info(
+                'OAuth2 authentication failures in the last %d seconds: %s',
+                now - self.started, LazyJson(counts), extra={'oauth2_failure_counts': counts}
+            )
+        self.counts.clear()
+        self.started = now
+
+
+_failure_log = FailureLog()
+
+
+def record_failure(reason, **fields):
+    """ Record an authentication failure for `reason`, with the given fields. """
+    _failure_log.record(reason, fields)
+
+
+@atexit.register
+def flush():
+    """ Log the failure counts collected so far. """
+    _failure_log.flush()
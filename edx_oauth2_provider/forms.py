@@ -3,8 +3,6 @@ OAuth2 provider customized `django-oauth2-provider` forms.
 """
 from __future__ import absolute_import, division, print_function, unicode_literals
 
-import logging
-
 from django.contrib.auth import authenticate
 from django.contrib.auth.models import User
 
@@ -12,11 +10,13 @@ import provider.constants
 import provider.oauth2.forms
 from provider.forms import OAuthValidationError
 from provider.oauth2.forms import ScopeChoiceField
-from provider.oauth2.models import Client
 
+from . import constants
+from .clients import get_client
+from .codes import decode_code, is_signed_code
 from .constants import SCOPE_NAMES
-
-log = logging.getLogger(__name__)
+from .failures import record_failure
+from .models import UserEmail
 
 
 # The following forms override the scope field to use the SCOPE_NAMES
@@ -48,6 +48,39 @@ class AuthorizationCodeGrantForm(provider.oauth2.forms.AuthorizationCodeGrantFor
         super(AuthorizationCodeGrantForm, self).__init__(*args, **kwargs)
         self.fields['scope'] = ScopeChoiceField(choices=SCOPE_NAMES, required=False)
 
+    def clean_code(self):
+        # Signed codes are checked without any grant table queries.
+        code = self.cleaned_data.get('code')
+
+        if not (constants.SIGNED_AUTHORIZATION_CODES and code and is_signed_code(code)):
+            return super(AuthorizationCodeGrantForm, self).clean_code()
+
+        grant = decode_code(code, self.client)
+        if grant is None:
+            raise OAuthValidationError({'error': 'invalid_grant'})
+
+        self.cleaned_data['grant'] = grant
+        return code
+
+
+class ClientCredentialsGrantForm(provider.oauth2.forms.ClientCredentialsGrantForm):
+    def __init__(self, *args, **kwargs):
+        super(ClientCredentialsGrantForm, self).__init__(*args, **kwargs)
+        self.fields['scope'] = ScopeChoiceField(choices=SCOPE_NAMES, required=False)
+
+    def clean_scope(self):
+        # Use the requested scopes, or the default scopes of the parent form.
+        # Requests are limited to the default scopes, which are the only ones
+        # client credentials grants were ever given.
+        allowed = super(ClientCredentialsGrantForm, self).clean_scope()
+        if not self.cleaned_data.get('scope'):
+            return allowed
+
+        scope = provider.oauth2.forms.ScopeMixin.clean_scope(self)
+        if scope & ~allowed:
+            raise OAuthValidationError({'error': 'invalid_scope'})
+        return scope
+
 
 # pylint: enable=missing-docstring,no-member
 
@@ -60,6 +93,22 @@ class AuthorizationCodeGrantForm(provider.oauth2.forms.AuthorizationCodeGrantFor
 # `AUTHENTICATION_BACKENDS` in the Django settings.
 
 
+def get_user_by_email(email):
+    """
+    Return the user with the given email address, or None if not found.
+
+    Uses the indexed, case-insensitive `UserEmail` table when
+    `OAUTH_EMAIL_LOOKUP_INDEX` is enabled.
+    """
+    if constants.EMAIL_LOOKUP_INDEX:
+        return UserEmail.get_user(email)
+
+    try:
+        return User.objects.get(email=email)
+    except User.DoesNotExist:
+        return None
+
+
 class PasswordGrantForm(provider.oauth2.forms.PasswordGrantForm):
     """
     Forms that validates the user email to be used as secondary user
@@ -76,11 +125,9 @@ class PasswordGrantForm(provider.oauth2.forms.PasswordGrantForm):
         # the email address. It is valid because the edx-platform has
         # a unique constraint placed on the email field.
         if user is None:
-            try:
-                user_obj = User.objects.get(email=username)
+            user_obj = get_user_by_email(username)
+            if user_obj is not None:
                 user = authenticate(username=user_obj.username, password=password)
-            except User.DoesNotExist:
-                user = None
 
         if user is None:
             # TODO This is a temporary workaround while the is_active field on the
@@ -88,10 +135,10 @@ class PasswordGrantForm(provider.oauth2.forms.PasswordGrantForm):
             # of their claimed email address.  Once is_active is decoupled from
             # verified_email, add the following condition to the 'if' statement above.
             # or not user.is_active
+            record_failure('invalid_credentials', username=username)
             error_description = "Username does not exist or invalid credentials given for username '{}'.".format(
                 username
             )
-            log.error("OAuth2: {}".format(error_description))
             raise OAuthValidationError({
                 'error': 'invalid_grant',
                 'error_description': error_description
@@ -107,24 +154,27 @@ class PublicPasswordGrantForm(PasswordGrantForm, provider.oauth2.forms.PublicPas
     during client authentication.
     """
     def clean(self):
-        data = super(PublicPasswordGrantForm, self).clean()
+        # Check the client before the user credentials, so requests with an
+        # invalid client do not pay for hashing the password.
+        data = self.cleaned_data  # pylint: disable=no-member
 
-        try:
-            client = Client.objects.get(client_id=data.get('client_id'))
-        except Client.DoesNotExist:
+        client = get_client(data.get('client_id'))
+        if client is None:
+            record_failure('unknown_client', client_id=data.get('client_id'))
             error_description = "Client ID '{}' does not exist.".format(data.get('client_id'))
-            log.exception("OAuth2: {}".format(error_description))
             raise OAuthValidationError({
                 'error': 'invalid_client',
                 'error_description': error_description
             })
 
         if client.client_type != provider.constants.PUBLIC:
+            record_failure('confidential_client', client_id=client.client_id)
             error_description = "'{}' is not a public client.".format(client.client_type)
-            log.error("OAuth2: {}".format(error_description))
             raise OAuthValidationError({
                 'error': 'invalid_client',
                 'error_description': error_description
             })
+
+        data = super(PublicPasswordGrantForm, self).clean()
         data['client'] = client
         return data
@@ -0,0 +1,40 @@
+"""
+Management command used to write the client registry snapshot.
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+from django.core.management.base import BaseCommand, CommandError
+from provider.oauth2.models import Client
+
+from ... import constants
+from ...models import TrustedClient
+from ...registry import get_or_create_version, write_registry
+
+
+class Command(BaseCommand):
+    """
+    compile_client_registry command class
+    """
+    help = ('Write all the OAuth2 clients, and whether they are trusted, to a memory-mapped snapshot shared by '
+            'the worker processes. Run it again after changing clients.')
+
+    def add_arguments(self, parser):
+        super(Command, self).add_arguments(parser)
+
+        parser.add_argument(
+            '--path',
+            default=constants.CLIENT_REGISTRY_PATH,
+            help="Path of the snapshot file. Defaults to OAUTH_CLIENT_REGISTRY_PATH."
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not path:
+            raise CommandError('Set OAUTH_CLIENT_REGISTRY_PATH or use the --path option.')
+
+        # Changes made while the clients are read replace the version, so they make the snapshot stale.
+        version = get_or_create_version()
+        trusted_ids = set(TrustedClient.objects.values_list('client_id', flat=True))
+        count = write_registry(path, Client.objects.order_by('pk').iterator(), trusted_ids, version)
+
+        self.stdout.write('Wrote {} clients to {}.'.format(count, path))
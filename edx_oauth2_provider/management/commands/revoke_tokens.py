@@ -0,0 +1,57 @@
+"""
+Management command used to revoke the tokens of a user, a client, or both.
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from provider.oauth2.models import Client
+
+from ...tokens import revoke_tokens
+
+
+class Command(BaseCommand):
+    """
+    revoke_tokens command class
+    """
+    help = 'Revoke all the active access and refresh tokens of a user, a client, or both.'
+
+    def add_arguments(self, parser):
+        super(Command, self).add_arguments(parser)
+
+        parser.add_argument(
+            '--username',
+            help="Username of the user whose tokens are revoked."
+        )
+        parser.add_argument(
+            '--client_id',
+            help="Client ID of the client whose tokens are revoked."
+        )
+        parser.add_argument(
+            '--chunk_size',
+            type=int,
+            default=1000,
+            help="Number of tokens revoked at a time."
+        )
+
+    def handle(self, *args, **options):
+        user = client = None
+
+        if not options['username'] and not options['client_id']:
+            raise CommandError("A username or a client ID is required.")
+
+        if options['username']:
+            user_model = get_user_model()
+            try:
+                user = user_model.objects.get(username=options['username'])
+            except user_model.DoesNotExist:
+                raise CommandError("User matching the provided username does not exist.")
+
+        if options['client_id']:
+            try:
+                client = Client.objects.get(client_id=options['client_id'])
+            except Client.DoesNotExist:
+                raise CommandError("Client matching the provided client ID does not exist.")
+
+        access_count, refresh_count = revoke_tokens(user, client, chunk_size=options['chunk_size'])
+        self.stdout.write('Revoked {} access tokens and {} refresh tokens.'.format(access_count, refresh_count))
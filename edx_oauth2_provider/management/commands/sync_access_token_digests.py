@@ -0,0 +1,55 @@
+"""
+Management command used to populate the `AccessTokenDigest` table.
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+from django.core.management.base import BaseCommand
+from provider.oauth2.models import AccessToken
+
+from ...models import AccessTokenDigest
+
+
+class Command(BaseCommand):
+    """
+    sync_access_token_digests command class
+    """
+    help = ('Add the digest of every access token missing from the AccessTokenDigest table. Run it after '
+            'enabling OAUTH_TOKEN_DIGEST_INDEX.')
+
+    def add_arguments(self, parser):
+        super(Command, self).add_arguments(parser)
+
+        parser.add_argument(
+            '--chunk_size',
+            type=int,
+            default=1000,
+            help="Number of access tokens read from the database at a time."
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+
+        created = 0
+        last_pk = 0
+        while True:
+            tokens = list(
+                AccessToken.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', 'token')[:chunk_size]
+            )
+            if not tokens:
+                break
+            last_pk = tokens[-1][0]
+
+            existing = set(
+                AccessTokenDigest.objects.filter(
+                    access_token_id__in=[pk for pk, _token in tokens]
+                ).values_list('access_token_id', flat=True)
+            )
+
+            missing = [
+                AccessTokenDigest(access_token_id=pk, digest=AccessTokenDigest.digest_for(token))
+                for pk, token in tokens if pk not in existing
+            ]
+            AccessTokenDigest.objects.bulk_create(missing)
+            created += len(missing)
+
+        self.stdout.write('Created {} access token digests.'.format(created))
@@ -0,0 +1,59 @@
+"""
+Management command used to populate the indexed `UserEmail` table.
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from ...models import UserEmail
+
+
+class Command(BaseCommand):
+    """
+    sync_user_emails command class
+    """
+    help = ('Add the normalized email of every user to the indexed UserEmail table, and update the ones '
+            'that changed. Run it after enabling OAUTH_EMAIL_LOOKUP_INDEX.')
+
+    def add_arguments(self, parser):
+        super(Command, self).add_arguments(parser)
+
+        parser.add_argument(
+            '--chunk_size',
+            type=int,
+            default=1000,
+            help="Number of users read from the database at a time."
+        )
+
+    def handle(self, *args, **options):
+        user_model = get_user_model()
+        chunk_size = options['chunk_size']
+
+        created = updated = 0
+        last_pk = 0
+        while True:
+            users = list(
+                user_model.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', 'email')[:chunk_size]
+            )
+            if not users:
+                break
+            last_pk = users[-1][0]
+
+            existing = dict(
+                UserEmail.objects.filter(user_id__in=[pk for pk, _email in users]).values_list('user_id', 'email')
+            )
+
+            missing = []
+            for pk, email in users:
+                email = UserEmail.normalize(email)
+                if pk not in existing:
+                    missing.append(UserEmail(user_id=pk, email=email))
+                elif existing[pk] != email:
+                    UserEmail.objects.filter(user_id=pk).update(email=email)
+                    updated += 1
+
+            UserEmail.objects.bulk_create(missing)
+            created += len(missing)
+
+        self.stdout.write('Created {} and updated {} user emails.'.format(created, updated))
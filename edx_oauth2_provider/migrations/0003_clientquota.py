@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from __future__ import absolute_import
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('oauth2', '0001_initial'),
+        ('edx_oauth2_provider', '0002_useremail'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClientQuota',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('requests', models.PositiveIntegerField()),
+                ('period', models.PositiveIntegerField(default=60)),
+                ('client', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='oauth2.Client')),
+            ],
+            options={
+                'db_table': 'oauth2_provider_clientquota',
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from __future__ import absolute_import
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('oauth2', '0001_initial'),
+        ('edx_oauth2_provider', '0003_clientquota'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AccessTokenDigest',
+            fields=[
+                ('access_token', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='digest_index', serialize=False, to='oauth2.AccessToken')),
+                ('digest', models.BigIntegerField(db_index=True)),
+            ],
+            options={
+                'db_table': 'oauth2_provider_accesstokendigest',
+            },
+        ),
+    ]
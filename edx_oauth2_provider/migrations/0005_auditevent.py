@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from __future__ import absolute_import
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('edx_oauth2_provider', '0004_accesstokendigest'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuditEvent',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event', models.CharField(max_length=32)),
+                ('client_id', models.CharField(blank=True, max_length=255)),
+                ('user_id', models.IntegerField(null=True)),
+                ('scope', models.CharField(blank=True, max_length=255)),
+                ('created', models.DateTimeField(db_index=True)),
+                ('data', models.TextField(blank=True)),
+            ],
+            options={
+                'db_table': 'oauth2_provider_auditevent',
+            },
+        ),
+    ]
@@ -3,13 +3,21 @@ Custom OAuth2 models
 """
 from __future__ import absolute_import, division, print_function, unicode_literals
 
+import hashlib
+import struct
+
+from django.conf import settings
+from django.core.cache import cache
 from django.db import models
-from django.utils.encoding import python_2_unicode_compatible
-from provider.oauth2.models import Client
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils.crypto import constant_time_compare
+from django.utils.encoding import force_bytes, python_2_unicode_compatible
+from provider.oauth2.models import AccessToken, Client
 
 # Import constants to force override of `provider.scope`
 # See constants.py for explanation
-from . import constants  # pylint: disable=unused-import
+from . import clients, constants, registry, tokens
 
 
 @python_2_unicode_compatible
@@ -28,3 +36,205 @@ class TrustedClient(models.Model):
 
     def __str__(self):
         return "{}".format(self.client)
+
+
+@python_2_unicode_compatible
+class UserEmail(models.Model):
+    """
+    Normalized copy of the email address of each user.
+
+    `auth_user.email` is not indexed, so looking up users by email during
+    password grants scans the whole user table. When the setting
+    `OAUTH_EMAIL_LOOKUP_INDEX` is enabled, this table is kept in sync with
+    the user table and used for case-insensitive, indexed lookups instead.
+    Existing users can be added with the `sync_user_emails` command.
+
+    """
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, related_name='+', on_delete=models.CASCADE)
+    email = models.CharField(max_length=254, db_index=True)
+
+    class Meta(object):
+        db_table = 'oauth2_provider_useremail'
+
+    def __str__(self):
+        return self.email
+
+    @staticmethod
+    def normalize(email):
+        """ Return the form of `email` used for lookups. """
+        return (email or '').strip().lower()
+
+    @classmethod
+    def get_user(cls, email):
+        """ Return the user with the given email, or None if there isn't exactly one. """
+        matches = list(cls.objects.select_related('user').filter(email=cls.normalize(email))[:2])
+        return matches[0].user if len(matches) == 1 else None
+
+
+@python_2_unicode_compatible
+class ClientQuota(models.Model):
+    """
+    Request quota of a client, overriding the default `OAUTH_CLIENT_QUOTA`.
+
+    A client may make up to `requests` requests to the token and protected
+    endpoints over any `period` seconds. A quota of zero requests leaves the
+    client unlimited.
+
+    """
+    CACHE_KEY = 'edx_oauth2_provider.client_quota.{pk}'
+
+    client = models.OneToOneField(Client, related_name='+', on_delete=models.CASCADE)
+    requests = models.PositiveIntegerField()
+    period = models.PositiveIntegerField(default=60)
+
+    class Meta(object):
+        db_table = 'oauth2_provider_clientquota'
+
+    def __str__(self):
+        return "{}: {} requests per {} seconds".format(self.client, self.requests, self.period)
+
+    @classmethod
+    def get_limit(cls, client):
+        """
+        Return the `(requests, period)` quota of `client`, or None if it is unlimited.
+
+        Overrides are kept in the Django cache, like the clients themselves.
+
+        """
+        key = cls.CACHE_KEY.format(pk=client.pk)
+        limit = cache.get(key)
+
+        if limit is None:
+            quota = cls.objects.filter(client_id=client.pk).values_list('requests', 'period').first()
+            limit = quota or constants.CLIENT_QUOTA or ()
+            cache.set(key, tuple(limit), constants.CLIENT_CACHE_TIMEOUT)
+
+        if not limit or not limit[0]:
+            return None
+        return tuple(limit)
+
+
+class AccessTokenDigest(models.Model):
+    """
+    Compact lookup key of an access token.
+
+    Access tokens are indexed by their full `token` column, a wide varchar.
+    When `OAUTH_TOKEN_DIGEST_INDEX` is enabled, the first 8 bytes of the
+    SHA-256 digest of each new token are stored here, in a fixed-width
+    integer index, and used to look tokens up. Digests are not unique, so the
+    matching tokens are still compared with the requested one. Existing
+    tokens can be added with the `sync_access_token_digests` command.
+
+    """
+    access_token = models.OneToOneField(
+        AccessToken, primary_key=True, related_name='digest_index', on_delete=models.CASCADE
+    )
+    digest = models.BigIntegerField(db_index=True)
+
+    class Meta(object):
+        db_table = 'oauth2_provider_accesstokendigest'
+
+    @staticmethod
+    def digest_for(token):
+        """ Return the digest of a `token` string, as a signed 64-bit integer. """
+        return struct.unpack(str('>q'), hashlib.sha256(force_bytes(token)).digest()[:8])[0]
+
+    @classmethod
+    def get_access_token(cls, token, queryset=None):
+        """ Return the access token matching `token` in `queryset`, using the digest index, or None. """
+        queryset = AccessToken.objects.all() if queryset is None else queryset
+        for access_token in queryset.filter(digest_index__digest=cls.digest_for(token)):
+            if constant_time_compare(access_token.token, token):
+                return access_token
+        return None
+
+
+@python_2_unicode_compatible
+class AuditEvent(models.Model):
+    """
+    Token issuance or UserInfo access, written by `audit.DatabaseSink`.
+
+    Fields of the event without a column of their own are kept as JSON in `data`.
+
+    """
+    event = models.CharField(max_length=32)
+    client_id = models.CharField(max_length=255, blank=True)
+    user_id = models.IntegerField(null=True)
+    scope = models.CharField(max_length=255, blank=True)
+    created = models.DateTimeField(db_index=True)
+    data = models.TextField(blank=True)
+
+    class Meta(object):
+        db_table = 'oauth2_provider_auditevent'
+
+    def __str__(self):
+        return "{} {} {}".format(self.event, self.client_id, self.user_id)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def sync_user_email(sender, instance, created, update_fields=None, **kwargs):  # pylint: disable=unused-argument
+    """ Keep the normalized email of a user in sync with the user table. """
+    if not constants.EMAIL_LOOKUP_INDEX:
+        return
+
+    # Most user saves, like the `last_login` update done on every login,
+    # don't touch the email.
+    if update_fields is not None and 'email' not in update_fields:
+        return
+
+    email = UserEmail.normalize(instance.email)
+    if created:
+        UserEmail.objects.create(user=instance, email=email)
+    else:
+        UserEmail.objects.update_or_create(user=instance, defaults={'email': email})
+
+
+@receiver(pre_save, sender=Client)
+def invalidate_renamed_client(sender, instance, **kwargs):  # pylint: disable=unused-argument
+    """ Remove a client from the cache under its previous `client_id`, if it is being changed. """
+    if instance.pk is not None:
+        previous = Client.objects.filter(pk=instance.pk).values_list('client_id', flat=True).first()
+        if previous != instance.client_id:
+            clients.invalidate_client(previous)
+
+
+@receiver(post_save, sender=Client)
+@receiver(post_delete, sender=Client)
+def invalidate_client(sender, instance, **kwargs):  # pylint: disable=unused-argument
+    """ Remove a client from the cache when it changes. """
+    clients.invalidate_client(instance.client_id)
+
+
+@receiver(post_save, sender=TrustedClient)
+@receiver(post_delete, sender=TrustedClient)
+def invalidate_trusted_client(sender, instance, **kwargs):  # pylint: disable=unused-argument
+    """ Mark the client registry snapshot stale when the trusted clients change. """
+    registry.mark_changed()
+
+
+@receiver(post_save, sender=ClientQuota)
+@receiver(post_delete, sender=ClientQuota)
+def invalidate_client_quota(sender, instance, **kwargs):  # pylint: disable=unused-argument
+    """ Remove the quota of a client from the cache when it changes. """
+    cache.delete(ClientQuota.CACHE_KEY.format(pk=instance.client_id))
+
+
+@receiver(post_save, sender=AccessToken)
+def index_access_token(sender, instance, created, **kwargs):  # pylint: disable=unused-argument
+    """ Store the digest of new access tokens. """
+    if created and constants.TOKEN_DIGEST_INDEX:
+        AccessTokenDigest.objects.create(access_token=instance, digest=AccessTokenDigest.digest_for(instance.token))
+
+
+@receiver(post_save, sender=AccessToken)
+@receiver(post_delete, sender=AccessToken)
+def evict_reusable_access_token(sender, instance, created=False, **kwargs):  # pylint: disable=unused-argument
+    """
+    Remove the cached client credentials tokens of a client when one of its tokens is changed or deleted.
+
+    Tokens deleted by `tokens.revoke_tokens` are skipped, since it removes the
+    cached tokens once per client.
+
+    """
+    if not created and constants.CLIENT_CREDENTIALS_TOKEN_REUSE and not tokens.revoking_tokens():
+        tokens.evict_reusable_tokens(instance.client_id)
@@ -3,4 +3,5 @@ OpenID Connect utilities.
 
 """
 
-from .core import IDToken, id_token, userinfo
+from .collect import ClaimTimeoutError, parse_claims_request
+from .core import IDToken, claims_supported, id_token, userinfo, userinfo_batch
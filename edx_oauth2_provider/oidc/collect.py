@@ -9,14 +9,210 @@ None: The functions in this module assume the `openid` scope is implied.
 # pylint: disable=missing-docstring
 from __future__ import absolute_import, division, print_function, unicode_literals
 
+import copy
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent import futures
+
 import provider.scope
 import six
+from django.db import close_old_connections
+
+from .. import constants
+from ..routers import reading_from_replica, use_read_replica
+from .handlers import CLIENT, STATIC, USER
+
+log = logging.getLogger(__name__)
 
 REQUIRED_SCOPES = ['openid']
 
 CLAIM_REQUEST_FIELDS = ['value', 'values', 'essential']
 
 
+class ClaimTimeoutError(Exception):
+    """ Raised when the handlers for an essential claim exceed their time budget. """
+
+
+class ClaimsRequest(dict):
+    """
+    Immutable dictionary holding a validated claims request, or a section of one.
+
+    Instances are shared between requests by :func:`parse_claims_request`,
+    so they must not be modified.
+
+    """
+
+    def _immutable(self, *args, **kwargs):
+        raise TypeError('ClaimsRequest objects are immutable.')
+
+    __setitem__ = __delitem__ = clear = pop = popitem = setdefault = update = _immutable
+
+    def __reduce__(self):
+        return (type(self), (dict(self),))
+
+
+class _LRUCache(object):
+    """
+    Thread-safe dictionary keeping at most `maxsize` of the most recently used entries.
+
+    If `timeout` is set, entries also expire that many seconds after they are set.
+
+    """
+
+    def __init__(self, maxsize, timeout=None):
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value, expires = self._data.pop(key)
+            except KeyError:
+                return default
+            if expires is not None and expires <= time.time():
+                return default
+            self._data[key] = (value, expires)
+            return value
+
+    def set(self, key, value):
+        if self.maxsize <= 0:
+            return
+        expires = time.time() + self.timeout if self.timeout is not None else None
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = (value, expires)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        """ Return the number of entries that did not expire. """
+        now = time.time()
+        with self._lock:
+            return sum(1 for _value, expires in six.itervalues(self._data) if expires is None or expires > now)
+
+
+_claims_cache = _LRUCache(constants.CLAIMS_CACHE_SIZE)
+
+# Results of handler methods that do not depend on the user.
+_results_cache = _LRUCache(constants.HANDLER_CACHE_SIZE, constants.HANDLER_CACHE_TIMEOUT)
+
+_MISSING = object()
+
+
+def parse_claims_request(claims_string):
+    """
+    Parse the JSON `claims` request parameter.
+
+    Returns a :class:`ClaimsRequest` with its `userinfo` and `id_token`
+    sections already validated. Results are cached by the raw string, since
+    clients usually send the same few claims requests, so the parsing and
+    validation is only done once per distinct request. Strings longer than
+    `OAUTH_OIDC_CLAIMS_CACHE_MAX_LENGTH` are never cached.
+
+    Raises ValueError if `claims_string` is not a valid JSON object.
+
+    """
+    if not claims_string:
+        return ClaimsRequest()
+
+    if len(claims_string) > constants.CLAIMS_CACHE_MAX_LENGTH:
+        return _parse_claims_request(claims_string)
+
+    claims_request = _claims_cache.get(claims_string)
+    if claims_request is None:
+        claims_request = _parse_claims_request(claims_string)
+        _claims_cache.set(claims_string, claims_request)
+
+    return claims_request
+
+
+def _parse_claims_request(claims_string):
+    """ Helper for `parse_claims_request` """
+    claims = json.loads(claims_string)
+    if not isinstance(claims, dict):
+        raise ValueError('Invalid claims request.')
+
+    results = {}
+    for section, value in six.iteritems(claims):
+        try:
+            results[section] = _validate_claim_request(value)
+        except (AttributeError, ValueError):
+            # Keep the invalid section as is, so it only fails when it is used.
+            results[section] = value
+
+    return ClaimsRequest(results)
+
+
+class HandlerIndex(object):
+    """
+    Scopes and claims declared by a list of handler classes.
+
+    Attributes:
+        scopes (dict): Claim names of each scope declared in the `scope_claims`
+            attribute of the handlers, merged across handlers.
+        claims (set): Names of all the claims of the handlers, declared or
+            provided by a claim method.
+
+    """
+
+    def __init__(self, handlers):
+        self.scopes = {}
+        self.claims = set()
+
+        for cls in handlers:
+            for scope, names in six.iteritems(getattr(cls, 'scope_claims', None) or {}):
+                # Scope methods take precedence over declared claims, unless
+                # they only return the declaration.
+                method = _get_method(cls, 'scope', scope)
+                if method is None or getattr(method, 'declared', False) is True:
+                    self.scopes.setdefault(scope, set()).update(names)
+                self.claims.update(names)
+            self.claims.update(name[len('claim_'):] for name in dir(cls) if name.startswith('claim_'))
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def compile_index(handlers):
+    """ Return the :class:`HandlerIndex` of a list of handler classes, compiling it only once. """
+    key = tuple(handlers)
+    index = _indexes.get(key)
+
+    if index is None:
+        index = HandlerIndex(key)
+        with _indexes_lock:
+            _indexes[key] = index
+        _check_budgets(key)
+
+    return index
+
+
+def _check_budgets(handlers):
+    """ Warn about the time budgets of `handlers` that can't be enforced without the handler thread pool. """
+    if constants.HANDLER_MAX_WORKERS > 0:
+        return
+
+    names = [
+        cls.__name__ for cls in handlers
+        if _get_path(cls) in constants.HANDLER_TIMEOUTS or getattr(cls, 'timeout', None) is not None
+    ]
+    if names:
+        log.warning(
+            'OIDC claim handlers %s have a time budget, which is ignored unless '
+            'OAUTH_OIDC_HANDLER_MAX_WORKERS is set.', ', '.join(names)
+        )
+
+
 def collect(handlers, access_token, scope_request=None, claims_request=None):
     """
     Collect all the claims values from the `handlers`.
@@ -34,21 +230,71 @@ def collect(handlers, access_token, scope_request=None, claims_request=None):
     `claims_request`.
 
     """
-    user = access_token.user
-    client = access_token.client
+    # Claims declared by the handlers are read from their index, without
+    # calling any scope methods.
+
+    index = compile_index(handlers)
 
     # Instantiate handlers. Each handler is instanciated only once, allowing the
     # handler to keep state in-between calls to its scope and claim methods.
 
     handlers = [cls() for cls in handlers]
 
+    return _collect(
+        handlers,
+        index,
+        access_token.user,
+        access_token.client,
+        provider.scope.to_names(access_token.scope),
+        scope_request,
+        claims_request,
+    )
+
+
+def collect_batch(handlers, users, client, token_scope, scope_request=None):
+    """
+    Collect the claims values from the `handlers` for a batch of users.
+
+    Arguments:
+      handlers (list): List of claim :class:`Handler` classes.
+      users (list): Users to collect the claims of.
+      client (:class:`Client`): Client requesting the claims.
+      token_scope (int): Scope authorized to the client, as in an access token.
+      scope_request (list): List of requested scopes.
+
+    Handlers with a `prefetch` method are instantiated once for the whole
+    batch, and their `prefetch` method is called first with a dictionary of
+    the `users` and the `client`, so they can load the data of all the users
+    at once. Other handlers are instantiated once per user, as in :func:`collect`.
+
+    Yields a tuple of the user, its authorized scopes and its claims, for each user.
+
+    """
+    index = compile_index(handlers)
+    token_scopes = provider.scope.to_names(token_scope)
+
+    shared = {}
+    for cls in handlers:
+        if hasattr(cls, 'prefetch'):
+            shared[cls] = cls()
+            shared[cls].prefetch({'users': users, 'client': client})
+
+    for user in users:
+        instances = [shared[cls] if cls in shared else cls() for cls in handlers]
+        scopes, claims = _collect(instances, index, user, client, token_scopes, scope_request, None)
+        yield user, scopes, claims
+
+
+def _collect(handlers, index, user, client, token_scopes, scope_request, claims_request):
+    """ Collect the scopes and claims values from handler instances. See :func:`collect`. """
+
     # Find all authorized scopes by including the access_token scopes.  Note
     # that the handlers determine if a scope is authorized, not its presense in
     # the access_token.
 
     required_scopes = set(REQUIRED_SCOPES)
-    token_scopes = set(provider.scope.to_names(access_token.scope))
-    authorized_scopes = _collect_scopes(handlers, required_scopes | token_scopes, user, client)
+    token_scopes = set(token_scopes)
+    authorized_scopes = _collect_scopes(handlers, required_scopes | token_scopes, user, client, index)
 
     # Select only the authorized scopes from the requested scopes.
 
@@ -57,7 +303,7 @@ def collect(handlers, access_token, scope_request=None, claims_request=None):
 
     # Find all authorized claims names for the authorized_scopes.
 
-    authorized_names = _collect_names(handlers, authorized_scopes, user, client)
+    authorized_names = _collect_names(handlers, authorized_scopes, user, client, index)
 
     # Select only the requested claims if no scope has been requested. Selecting
     # scopes has prevalence over selecting claims.
@@ -67,7 +313,7 @@ def collect(handlers, access_token, scope_request=None, claims_request=None):
     # Add the requested claims that are authorized to the response.
 
     requested_names = set(claims_request.keys()) & authorized_names
-    names = _collect_names(handlers, scopes, user, client) | requested_names
+    names = _collect_names(handlers, scopes, user, client, index) | requested_names
 
     # Get the values for the claims.
 
@@ -82,14 +328,17 @@ def collect(handlers, access_token, scope_request=None, claims_request=None):
     return authorized_scopes, claims
 
 
-def _collect_scopes(handlers, scopes, user, client):
+def _collect_scopes(handlers, scopes, user, client, index=None):
     """ Get a set of all the authorized scopes according to the handlers. """
-    results = set()
+    index = index or compile_index([type(handler) for handler in handlers])
+
+    # Declared scopes are always authorized.
+    results = set(scope for scope in scopes if scope in index.scopes)
 
     data = {'user': user, 'client': client}
 
     def visitor(scope_name, func):
-        claim_names = func(data)
+        claim_names = _call(func, data)
         # If the claim_names is None, it means that the scope is not authorized.
         if claim_names is not None:
             results.add(scope_name)
@@ -99,15 +348,18 @@ def _collect_scopes(handlers, scopes, user, client):
     return results
 
 
-def _collect_names(handlers, scopes, user, client):
+def _collect_names(handlers, scopes, user, client, index=None):
     """ Get the names of the claims supported by the handlers for the requested scope. """
+    index = index or compile_index([type(handler) for handler in handlers])
 
     results = set()
+    for scope in scopes:
+        results.update(index.scopes.get(scope, ()))
 
     data = {'user': user, 'client': client}
 
     def visitor(_scope_name, func):
-        claim_names = func(data)
+        claim_names = _call(func, data)
         # If the claim_names is None, it means that the scope is not authorized.
         if claim_names is not None:
             results.update(claim_names)
@@ -118,24 +370,142 @@ def _collect_names(handlers, scopes, user, client):
 
 
 def _collect_values(handlers, names, user, client, values):
-    """ Get the values from the handlers of the requested claims. """
+    """
+    Get the values from the handlers of the requested claims.
+
+    Handlers with a time budget are evaluated in the handler thread pool, if
+    one is configured. Handlers marked as `independent` run concurrently with
+    the rest, which still run one after another. The values are merged in
+    handler order once all of them are available, so values from later
+    handlers still overwrite previous results.
+
+    The claims of a handler that exceeds its budget are dropped, unless one of
+    them is essential according to `values` and no other handler provided it,
+    in which case :class:`ClaimTimeoutError` is raised. Budgets are only
+    enforced with the thread pool, and a handler that exceeds its budget is
+    not interrupted: it keeps its worker thread until it returns.
+
+    """
+
+    executor = _get_executor()
+
+    pending = []
+    for handler in handlers:
+        budget = _get_budget(handler)
+        if executor is None or budget is None:
+            handler_results = _collect_handler_values(handler, names, user, client, values)
+        else:
+            future = executor.submit(
+                _run_in_thread, reading_from_replica(), _collect_handler_values, handler, names, user, client, values
+            )
+            handler_results = (future, time.time() + budget)
+            if not getattr(handler, 'independent', False):
+                handler_results = _wait_for_values(handler, *handler_results)
+        pending.append((handler, handler_results))
+
+    results = {}
+    timed_out = set()
+    for handler, handler_results in pending:
+        if isinstance(handler_results, tuple):
+            handler_results = _wait_for_values(handler, *handler_results)
+
+        if handler_results is None:
+            timed_out.update(name for name in names if _get_method(handler, 'claim', name))
+            continue
+
+        # New values overwrite previous results
+        results.update(handler_results)
+
+    missing = [
+        name for name in timed_out
+        if name not in results and (values.get(name) or {}).get('essential')
+    ]
+    if missing:
+        raise ClaimTimeoutError('Timed out collecting essential claims {}.'.format(', '.join(sorted(missing))))
+
+    return results
+
+
+def _wait_for_values(handler, future, deadline):
+    """ Wait for the values of a handler until `deadline`. Returns None if it times out. """
+    try:
+        return future.result(timeout=max(deadline - time.time(), 0))
+    except futures.TimeoutError:
+        # Only stops handlers that have not started yet, a running handler keeps its thread.
+        future.cancel()
+        log.warning('OIDC claim handler %s timed out, dropping its claims.', type(handler).__name__)
+        return None
+
+
+def _get_budget(handler):
+    """
+    Return the time budget, in seconds, of a handler instance.
+
+    Budgets in `OAUTH_OIDC_HANDLER_TIMEOUTS` take precedence over the
+    `timeout` attribute of the handler. Independent handlers without a
+    budget get `OAUTH_OIDC_HANDLER_TIMEOUT`. Other handlers have no budget.
+
+    """
+    budget = constants.HANDLER_TIMEOUTS.get(_get_path(type(handler)))
+    if budget is None:
+        budget = getattr(handler, 'timeout', None)
+    if budget is None and getattr(handler, 'independent', False):
+        budget = constants.HANDLER_TIMEOUT
+    return budget
+
+
+def _get_path(cls):
+    """ Return the dotted path of a handler class. """
+    return '{}.{}'.format(cls.__module__, cls.__name__)
+
+
+def _collect_handler_values(handler, names, user, client, values):
+    """ Get the values of the requested claims from a single handler. """
 
     results = {}
 
     def visitor(claim_name, func):
         data = {'user': user, 'client': client}
         data.update(values.get(claim_name) or {})
-        claim_value = func(data)
+        claim_value = _call(func, data)
         # If the claim_value is None, it means that the claim is not authorized.
         if claim_value is not None:
-            # New values overwrite previous results
             results[claim_name] = claim_value
 
-    _visit_handlers(handlers, visitor, 'claim', names)
+    _visit_handlers([handler], visitor, 'claim', names)
 
     return results
 
 
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    """ Return the shared handler thread pool, or None if it is disabled. """
+    global _executor  # pylint: disable=global-statement
+
+    if constants.HANDLER_MAX_WORKERS <= 0:
+        return None
+
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = futures.ThreadPoolExecutor(max_workers=constants.HANDLER_MAX_WORKERS)
+
+    return _executor
+
+
+def _run_in_thread(replica, func, *args):
+    """ Call `func` in a worker thread, releasing its database connection afterwards. """
+    try:
+        # Use the same database as the request thread.
+        with use_read_replica(replica):
+            return func(*args)
+    finally:
+        close_old_connections()
+
+
 def _validate_claim_request(claims, ignore_errors=False):
     """
     Validates a claim request section (`userinfo` or `id_token`) according
@@ -143,12 +513,17 @@ def _validate_claim_request(claims, ignore_errors=False):
 
     - http://openid.net/specs/openid-connect-core-1_0.html#ClaimsParameter
 
-    Returns a copy of the claim request with only the valid fields and values.
+    Returns a :class:`ClaimsRequest` copy of the claim request with only the
+    valid fields and values. Requests that are already a :class:`ClaimsRequest`
+    are returned unchanged.
 
     Raises ValueError is the claim request is invalid and `ignore_errors` is False
 
     """
 
+    if isinstance(claims, ClaimsRequest):
+        return claims
+
     results = {}
     claims = claims if claims else {}
 
@@ -162,7 +537,7 @@ def _validate_claim_request(claims, ignore_errors=False):
                 msg = 'Invalid claim {}.'.format(name)
                 raise ValueError(msg)
 
-    return results
+    return ClaimsRequest(results)
 
 
 def _validate_claim_values(name, value, ignore_errors):
@@ -170,12 +545,13 @@ def _validate_claim_values(name, value, ignore_errors):
     results = {'essential': False}
     for key, value in six.iteritems(value):
         if key in CLAIM_REQUEST_FIELDS:
-            results[key] = value
+            # Use tuples so the shared results can't be modified.
+            results[key] = tuple(value) if isinstance(value, list) else value
         else:
             if not ignore_errors:
                 msg = 'Unknown attribute {} in claim value {}.'.format(key, name)
                 raise ValueError(msg)
-    return results
+    return ClaimsRequest(results)
 
 
 def _visit_handlers(handlers, visitor, prefix, suffixes):
@@ -184,8 +560,47 @@ def _visit_handlers(handlers, visitor, prefix, suffixes):
     results = []
     for handler in handlers:
         for suffix in suffixes:
-            func = getattr(handler, '{}_{}'.format(prefix, suffix).lower(), None)
-            if func:
+            func = _get_method(handler, prefix, suffix)
+            # Declared scopes are read from the handler index instead.
+            if func and getattr(func, 'declared', False) is not True:
                 results.append(visitor(suffix, func))
 
     return results
+
+
+def _call(func, data):
+    """
+    Call a handler method with `data`.
+
+    Results of methods declared as depending only on the client, or on
+    nothing, are memoized across requests, keyed by the client if needed and
+    by the claim request fields in `data`. Callers get a copy of memoized
+    results, so changing them does not change the memoized value.
+
+    """
+    granularity = getattr(func, 'granularity', USER)
+    if granularity not in (STATIC, CLIENT):
+        return func(data)
+
+    handler = getattr(func, '__self__', None)
+    fields = tuple(sorted((key, value) for key, value in six.iteritems(data) if key not in ('user', 'client')))
+    client_id = data['client'].client_id if granularity == CLIENT else None
+    key = (type(handler), func.__name__, client_id, fields)
+
+    try:
+        result = _results_cache.get(key, _MISSING)
+    except TypeError:
+        # Claim request values that can't be used as keys, like objects.
+        return func(data)
+
+    if result is _MISSING:
+        result = func(data)
+        _results_cache.set(key, copy.deepcopy(result))
+        return result
+
+    return copy.deepcopy(result)
+
+
+def _get_method(handler, prefix, suffix):
+    """ Return the handler method for a scope or claim, or None if the handler does not support it. """
+    return getattr(handler, '{}_{}'.format(prefix, suffix).lower(), None)
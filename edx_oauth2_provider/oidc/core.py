@@ -12,13 +12,25 @@ import provider.scope
 from django.utils.module_loading import import_string
 
 from .. import constants
-from .collect import collect
+from .collect import collect, collect_batch, compile_index
 
 HANDLERS = {
     'id_token': [import_string(cls) for cls in constants.ID_TOKEN_HANDLERS],
     'userinfo': [import_string(cls) for cls in constants.USERINFO_HANDLERS]
 }
 
+# Compile the declared scopes of the configured handlers once, at startup.
+for _handlers in HANDLERS.values():
+    compile_index(_handlers)
+
+
+def claims_supported():
+    """ Return the sorted names of the claims provided by the configured handlers. """
+    names = set()
+    for handlers in HANDLERS.values():
+        names.update(compile_index(handlers).claims)
+    return sorted(names)
+
 
 class IDToken(object):
     """
@@ -87,7 +99,8 @@ def id_token(access_token, nonce=None, claims_request=None):
     scope_request = provider.scope.to_names(access_token.scope)
 
     if nonce:
-        claims_request_section.update({'nonce': {'value': nonce}})
+        # Copy the section, since parsed claims requests are shared.
+        claims_request_section = dict(claims_request_section, nonce={'value': nonce})
 
     scopes, claims = collect(
         handlers,
@@ -150,3 +163,28 @@ def userinfo(access_token, scope_request=None, claims_request=None):
     )
 
     return IDToken(access_token, scopes, claims)
+
+
+def userinfo_batch(users, client, token_scope, scope_request=None):
+    """
+    Returns the UserInfo claims of a batch of users, for a trusted `client`.
+
+    Arguments:
+        users (list): Users to return the claims of.
+        client (:class:`Client`): Client requesting the claims.
+        token_scope (int): Scope of the client access token. Only these
+            scopes will be considered.
+        scope_request (list): Optional list of requested scopes. Defaults
+            to all the scopes of `token_scope`.
+
+    Yields a tuple of each user and its claims.
+
+    """
+
+    handlers = HANDLERS['userinfo']
+
+    if not scope_request:
+        scope_request = provider.scope.to_names(token_scope)
+
+    for user, _scopes, claims in collect_batch(handlers, users, client, token_scope, scope_request):
+        yield user, claims
@@ -30,6 +30,20 @@ Each scope method should return a list of its asociated claim names,
 or None if the `user` or `client` don't have authorization for that
 scope.
 
+Scopes available to every user and client can instead be declared in
+the class attribute `scope_claims`, a dictionary of scope names and
+their lists of claim names, for example:
+
+    scope_claims = {'profile': ['name', 'preferred_username']}
+
+Declared scopes of the configured handlers are compiled into a single
+index when the handlers are loaded, so no method is called for them
+during requests. A scope method takes precedence over a declared scope
+with the same name, including a method of a subclass, unless it is
+decorated with `declared_scope`. The builtin handlers keep their scope
+methods, decorated with `declared_scope`, so subclasses can still extend
+them and call them with `super`.
+
 Claim Methods
 
 The claim methods start with the prefix `claim_` and end with the name
@@ -53,6 +67,58 @@ each particular claim, and should be documented. If the returned value
 is `None`, the claim will not be included in the response.
 
 
+Concurrent Evaluation
+
+Handlers whose claim methods do slow, self-contained work, such as
+calls to remote services, can set the class attribute `independent`
+to True. When `OAUTH_OIDC_HANDLER_MAX_WORKERS` is set, the claim
+methods of independent handlers are evaluated in a shared thread pool,
+concurrently with the other handlers. Independent handlers must not
+rely on state shared with other handlers.
+
+Time Budgets
+
+When the thread pool is enabled, a handler can bound the time spent
+in its claim methods by setting the class attribute `timeout` to a
+number of seconds. Budgets for handlers that cannot be modified can be
+set in `OAUTH_OIDC_HANDLER_TIMEOUTS`, a dictionary keyed by the dotted
+path of the handler class. Independent handlers default to a budget of
+`OAUTH_OIDC_HANDLER_TIMEOUT` seconds.
+
+If a handler exceeds its budget its claims are left out of the
+response, unless one of them was requested as essential and no other
+handler provided it. In that case the request fails right away with a
+`temporarily_unavailable` error.
+
+Granularity
+
+Scope and claim methods are called for every request by default. Methods
+whose result does not depend on the user can declare it with the
+`granularity` decorator, for example:
+
+    @granularity(CLIENT)
+    def scope_course_staff(self, data):
+        ...
+
+Results of `CLIENT` methods depend only on the client, and results of
+`STATIC` methods on nothing at all, apart from the claim request fields
+passed in `data`. They are memoized across requests, for up to
+`OAUTH_OIDC_HANDLER_CACHE_TIMEOUT` seconds. Methods that depend on the
+current time, or on any other state, must not declare a granularity.
+
+Prefetching
+
+The batch UserInfo endpoint collects the claims of many users at once.
+Handlers can load the data of all the users of a batch in bulk by
+defining a `prefetch` method, receiving a dictionary with the fields:
+
+  - 'users': Users of the batch.
+  - 'client': OAuth2 Client instance for the current request.
+
+Handlers with a `prefetch` method are instantiated once per batch, and
+can keep the prefetched data, keyed by user, for their claim methods.
+
+
 NOTE: The method `__getattr__` can be overloaded to support claims or
 scopes whose names are not valid python method names.
 
@@ -66,6 +132,29 @@ from datetime import datetime, timedelta
 
 from django.conf import settings
 
+# Dependencies of scope and claim methods, see `granularity`.
+STATIC = 'static'
+CLIENT = 'client'
+USER = 'user'
+
+
+def granularity(level):
+    """ Decorator of scope and claim methods, declaring what their results depend on. """
+    def decorator(method):  # pylint: disable=missing-docstring
+        method.granularity = level
+        return method
+    return decorator
+
+
+def declared_scope(method):
+    """
+    Decorator of scope methods only returning the claims of their scope in
+    `scope_claims`. The declaration is used instead of calling the method.
+
+    """
+    method.declared = True
+    return granularity(STATIC)(method)
+
 
 class BasicIDTokenHandler(object):
     """
@@ -76,9 +165,18 @@ class BasicIDTokenHandler(object):
 
     """
 
+    scope_claims = {
+        'openid': ['iss', 'sub', 'aud', 'iat', 'exp', 'nonce'],
+    }
+
     def __init__(self):
         self._now = None
 
+    @declared_scope
+    def scope_openid(self, data):
+        """ Returns claims for the `openid` profile. """
+        return list(self.scope_claims['openid'])
+
     @property
     def now(self):
         """ Capture time. """
@@ -87,10 +185,6 @@ class BasicIDTokenHandler(object):
             self._now = datetime.utcnow()
         return self._now
 
-    def scope_openid(self, data):
-        """ Returns claims for the `openid` profile. """
-        return ['iss', 'sub', 'aud', 'iat', 'exp', 'nonce']
-
     def claim_iss(self, data):
         """ Required issuer identifier. """
         return settings.OAUTH_OIDC_ISSUER
@@ -100,6 +194,7 @@ class BasicIDTokenHandler(object):
         # Use the primary key as the identifier
         return str(data['user'].pk)
 
+    @granularity(CLIENT)
     def claim_aud(self, data):
         """ Required audience. """
         return data['client'] .client_id
@@ -128,9 +223,14 @@ class BasicUserInfoHandler(object):
 
     """
 
+    scope_claims = {
+        'openid': ['sub'],
+    }
+
+    @declared_scope
     def scope_openid(self, data):
         """Returns claims for the `openid` profile"""
-        return ['sub']
+        return list(self.scope_claims['openid'])
 
     def claim_sub(self, data):
         """ Required subject identifier. """
@@ -150,9 +250,14 @@ class ProfileHandler(object):
 
     """
 
+    scope_claims = {
+        'profile': ['name', 'family_name', 'given_name', 'preferred_username'],
+    }
+
+    @declared_scope
     def scope_profile(self, data):
         """ Returns claims for the `profile` scope. """
-        return ['name', 'family_name', 'given_name', 'preferred_username']
+        return list(self.scope_claims['profile'])
 
     def claim_family_name(self, data):
         """ End user last or family name. """
@@ -182,9 +287,14 @@ class EmailHandler(object):
 
     """
 
+    scope_claims = {
+        'email': ['email'],
+    }
+
+    @declared_scope
     def scope_email(self, data):
         """ Returns claims for the `profile` scope. """
-        return ['email']
+        return list(self.scope_claims['email'])
 
     def claim_email(self, data):
         """ End user email. """
@@ -0,0 +1,71 @@
+"""
+Per-client request quotas.
+
+Requests are counted in the Django cache, in fixed windows of the quota
+period. The number of requests over the last period is estimated from the
+counts of the current and the previous window, weighting the previous
+window by how much of it is still inside the sliding period. This keeps
+two counters per client, and avoids the bursts allowed at the edges of
+plain fixed windows.
+
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import math
+import time
+
+from django.core.cache import cache
+
+from .models import ClientQuota
+
+CACHE_KEY = 'edx_oauth2_provider.client_requests.{pk}.{period}.{window}'
+
+
+def check_quota(client, now=None):
+    """
+    Count a request of `client` against its quota.
+
+    Returns None if the request is allowed, or the number of seconds to wait
+    before retrying if the client is over quota. Rejected requests are not
+    counted.
+
+    """
+    limit = ClientQuota.get_limit(client)
+    if limit is None:
+        return None
+
+    requests, period = limit
+    now = time.time() if now is None else now
+    window, elapsed = divmod(now, period)
+
+    current_key = CACHE_KEY.format(pk=client.pk, period=period, window=int(window))
+    previous_key = CACHE_KEY.format(pk=client.pk, period=period, window=int(window) - 1)
+    counts = cache.get_many([current_key, previous_key])
+    current = counts.get(current_key, 0)
+    previous = counts.get(previous_key, 0)
+
+    weight = 1 - elapsed / period
+    if previous * weight + current + 1 > requests:
+        return _retry_after(requests, period, elapsed, current, previous)
+
+    # Windows are read until the end of the next one.
+    if not cache.add(current_key, 1, 2 * period):
+        try:
+            cache.incr(current_key)
+        except ValueError:
+            cache.set(current_key, 1, 2 * period)
+
+    return None
+
+
+def _retry_after(requests, period, elapsed, current, previous):
+    """ Return the seconds until the estimated count leaves room for one more request. """
+    if current + 1 > requests:
+        # Only the start of the next window, when the current count is
+        # weighted down, can make room.
+        wait = period - elapsed + period * (1 - (requests - 1) / current)
+    else:
+        # Wait until enough of the previous window has slid out.
+        wait = period * (1 - (requests - 1 - current) / previous) - elapsed
+
+    return max(1, int(math.ceil(wait)))
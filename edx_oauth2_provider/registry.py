@@ -0,0 +1,280 @@
+"""
+Read-only, memory-mapped snapshot of the OAuth2 clients.
+
+The `compile_client_registry` management command writes every `Client`, and
+whether it is trusted, to the file configured by `OAUTH_CLIENT_REGISTRY_PATH`.
+Each worker process memory-maps the file, so all the workers of a host share
+a single copy of the clients through the page cache.
+
+File layout, all integers big endian:
+
+    header   magic (4 bytes), format version (uint32), number of clients (uint32),
+             version of the clients (32 ASCII bytes)
+    index    one entry per client, sorted by digest:
+             sha1 of the `client_id` (20 bytes), record offset (uint32), record length (uint32)
+    records  UTF-8 JSON object per client, with the `Client` field values and `trusted`
+
+The file holds client secrets, so it is only readable by its owner, unless
+`OAUTH_CLIENT_REGISTRY_FILE_MODE` says otherwise.
+
+The snapshot is replaced atomically by renaming a new file over it. Workers
+check the file at most every `OAUTH_CLIENT_REGISTRY_CHECK_INTERVAL` seconds,
+and map the new file when it changed.
+
+The version of the clients is a random value kept in the Django cache, and
+the command writes the version it read before reading the clients into the
+snapshot. Saving or deleting a `Client` or `TrustedClient` replaces the
+version, so the snapshot is stale, and is not used until the command is run
+again: lookups fall back to the cache and the database. A snapshot is also
+not used when the version is missing from the cache, for instance after it
+was evicted, since changes could have been missed. Other processes notice
+the change on their next check of the file.
+
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import hashlib
+import json
+import logging
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+import uuid
+
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.encoding import force_bytes
+from provider.oauth2.models import Client
+
+from . import constants
+
+log = logging.getLogger(__name__)
+
+MAGIC = b'EOCR'
+VERSION = 3
+
+HEADER = struct.Struct(str('>4sII32s'))
+INDEX_ENTRY = struct.Struct(str('>20sII'))
+
+VERSION_CACHE_KEY = 'edx_oauth2_provider.client_registry.version'
+
+
+def _digest(client_id):
+    """ Return the index key of a `client_id`. """
+    return hashlib.sha1(force_bytes(client_id)).digest()
+
+
+def _field_names():
+    """ Return the names of the `Client` columns, in model order. """
+    return [field.attname for field in Client._meta.concrete_fields]  # pylint: disable=protected-access
+
+
+def write_registry(path, clients, trusted_ids, version):
+    """
+    Write a snapshot of `clients` to `path`, replacing any existing file atomically.
+
+    `trusted_ids` holds the primary keys of the trusted clients, and `version`
+    the version of the clients returned by `get_or_create_version` before they
+    were read. Returns the number of clients written.
+
+    """
+    field_names = _field_names()
+
+    records = []
+    for client in clients:
+        record = {name: getattr(client, name) for name in field_names}
+        record['trusted'] = client.pk in trusted_ids
+        records.append((_digest(client.client_id), json.dumps(record).encode('utf-8')))
+    records.sort(key=lambda item: item[0])
+
+    offset = HEADER.size + INDEX_ENTRY.size * len(records)
+    index = []
+    for digest, data in records:
+        index.append(INDEX_ENTRY.pack(digest, offset, len(data)))
+        offset += len(data)
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.client-registry-')
+    try:
+        with os.fdopen(fd, 'wb') as tmp_file:
+            tmp_file.write(HEADER.pack(MAGIC, VERSION, len(records), force_bytes(version)))
+            tmp_file.write(b''.join(index))
+            tmp_file.write(b''.join(data for _key, data in records))
+            tmp_file.flush()
+            os.fsync(tmp_file.fileno())
+        # mkstemp creates the file readable by its owner only.
+        if constants.CLIENT_REGISTRY_FILE_MODE is not None:
+            os.chmod(tmp_path, constants.CLIENT_REGISTRY_FILE_MODE)
+        os.rename(tmp_path, path)
+    except Exception:
+        os.unlink(tmp_path)
+        raise
+
+    return len(records)
+
+
+class ClientRegistry(object):
+    """ Lookups of clients by `client_id` in a memory-mapped snapshot. """
+
+    def __init__(self, path):
+        with open(path, 'rb') as registry_file:
+            stat = os.fstat(registry_file.fileno())
+            self.mmap = mmap.mmap(registry_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        self.key = (stat.st_ino, stat.st_mtime, stat.st_size)
+
+        magic, file_version, self.count, version = HEADER.unpack_from(self.mmap, 0)
+        if magic != MAGIC or file_version != VERSION:
+            raise ValueError('{} is not a client registry.'.format(path))
+        self.version = version.decode('ascii')
+
+        self.records_offset = HEADER.size + INDEX_ENTRY.size * self.count
+        if self.records_offset > len(self.mmap):
+            raise ValueError('{} is truncated.'.format(path))
+
+        self.field_names = _field_names()
+
+    def __len__(self):
+        return self.count
+
+    def get_record(self, client_id):
+        """
+        Return the record of `client_id` as a dict, or None if it is not in the
+        snapshot or its record is corrupt.
+
+        """
+        digest = _digest(client_id)
+
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            entry_digest, offset, length = INDEX_ENTRY.unpack_from(self.mmap, HEADER.size + middle * INDEX_ENTRY.size)
+            if entry_digest < digest:
+                low = middle + 1
+            elif entry_digest > digest:
+                high = middle
+            else:
+                return self._read_record(client_id, offset, length)
+
+        return None
+
+    def _read_record(self, client_id, offset, length):
+        """ Return the record at `offset`, or None if it is out of bounds, invalid, or of another client. """
+        if offset < self.records_offset or offset + length > len(self.mmap):
+            log.warning('OAuth2: corrupt client registry record for %s.', client_id)
+            return None
+
+        try:
+            record = json.loads(self.mmap[offset:offset + length].decode('utf-8'))
+            return record if record['client_id'] == client_id else None
+        except (ValueError, TypeError, KeyError):
+            log.warning('OAuth2: corrupt client registry record for %s.', client_id)
+            return None
+
+    def get_client(self, client_id):
+        """ Return the :class:`Client` with the given `client_id`, built from the snapshot, or None. """
+        record = self.get_record(client_id)
+        if record is None:
+            return None
+
+        try:
+            values = [record[name] for name in self.field_names]
+        except KeyError:
+            return None
+        return Client.from_db(DEFAULT_DB_ALIAS, self.field_names, values)
+
+    def is_trusted(self, client_id):
+        """ Return whether `client_id` is trusted, or None if it is not in the snapshot. """
+        record = self.get_record(client_id)
+        return None if record is None else record.get('trusted')
+
+
+_lock = threading.Lock()
+_registry = None
+_checked = 0
+_version = None
+
+
+def get_registry():
+    """
+    Return the :class:`ClientRegistry` of this process, or None if there is no
+    snapshot, or if it is stale or the version of the clients is unknown.
+
+    The snapshot file is checked for changes at most once per check interval,
+    and mapped again when it was replaced.
+
+    """
+    global _registry, _checked, _version  # pylint: disable=global-statement
+
+    path = constants.CLIENT_REGISTRY_PATH
+    if not path:
+        return None
+
+    now = time.time()
+    if now - _checked < constants.CLIENT_REGISTRY_CHECK_INTERVAL:
+        return _registry
+
+    with _lock:
+        if now - _checked >= constants.CLIENT_REGISTRY_CHECK_INTERVAL:
+            _registry = _load(path, _registry)
+            _version = cache.get(VERSION_CACHE_KEY)
+            _checked = now
+
+    if _registry is not None and (_version is None or _registry.version != _version):
+        return None
+
+    return _registry
+
+
+def get_or_create_version():
+    """ Return the current version of the clients, starting a new one if it is unknown. """
+    version = uuid.uuid4().hex
+    if cache.add(VERSION_CACHE_KEY, version, None):
+        return version
+    return cache.get(VERSION_CACHE_KEY) or get_or_create_version()
+
+
+def mark_changed():
+    """
+    Record that a client changed, making the existing snapshots stale.
+
+    The current process checks the snapshot again on its next lookup.
+
+    """
+    global _checked  # pylint: disable=global-statement
+
+    cache.set(VERSION_CACHE_KEY, uuid.uuid4().hex, None)
+    with _lock:
+        _checked = 0
+
+
+def _load(path, current):
+    """ Return the registry at `path`, reusing `current` if the file did not change. """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+
+    if current is not None and current.key == (stat.st_ino, stat.st_mtime, stat.st_size):
+        return current
+
+    try:
+        # Readers of the previous snapshot keep their reference to it, so it
+        # is not closed here. It is unmapped once it is garbage collected.
+        return ClientRegistry(path)
+    except (EnvironmentError, ValueError, struct.error):
+        log.warning('OAuth2: unable to load the client registry %s.', path, exc_info=True)
+        return None
+
+
+def reset():
+    """ Forget the loaded snapshot, so the next lookup loads the file again. """
+    global _registry, _checked, _version  # pylint: disable=global-statement
+
+    with _lock:
+        _registry = None
+        _checked = 0
+        _version = None
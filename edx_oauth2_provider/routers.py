@@ -0,0 +1,99 @@
+"""
+Database routing of read-only OAuth2 requests to a replica.
+
+Add `edx_oauth2_provider.routers.ReadReplicaRouter` to `DATABASE_ROUTERS`,
+and set `OAUTH_READ_REPLICA_DATABASE` to the alias of the replica. Reads
+made inside :func:`use_read_replica`, like the token validation and the
+claims of protected views, then go to the replica. All the other queries,
+and every write, stay on the default database.
+
+Tokens are written to the primary when they are issued, and may not have
+reached the replica yet when they are first used. Tokens missing from the
+replica are looked up again on the primary, and tokens issued in the last
+`OAUTH_READ_YOUR_WRITES_WINDOW` seconds are only read from the primary.
+
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import hashlib
+import threading
+from contextlib import contextmanager
+
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.encoding import force_bytes
+
+from . import constants
+
+RECENT_WRITE_CACHE_KEY = 'edx_oauth2_provider.recent_write.{digest}'
+
+_local = threading.local()
+
+
+def reading_from_replica():
+    """ Return whether reads of the current thread are routed to the replica. """
+    return getattr(_local, 'enabled', False)
+
+
+@contextmanager
+def use_read_replica(enabled=True):
+    """ Route the reads of the current thread to the replica, if `enabled`, inside the context. """
+    previous = reading_from_replica()
+    _local.enabled = enabled
+    try:
+        yield
+    finally:
+        _local.enabled = previous
+
+
+def use_replica_for(key):
+    """ Return whether the object identified by `key` can be read from the replica. """
+    return bool(constants.READ_REPLICA_DATABASE) and not recently_written(key)
+
+
+def record_write(key):
+    """ Read the object identified by `key` from the primary, during the read-your-writes window. """
+    record_writes([key])
+
+
+def record_writes(keys):
+    """ Read the objects identified by `keys` from the primary, during the read-your-writes window. """
+    if constants.READ_REPLICA_DATABASE and constants.READ_YOUR_WRITES_WINDOW:
+        cache.set_many({_recent_write_key(key): True for key in keys}, constants.READ_YOUR_WRITES_WINDOW)
+
+
+def recently_written(key):
+    """ Return whether the object identified by `key` was written within the read-your-writes window. """
+    return bool(constants.READ_YOUR_WRITES_WINDOW) and cache.get(_recent_write_key(key), False)
+
+
+def _recent_write_key(key):
+    """ Return the cache key of a recent write. Keys are hashed, so any value is valid. """
+    return RECENT_WRITE_CACHE_KEY.format(digest=hashlib.sha1(force_bytes(key)).hexdigest())
+
+
+class ReadReplicaRouter(object):
+    """ Routes the reads made inside :func:`use_read_replica` to `OAUTH_READ_REPLICA_DATABASE`. """
+
+    def db_for_read(self, model, **hints):  # pylint: disable=unused-argument
+        """ Return the replica alias while reading from the replica. """
+        if constants.READ_REPLICA_DATABASE and reading_from_replica():
+            return constants.READ_REPLICA_DATABASE
+        return None
+
+    def db_for_write(self, model, **hints):  # pylint: disable=unused-argument
+        """ Writes always go to the default database. """
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):  # pylint: disable=unused-argument
+        """ Objects read from the replica can be related to objects of the primary. """
+        databases = (DEFAULT_DB_ALIAS, constants.READ_REPLICA_DATABASE)
+        if obj1._state.db in databases and obj2._state.db in databases:  # pylint: disable=protected-access
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):  # pylint: disable=unused-argument
+        """ The replica gets its schema from the primary. """
+        if constants.READ_REPLICA_DATABASE and db == constants.READ_REPLICA_DATABASE:
+            return False
+        return None
@@ -6,6 +6,7 @@ import uuid
 
 import jwt
 import provider.scope
+from django.core.cache import cache
 from django.core.urlresolvers import reverse
 from django.http import QueryDict
 from django.test import TestCase
@@ -21,6 +22,7 @@ from .util import normpath
 class BaseTestCase(TestCase):
     def setUp(self):
         super(BaseTestCase, self).setUp()
+        cache.clear()
 
         self.client_secret = 'some_secret'
         self.auth_client = ClientFactory(client_secret=self.client_secret)
@@ -0,0 +1,221 @@
+""" Tests for the audit stream. """
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+
+import mock
+from django.core.urlresolvers import reverse
+from django.test import TestCase
+
+from .. import audit
+from ..audit import AuditStream, DatabaseSink, JsonLinesSink
+from ..models import AuditEvent
+from .base import UserInfoTestCase
+
+
+class ListSink(object):
+    """ Sink keeping the batches of events in a list. """
+
+    batches = []
+
+    def write(self, events):
+        self.batches.append(events)
+
+
+class AuditStreamTest(TestCase):
+    """ Tests for `AuditStream`. """
+
+    def setUp(self):
+        super(AuditStreamTest, self).setUp()
+        self.sink = ListSink()
+        self.sink.batches = []
+
+    def make_stream(self, **kwargs):
+        options = dict(maxsize=5, batch_size=2, interval=0.01)
+        options.update(kwargs)
+        return AuditStream(self.sink, **options)
+
+    def test_batches(self):
+        stream = self.make_stream()
+        for index in range(5):
+            stream.record({'index': index})
+
+        stream.flush()
+        self.assertEqual([len(batch) for batch in self.sink.batches], [2, 2, 1])
+        self.assertEqual(stream.stats(), {
+            'queued': 5, 'written': 5, 'batches': 3, 'max_queue_size': 5, 'queue_size': 0
+        })
+
+    def test_drop_newest(self):
+        stream = self.make_stream(maxsize=2)
+        for index in range(4):
+            stream.record({'index': index})
+
+        stream.flush()
+        self.assertEqual(self.sink.batches, [[{'index': 0}, {'index': 1}]])
+        self.assertEqual(stream.stats()['dropped'], 2)
+
+    def test_drop_oldest(self):
+        stream = self.make_stream(maxsize=2, drop_policy='oldest')
+        for index in range(4):
+            stream.record({'index': index})
+
+        stream.flush()
+        self.assertEqual(self.sink.batches, [[{'index': 2}, {'index': 3}]])
+        self.assertEqual(stream.stats()['dropped'], 2)
+
+    def test_sink_failure(self):
+        stream = self.make_stream()
+        stream.record({'index': 0})
+
+        with mock.patch.object(self.sink, 'write', side_effect=IOError):
+            with mock.patch('edx_oauth2_provider.audit.log') as mock_log:
+                stream.flush()
+
+        self.assertTrue(mock_log.exception.called)
+        self.assertEqual(stream.stats()['failures'], 1)
+        self.assertNotIn('written', stream.stats())
+
+    def test_background_thread(self):
+        written = threading.Event()
+        stream = self.make_stream(batch_size=10)
+
+        with mock.patch.object(self.sink, 'write', side_effect=lambda events: written.set()) as write:
+            stream.start()
+            stream.record({'index': 0})
+            stream.record({'index': 1})
+            self.assertTrue(written.wait(5))
+
+        # Events queued within the flush interval are written together.
+        write.assert_called_once_with([{'index': 0}, {'index': 1}])
+
+    def test_close(self):
+        taken, release = threading.Event(), threading.Event()
+
+        def write(events):
+            taken.set()
+            release.wait(5)
+            ListSink.write(self.sink, events)
+
+        stream = self.make_stream(batch_size=1)
+        with mock.patch.object(self.sink, 'write', side_effect=write):
+            stream.start()
+            stream.record({'index': 0})
+            self.assertTrue(taken.wait(5))
+            stream.record({'index': 1})
+
+            # The batch taken by the thread is written before the remaining events.
+            threading.Timer(0.1, release.set).start()
+            stream.close()
+
+        self.assertFalse(stream.thread.is_alive())
+        self.assertEqual(self.sink.batches, [[{'index': 0}], [{'index': 1}]])
+
+    def test_thread_connections(self):
+        stream = self.make_stream()
+        with mock.patch('edx_oauth2_provider.audit.close_old_connections') as close_old_connections:
+            stream.record({'index': 0})
+            stream.flush()
+            self.assertFalse(close_old_connections.called)
+
+            written = threading.Event()
+            with mock.patch.object(self.sink, 'write', side_effect=lambda events: written.set()):
+                stream.start()
+                stream.record({'index': 1})
+                self.assertTrue(written.wait(5))
+                stream.close()
+        self.assertEqual(close_old_connections.call_count, 1)
+
+
+class SinkTest(TestCase):
+    """ Tests for the builtin sinks. """
+
+    events = [
+        {'event': 'token_issued', 'timestamp': 1000, 'client_id': 'client', 'user_id': 1, 'scope': 'openid'},
+        {'event': 'userinfo', 'timestamp': 1001, 'claims': ['sub']},
+    ]
+
+    def test_json_lines(self):
+        path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, path)
+
+        sink = JsonLinesSink(os.path.join(path, 'audit.log'))
+        sink.write(self.events[:1])
+        sink.write(self.events[1:])
+
+        with io.open(os.path.join(path, 'audit.log'), encoding='utf-8') as audit_file:
+            self.assertEqual([json.loads(line) for line in audit_file], self.events)
+
+    def test_database(self):
+        with self.assertNumQueries(1):
+            with mock.patch('edx_oauth2_provider.audit.close_old_connections') as close_old_connections:
+                DatabaseSink().write(self.events)
+        self.assertFalse(close_old_connections.called)
+
+        first, second = AuditEvent.objects.order_by('created')
+        self.assertEqual(
+            (first.event, first.client_id, first.user_id, first.scope), ('token_issued', 'client', 1, 'openid')
+        )
+        self.assertEqual(json.loads(first.data), {})
+        self.assertEqual(second.client_id, '')
+        self.assertIsNone(second.user_id)
+        self.assertEqual(json.loads(second.data), {'claims': ['sub']})
+
+
+@mock.patch('edx_oauth2_provider.constants.AUDIT_SINK', 'edx_oauth2_provider.tests.test_audit.ListSink')
+class AuditHooksTest(UserInfoTestCase):
+    """ Tests for the audit events of the views. """
+
+    def setUp(self):
+        super(AuditHooksTest, self).setUp()
+        ListSink.batches = []
+        self.set_access_token_scope('openid profile')
+
+        # Flush the events from the test thread only.
+        for patcher in (mock.patch.object(audit, '_stream', None), mock.patch.object(AuditStream, 'start')):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def get_events(self):
+        audit.flush()
+        return [event for batch in ListSink.batches for event in batch]
+
+    def test_userinfo(self):
+        response, _ = self.get_userinfo(self.access_token.token)
+        self.assertEqual(response.status_code, 200)
+
+        event, = self.get_events()
+        self.assertEqual(event['event'], 'userinfo')
+        self.assertEqual(event['client_id'], self.auth_client.client_id)
+        self.assertEqual(event['user_id'], self.user.pk)
+        self.assertEqual(event['scope'], 'openid profile')
+        self.assertIn('preferred_username', event['claims'])
+        self.assertEqual(audit.stats()['queued'], 1)
+
+    def test_token_issued(self):
+        self.auth_client.user = self.user
+        self.auth_client.save()
+
+        response = self.client.post(reverse('oauth2:access_token'), {
+            'grant_type': 'client_credentials',
+            'client_id': self.auth_client.client_id,
+            'client_secret': self.client_secret,
+            'scope': 'openid',
+        })
+        self.assertEqual(response.status_code, 200)
+
+        event, = self.get_events()
+        self.assertEqual(event['event'], 'token_issued')
+        self.assertEqual(event['client_id'], self.auth_client.client_id)
+        self.assertEqual(event['scope'], 'openid')
+
+    def test_disabled(self):
+        with mock.patch('edx_oauth2_provider.constants.AUDIT_SINK', None):
+            self.get_userinfo(self.access_token.token)
+        self.assertEqual(self.get_events(), [])
+        self.assertEqual(audit.stats(), {})
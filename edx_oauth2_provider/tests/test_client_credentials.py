@@ -0,0 +1,120 @@
+""" Tests for the client credentials grant. """
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import json
+
+import mock
+from django.core.urlresolvers import reverse
+from provider.constants import PUBLIC
+from provider.oauth2.models import AccessToken
+from provider.utils import now
+
+from .base import BaseTestCase
+from .factories import ClientFactory
+
+
+class ClientCredentialsTest(BaseTestCase):
+    """ Tests for client credentials grants of `AccessTokenView`. """
+
+    def setUp(self):
+        super(ClientCredentialsTest, self).setUp()
+        self.auth_client.user = self.user
+        self.auth_client.save()
+
+    def request_token(self, client=None, **payload):
+        client = client or self.auth_client
+        payload.update({
+            'grant_type': 'client_credentials',
+            'client_id': client.client_id,
+            'client_secret': self.client_secret,
+        })
+        response = self.client.post(reverse('oauth2:access_token'), payload)
+        return response, json.loads(response.content.decode('utf-8'))
+
+    def test_grant(self):
+        response, values = self.request_token(scope='openid profile')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(values['scope'], 'openid profile')
+        self.assertNotIn('refresh_token', values)
+
+        access_token = AccessToken.objects.get(token=values['access_token'])
+        self.assertEqual(access_token.user, self.user)
+        self.assertEqual(access_token.client, self.auth_client)
+
+    def test_restricted_scope(self):
+        # Only the default scopes can be requested.
+        response, values = self.request_token(scope='openid course_staff')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(values['error'], 'invalid_scope')
+
+    def test_default_scope(self):
+        response, values = self.request_token()
+        self.assertEqual(response.status_code, 200)
+        # The default scopes, without the ones no handler authorizes.
+        self.assertEqual(set(values['scope'].split()), {'openid', 'profile', 'email'})
+
+    def test_no_reuse(self):
+        _response, first = self.request_token(scope='openid')
+        _response, second = self.request_token(scope='openid')
+        self.assertNotEqual(first['access_token'], second['access_token'])
+
+    def test_unauthorized_clients(self):
+        response, values = self.request_token(client=ClientFactory(client_secret=self.client_secret))
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(values['error'], 'unauthorized_client')
+
+        self.auth_client.client_type = PUBLIC
+        self.auth_client.save()
+        response, values = self.request_token()
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(values['error'], 'unauthorized_client')
+
+
+@mock.patch('edx_oauth2_provider.constants.CLIENT_CREDENTIALS_TOKEN_REUSE', True)
+class ClientCredentialsReuseTest(ClientCredentialsTest):
+    """ Tests for the reuse of client credentials tokens. """
+
+    def test_no_reuse(self):
+        pass
+
+    def test_reuse(self):
+        _response, first = self.request_token(scope='openid')
+
+        with self.assertNumQueries(0):
+            response, second = self.request_token(scope='openid')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(second['access_token'], first['access_token'])
+        self.assertLessEqual(second['expires_in'], first['expires_in'])
+        self.assertIn('id_token', second)
+        self.assertEqual(AccessToken.objects.count(), 1)
+
+    def test_deleted_token(self):
+        _response, first = self.request_token(scope='openid')
+        AccessToken.objects.filter(token=first['access_token']).delete()
+
+        _response, second = self.request_token(scope='openid')
+        self.assertNotEqual(first['access_token'], second['access_token'])
+
+    def test_expired_token(self):
+        _response, first = self.request_token(scope='openid')
+        access_token = AccessToken.objects.get(token=first['access_token'])
+        access_token.expires = now()
+        access_token.save()
+
+        _response, second = self.request_token(scope='openid')
+        self.assertNotEqual(first['access_token'], second['access_token'])
+
+    def test_scopes(self):
+        _response, first = self.request_token(scope='openid')
+        _response, second = self.request_token(scope='openid profile')
+        self.assertNotEqual(first['access_token'], second['access_token'])
+
+    def test_expiring_token(self):
+        _response, first = self.request_token(scope='openid')
+
+        # Tokens expiring within the minimum lifetime are not cached.
+        with mock.patch('edx_oauth2_provider.constants.CLIENT_CREDENTIALS_MIN_LIFETIME', first['expires_in'] + 10):
+            _response, second = self.request_token(scope='openid profile')
+            _response, third = self.request_token(scope='openid profile')
+        self.assertNotEqual(second['access_token'], third['access_token'])
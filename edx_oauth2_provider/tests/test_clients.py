@@ -0,0 +1,94 @@
+""" Tests for the cached client lookups. """
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import base64
+
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase
+
+from ..backends import BasicClientBackend, RequestParamsClientBackend
+from ..clients import authenticate_client, get_client
+from .factories import ClientFactory
+
+
+class ClientCacheTest(TestCase):
+    """ Tests for `get_client` and the cache invalidation. """
+
+    def setUp(self):
+        super(ClientCacheTest, self).setUp()
+        cache.clear()
+        self.client_model = ClientFactory()
+
+    def test_cached(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(get_client(self.client_model.client_id), self.client_model)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(get_client(self.client_model.client_id), self.client_model)
+
+    def test_missing(self):
+        self.assertIsNone(get_client('missing'))
+        self.assertIsNone(get_client(None))
+
+    def test_save(self):
+        get_client(self.client_model.client_id)
+
+        self.client_model.name = 'Renamed'
+        self.client_model.save()
+        self.assertEqual(get_client(self.client_model.client_id).name, 'Renamed')
+
+    def test_client_id_change(self):
+        previous = self.client_model.client_id
+        get_client(previous)
+
+        self.client_model.client_id = 'other'
+        self.client_model.save()
+        self.assertIsNone(get_client(previous))
+        self.assertEqual(get_client('other'), self.client_model)
+
+    def test_delete(self):
+        client_id = self.client_model.client_id
+        get_client(client_id)
+
+        self.client_model.delete()
+        self.assertIsNone(get_client(client_id))
+
+    def test_authenticate(self):
+        client_id, client_secret = self.client_model.client_id, self.client_model.client_secret
+
+        self.assertEqual(authenticate_client(client_id, client_secret), self.client_model)
+        self.assertIsNone(authenticate_client(client_id, 'wrong'))
+        self.assertIsNone(authenticate_client(client_id, ''))
+        self.assertIsNone(authenticate_client('missing', client_secret))
+
+
+class ClientBackendTest(TestCase):
+    """ Tests for the cached client authentication backends. """
+
+    def setUp(self):
+        super(ClientBackendTest, self).setUp()
+        cache.clear()
+        self.client_model = ClientFactory()
+        self.factory = RequestFactory()
+
+    def basic_request(self, credentials):
+        encoded = base64.b64encode(credentials.encode('utf-8')).decode('ascii')
+        return self.factory.post('/', HTTP_AUTHORIZATION='Basic {}'.format(encoded))
+
+    def test_basic(self):
+        credentials = '{}:{}'.format(self.client_model.client_id, self.client_model.client_secret)
+        backend = BasicClientBackend()
+
+        self.assertEqual(backend.authenticate(self.basic_request(credentials)), self.client_model)
+        self.assertIsNone(backend.authenticate(self.basic_request(credentials + 'x')))
+        self.assertIsNone(backend.authenticate(self.factory.post('/', HTTP_AUTHORIZATION='Basic !')))
+        self.assertIsNone(backend.authenticate(self.factory.post('/')))
+        self.assertIsNone(backend.authenticate(None))
+
+    def test_request_params(self):
+        backend = RequestParamsClientBackend()
+        data = {'client_id': self.client_model.client_id, 'client_secret': self.client_model.client_secret}
+
+        self.assertEqual(backend.authenticate(self.factory.post('/', data)), self.client_model)
+        self.assertIsNone(backend.authenticate(self.factory.get('/', data)))
+        self.assertIsNone(backend.authenticate(self.factory.post('/', dict(data, client_secret='wrong'))))
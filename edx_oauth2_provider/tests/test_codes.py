@@ -0,0 +1,100 @@
+""" Tests for signed authorization codes. """
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import json
+from datetime import timedelta
+
+import mock
+from django.core.urlresolvers import reverse
+from provider.oauth2.models import Grant
+
+from ..codes import decode_code, encode_code, is_signed_code
+from .base import IDTokenTestCase
+from .factories import ClientFactory
+
+
+@mock.patch('edx_oauth2_provider.constants.SIGNED_AUTHORIZATION_CODES', True)
+class SignedCodeTest(IDTokenTestCase):
+    """ Tests for the authorization code flow with `OAUTH_SIGNED_AUTHORIZATION_CODES`. """
+
+    def make_grant(self, client=None):
+        return Grant(
+            user=self.user,
+            client=client or self.auth_client,
+            scope=1,
+            redirect_uri='https://example.com/complete',
+            nonce='nonce',
+        )
+
+    def exchange(self, code, client=None):
+        client = client or self.auth_client
+        response = self.client.post(reverse('oauth2:access_token'), {
+            'grant_type': 'authorization_code',
+            'client_id': client.client_id,
+            'client_secret': self.client_secret,
+            'code': code,
+        })
+        return response, json.loads(response.content.decode('utf-8'))
+
+    def test_flow(self):
+        scopes, claims = self.get_id_token_values('openid profile')
+
+        self.assertEqual(set(scopes), {'openid', 'profile'})
+        self.assertEqual(claims['nonce'], self.nonce)
+        self.assertEqual(claims['preferred_username'], self.user.username)
+        self.assertFalse(Grant.objects.exists())
+
+    def test_decode(self):
+        code = encode_code(self.make_grant())
+        self.assertTrue(is_signed_code(code))
+
+        with self.assertNumQueries(0):
+            grant = decode_code(code, self.auth_client)
+
+        self.assertEqual(grant.user_id, self.user.pk)
+        self.assertEqual(grant.client, self.auth_client)
+        self.assertEqual(grant.scope, 1)
+        self.assertEqual(grant.redirect_uri, 'https://example.com/complete')
+        self.assertEqual(grant.nonce, 'nonce')
+        self.assertIsNone(grant.pk)
+
+    def test_single_use(self):
+        code = encode_code(self.make_grant())
+
+        response, _ = self.exchange(code)
+        self.assertEqual(response.status_code, 200)
+
+        response, values = self.exchange(code)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(values['error'], 'invalid_grant')
+
+    def test_other_client(self):
+        client = ClientFactory(client_secret=self.client_secret)
+        code = encode_code(self.make_grant())
+
+        response, values = self.exchange(code, client)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(values['error'], 'invalid_grant')
+
+        # The code was not used by the failed request.
+        response, _ = self.exchange(code)
+        self.assertEqual(response.status_code, 200)
+
+    def test_invalid_code(self):
+        code = encode_code(self.make_grant())
+
+        response, values = self.exchange(code[:-1])
+        self.assertEqual(values['error'], 'invalid_grant')
+
+        with mock.patch('edx_oauth2_provider.codes.EXPIRE_CODE_DELTA', timedelta(seconds=-1)):
+            response, values = self.exchange(code)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(values['error'], 'invalid_grant')
+
+    def test_stored_grant(self):
+        grant = self.make_grant()
+        grant.save()
+        self.assertFalse(is_signed_code(grant.code))
+
+        response, _ = self.exchange(grant.code)
+        self.assertEqual(response.status_code, 200)
@@ -0,0 +1,425 @@
+""" Tests for the claim collection functions. """
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import json
+import threading
+import time
+
+import mock
+from django.test import TestCase
+
+from ..oidc import collect
+from ..oidc.handlers import CLIENT, STATIC, ProfileHandler, granularity
+
+WAIT = 2
+
+
+class SlowHandler(object):
+    independent = True
+
+    def __init__(self, delay=WAIT, value='slow'):
+        self.delay = delay
+        self.value = value
+
+    def claim_slow(self, data):  # pylint: disable=unused-argument
+        time.sleep(self.delay)
+        return self.value
+
+
+class HandshakeHandler(object):
+    """ Handler that only returns a value if its peer runs at the same time. """
+    independent = True
+
+    def __init__(self, own_event, peer_event, name):
+        self.own_event = own_event
+        self.peer_event = peer_event
+        self.name = name
+
+    def claim_handshake(self, data):  # pylint: disable=unused-argument
+        self.own_event.set()
+        return self.name if self.peer_event.wait(WAIT) else None
+
+
+class StaticHandler(object):
+    def __init__(self, value, independent=False):
+        self.value = value
+        self.independent = independent
+
+    def claim_slow(self, data):  # pylint: disable=unused-argument
+        return self.value
+
+    def claim_static(self, data):  # pylint: disable=unused-argument
+        return self.value
+
+
+@mock.patch.object(collect, '_executor', None)
+@mock.patch('edx_oauth2_provider.constants.HANDLER_MAX_WORKERS', 4)
+class ConcurrentCollectValuesTest(TestCase):
+    """ Tests for the executor-backed evaluation of independent handlers. """
+
+    def collect_values(self, handlers, names):
+        return collect._collect_values(  # pylint: disable=protected-access
+            handlers, names=names, user=mock.Mock(), client=mock.Mock(), values={}
+        )
+
+    def test_concurrent(self):
+        first, second = threading.Event(), threading.Event()
+        handlers = [
+            HandshakeHandler(first, second, 'first'),
+            HandshakeHandler(second, first, 'second'),
+        ]
+        values = self.collect_values(handlers, ['handshake'])
+        self.assertEqual(values, {'handshake': 'second'})
+
+    def test_later_values_overwrite(self):
+        handlers = [SlowHandler(delay=0.1, value='first'), StaticHandler('second')]
+        self.assertEqual(self.collect_values(handlers, ['slow']), {'slow': 'second'})
+
+        handlers = [StaticHandler('first'), SlowHandler(delay=0.1, value='second')]
+        self.assertEqual(self.collect_values(handlers, ['slow']), {'slow': 'second'})
+
+    @mock.patch('edx_oauth2_provider.constants.HANDLER_TIMEOUT', 0.1)
+    def test_timeout(self):
+        handlers = [StaticHandler('static', independent=True), SlowHandler(delay=1)]
+        start = time.time()
+        values = self.collect_values(handlers, ['static', 'slow'])
+
+        self.assertLess(time.time() - start, 1)
+        self.assertEqual(values, {'static': 'static', 'slow': 'static'})
+
+    def test_disabled(self):
+        first, second = threading.Event(), threading.Event()
+        second.set()
+        handler = HandshakeHandler(first, second, 'first')
+
+        with mock.patch('edx_oauth2_provider.constants.HANDLER_MAX_WORKERS', 0):
+            values = self.collect_values([handler], ['handshake'])
+
+        self.assertEqual(values, {'handshake': 'first'})
+        self.assertIsNone(collect._executor)  # pylint: disable=protected-access
+
+
+class BudgetHandler(SlowHandler):
+    independent = False
+    timeout = 0.1
+
+
+@mock.patch.object(collect, '_executor', None)
+@mock.patch('edx_oauth2_provider.constants.HANDLER_MAX_WORKERS', 4)
+class HandlerBudgetTest(TestCase):
+    """ Tests for per-handler time budgets. """
+
+    def collect_values(self, handlers, names, values=None):
+        return collect._collect_values(  # pylint: disable=protected-access
+            handlers, names=names, user=mock.Mock(), client=mock.Mock(), values=values or {}
+        )
+
+    def test_budget(self):
+        start = time.time()
+        values = self.collect_values([BudgetHandler(delay=1), StaticHandler('static')], ['slow', 'static'])
+
+        self.assertLess(time.time() - start, 1)
+        self.assertEqual(values, {'slow': 'static', 'static': 'static'})
+
+    def test_within_budget(self):
+        values = self.collect_values([BudgetHandler(delay=0), StaticHandler('static')], ['slow'])
+        self.assertEqual(values, {'slow': 'static'})
+
+        values = self.collect_values([StaticHandler('static'), BudgetHandler(delay=0)], ['slow'])
+        self.assertEqual(values, {'slow': 'slow'})
+
+    def test_settings_budget(self):
+        path = '{}.{}'.format(SlowHandler.__module__, SlowHandler.__name__)
+        with mock.patch('edx_oauth2_provider.constants.HANDLER_TIMEOUTS', {path: 0.1}):
+            values = self.collect_values([SlowHandler(delay=1)], ['slow'])
+        self.assertEqual(values, {})
+
+    def test_essential_claim(self):
+        values = {'slow': {'essential': True}}
+        with self.assertRaises(collect.ClaimTimeoutError):
+            self.collect_values([BudgetHandler(delay=1)], ['slow'], values)
+
+        # Another handler provided the claim.
+        values = self.collect_values([StaticHandler('static'), BudgetHandler(delay=1)], ['slow'], values)
+        self.assertEqual(values, {'slow': 'static'})
+
+    def test_non_essential_claim(self):
+        values = {'slow': {'essential': False}}
+        self.assertEqual(self.collect_values([BudgetHandler(delay=1)], ['slow'], values), {})
+
+    def test_no_executor(self):
+        with mock.patch('edx_oauth2_provider.constants.HANDLER_MAX_WORKERS', 0):
+            values = self.collect_values([BudgetHandler(delay=0.2)], ['slow'])
+        self.assertEqual(values, {'slow': 'slow'})
+
+    @mock.patch.dict(collect._indexes, clear=True)  # pylint: disable=protected-access
+    def test_unenforced_budget_warning(self):
+        with mock.patch('edx_oauth2_provider.oidc.collect.log') as mock_log:
+            collect.compile_index([StaticHandler, BudgetHandler])
+        self.assertFalse(mock_log.warning.called)
+
+        collect._indexes.clear()  # pylint: disable=protected-access
+        with mock.patch('edx_oauth2_provider.constants.HANDLER_MAX_WORKERS', 0):
+            with mock.patch('edx_oauth2_provider.oidc.collect.log') as mock_log:
+                collect.compile_index([StaticHandler, BudgetHandler])
+        self.assertEqual(mock_log.warning.call_args[0][1], 'BudgetHandler')
+
+
+class ParseClaimsRequestTest(TestCase):
+    """ Tests for the cached parsing of claims requests. """
+
+    def setUp(self):
+        super(ParseClaimsRequestTest, self).setUp()
+        patcher = mock.patch.object(collect, '_claims_cache', collect._LRUCache(2))  # pylint: disable=protected-access
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_parse(self):
+        claims_string = json.dumps({
+            'userinfo': {'name': None, 'test': {'essential': True, 'values': [1, 2]}},
+            'id_token': {'email': {'value': 'someone@example.com'}},
+        })
+        claims_request = collect.parse_claims_request(claims_string)
+
+        self.assertEqual(claims_request, {
+            'userinfo': {'name': None, 'test': {'essential': True, 'values': (1, 2)}},
+            'id_token': {'email': {'essential': False, 'value': 'someone@example.com'}},
+        })
+        self.assertIs(collect.parse_claims_request(claims_string), claims_request)
+
+        # Validated sections are used as they are.
+        section = claims_request['userinfo']
+        self.assertIs(collect._validate_claim_request(section), section)  # pylint: disable=protected-access
+
+    def test_immutable(self):
+        claims_request = collect.parse_claims_request(json.dumps({'userinfo': {'name': {'essential': True}}}))
+
+        with self.assertRaises(TypeError):
+            claims_request['userinfo'] = {}
+        with self.assertRaises(TypeError):
+            claims_request['userinfo'].update({'email': None})
+        with self.assertRaises(TypeError):
+            claims_request['userinfo']['name']['essential'] = False
+
+    def test_empty(self):
+        self.assertEqual(collect.parse_claims_request(None), {})
+        self.assertEqual(collect.parse_claims_request(''), {})
+
+    def test_invalid(self):
+        for claims_string in ('{"userinfo": ', '[]'):
+            with self.assertRaises(ValueError):
+                collect.parse_claims_request(claims_string)
+
+        # Invalid sections only fail when they are validated.
+        claims_request = collect.parse_claims_request(json.dumps({'userinfo': {'name': 1}, 'id_token': {}}))
+        self.assertEqual(claims_request['id_token'], {})
+        with self.assertRaises(ValueError):
+            collect._validate_claim_request(claims_request['userinfo'])  # pylint: disable=protected-access
+
+    def test_cache_size(self):
+        claims_strings = [json.dumps({'userinfo': {name: None}}) for name in ('a', 'b', 'c')]
+        for claims_string in claims_strings:
+            collect.parse_claims_request(claims_string)
+
+        cache = collect._claims_cache  # pylint: disable=protected-access
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get(claims_strings[0]))
+
+    @mock.patch('edx_oauth2_provider.constants.CLAIMS_CACHE_MAX_LENGTH', 10)
+    def test_cache_max_length(self):
+        claims_string = json.dumps({'userinfo': {'name': None}})
+        claims_request = collect.parse_claims_request(claims_string)
+
+        self.assertEqual(claims_request, {'userinfo': {'name': None}})
+        self.assertEqual(len(collect._claims_cache), 0)  # pylint: disable=protected-access
+
+
+class CountingHandler(object):
+    """ Handler counting the calls of its methods. """
+    calls = None
+
+    def count(self, name):
+        self.calls[name] = self.calls.get(name, 0) + 1
+
+    @granularity(STATIC)
+    def scope_static(self, data):  # pylint: disable=unused-argument
+        self.count('scope_static')
+        return ['by_client', 'by_user']
+
+    @granularity(CLIENT)
+    def claim_by_client(self, data):
+        self.count('claim_by_client')
+        return data['client'].client_id
+
+    def claim_by_user(self, data):
+        self.count('claim_by_user')
+        return data['user'].username
+
+    @granularity(STATIC)
+    def claim_echo(self, data):
+        self.count('claim_echo')
+        return data.get('value')
+
+
+class MemoizedHandlerTest(TestCase):
+    """ Tests for the memoization of handler methods by granularity. """
+
+    def setUp(self):
+        super(MemoizedHandlerTest, self).setUp()
+        self.cache = collect._LRUCache(10, 60)  # pylint: disable=protected-access
+        patcher = mock.patch.object(collect, '_results_cache', self.cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        CountingHandler.calls = {}
+
+    def collect(self, user, client, values=None):
+        values = values or {}
+        handlers = [CountingHandler()]
+        names = collect._collect_names(handlers, ['static'], user, client)  # pylint: disable=protected-access
+        return collect._collect_values(  # pylint: disable=protected-access
+            handlers, names=names | set(values), user=user, client=client, values=values
+        )
+
+    def test_granularity(self):
+        clients = [mock.Mock(client_id='first'), mock.Mock(client_id='second')]
+        users = [mock.Mock(username='alice'), mock.Mock(username='bob')]
+
+        for client in clients:
+            for user in users:
+                claims = self.collect(user, client)
+                self.assertEqual(claims, {'by_client': client.client_id, 'by_user': user.username})
+
+        self.assertEqual(CountingHandler.calls['scope_static'], 1)
+        self.assertEqual(CountingHandler.calls['claim_by_client'], 2)
+        self.assertEqual(CountingHandler.calls['claim_by_user'], 4)
+
+    def test_claim_request_fields(self):
+        user, client = mock.Mock(username='alice'), mock.Mock(client_id='first')
+
+        for value in ('one', 'two', 'one'):
+            claims = self.collect(user, client, {'echo': {'value': value}})
+            self.assertEqual(claims['echo'], value)
+        self.assertEqual(CountingHandler.calls['claim_echo'], 2)
+
+        # Values that can't be used as keys are not memoized.
+        for _index in range(2):
+            claims = self.collect(user, client, {'echo': {'value': {'nested': 'value'}}})
+            self.assertEqual(claims['echo'], {'nested': 'value'})
+        self.assertEqual(CountingHandler.calls['claim_echo'], 4)
+
+    def test_copies(self):
+        call = collect._call  # pylint: disable=protected-access
+        handler = CountingHandler()
+        data = {'user': mock.Mock(username='alice'), 'client': mock.Mock(client_id='first')}
+
+        call(handler.scope_static, data).append('changed')
+        call(handler.scope_static, data).append('changed')
+
+        self.assertEqual(call(handler.scope_static, data), ['by_client', 'by_user'])
+        self.assertEqual(CountingHandler.calls['scope_static'], 1)
+
+    def test_timeout(self):
+        user, client = mock.Mock(username='alice'), mock.Mock(client_id='first')
+
+        with mock.patch('edx_oauth2_provider.oidc.collect.time.time', return_value=1000):
+            self.collect(user, client)
+        with mock.patch('edx_oauth2_provider.oidc.collect.time.time', return_value=1059):
+            self.collect(user, client)
+            self.assertEqual(len(self.cache), 2)
+        self.assertEqual(CountingHandler.calls['scope_static'], 1)
+
+        with mock.patch('edx_oauth2_provider.oidc.collect.time.time', return_value=1060):
+            self.assertEqual(len(self.cache), 0)
+            self.collect(user, client)
+        self.assertEqual(CountingHandler.calls['scope_static'], 2)
+
+
+class DeclaredHandler(object):
+    scope_claims = {
+        'profile': ['name'],
+        'dynamic': ['secret'],
+    }
+
+    def scope_dynamic(self, data):  # pylint: disable=unused-argument
+        return None
+
+    def claim_name(self, data):
+        return data['user'].username
+
+
+class OtherDeclaredHandler(object):
+    scope_claims = {
+        'profile': ['nickname'],
+    }
+
+
+class HandlerIndexTest(TestCase):
+    """ Tests for the compiled index of declared scopes. """
+
+    def test_index(self):
+        index = collect.HandlerIndex([DeclaredHandler, OtherDeclaredHandler])
+
+        self.assertEqual(index.scopes, {'profile': {'name', 'nickname'}})
+        self.assertEqual(index.claims, {'name', 'nickname', 'secret'})
+
+    def test_compiled_once(self):
+        handlers = [DeclaredHandler, OtherDeclaredHandler]
+        self.assertIs(collect.compile_index(handlers), collect.compile_index(list(handlers)))
+        self.assertIsNot(collect.compile_index(handlers), collect.compile_index([DeclaredHandler]))
+
+    def test_collect(self):
+        user = mock.Mock(username='someone')
+        access_token = mock.Mock(user=user, client=mock.Mock(), scope=0)
+        handlers = [DeclaredHandler, OtherDeclaredHandler]
+
+        with mock.patch('provider.scope.to_names', return_value=['profile', 'dynamic']):
+            with mock.patch.object(DeclaredHandler, 'scope_dynamic', return_value=None) as scope_dynamic:
+                scopes, claims = collect.collect(handlers, access_token, ['profile', 'dynamic'], {'secret': None})
+
+        # Only the scope method is called, and the declared scopes are
+        # authorized without calling any handler.
+        self.assertEqual(scope_dynamic.call_count, 1)
+        self.assertEqual(scopes, {'profile'})
+        self.assertEqual(claims, {'name': 'someone'})
+
+    def test_declared_scope_methods(self):
+        handler = ProfileHandler()
+        self.assertEqual(handler.scope_profile({}), ProfileHandler.scope_claims['profile'])
+
+        # Changing the returned claims does not change the class declaration.
+        handler.scope_profile({}).append('changed')
+        self.assertNotIn('changed', ProfileHandler.scope_claims['profile'])
+
+        # Declared scope methods are not called.
+        access_token = mock.Mock(user=mock.Mock(username='someone'), client=mock.Mock(), scope=0)
+        with mock.patch('provider.scope.to_names', return_value=['profile']):
+            scope_profile = mock.Mock(declared=True)
+            with mock.patch.object(ProfileHandler, 'scope_profile', scope_profile):
+                scopes, claims = collect.collect([ProfileHandler], access_token, ['profile'])
+        self.assertFalse(scope_profile.called)
+        self.assertEqual(scopes, {'profile'})
+        self.assertIn('preferred_username', claims)
+
+    def test_overridden_declared_scope(self):
+        user = mock.Mock(username='someone', is_staff=False)
+        access_token = mock.Mock(user=user, client=mock.Mock(), scope=0)
+
+        with mock.patch('provider.scope.to_names', return_value=['profile']):
+            scopes, claims = collect.collect([StaffProfileHandler], access_token, ['profile'])
+            self.assertEqual(scopes, set())
+            self.assertEqual(claims, {})
+
+            user.is_staff = True
+            scopes, claims = collect.collect([StaffProfileHandler], access_token, ['profile'])
+            self.assertEqual(scopes, {'profile'})
+            self.assertIn('preferred_username', claims)
+
+
+class StaffProfileHandler(ProfileHandler):
+    """ Handler extending a builtin scope method. """
+
+    def scope_profile(self, data):
+        if data['user'].is_staff:
+            return super(StaffProfileHandler, self).scope_profile(data)
+        return None
@@ -5,6 +5,8 @@ import json
 
 import ddt
 from django.core.urlresolvers import reverse
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from provider.constants import CONFIDENTIAL, PUBLIC
 
 from .base import OAuth2TestCase
@@ -105,3 +107,26 @@ class AuthenticationTest(OAuth2TestCase):
             self.assertIn('access_token', json.loads(response.content.decode('utf-8')))
         else:
             self.assertEqual(400, response.status_code)
+
+    def test_password_grant_single_token_write(self):
+        """ Issuing a token should not rewrite it when its scope is unchanged. """
+        self.auth_client.client_type = PUBLIC
+        self.auth_client.save()
+
+        values = {
+            'grant_type': 'password',
+            'client_id': CLIENT_ID,
+            'username': USERNAME,
+            'password': PASSWORD,
+        }
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.url, values)
+        self.assertEqual(200, response.status_code)
+
+        token_writes = [
+            query['sql'] for query in queries.captured_queries
+            if 'oauth2_accesstoken' in query['sql'] and query['sql'].startswith(('INSERT', 'UPDATE'))
+        ]
+        self.assertEqual(len(token_writes), 1)
+        self.assertTrue(token_writes[0].startswith('INSERT'))
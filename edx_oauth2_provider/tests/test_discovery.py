@@ -0,0 +1,65 @@
+""" Tests for the OpenID Connect discovery document. """
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import json
+
+from django.core.urlresolvers import reverse
+from django.test import TestCase
+
+from ..views import DiscoveryView
+
+
+class DiscoveryViewTest(TestCase):
+    """ Tests for `DiscoveryView`. """
+
+    def setUp(self):
+        super(DiscoveryViewTest, self).setUp()
+        DiscoveryView.documents.clear()
+        self.url = reverse('oauth2:discovery')
+
+    def test_document(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Cache-Control'], 'public, max-age=86400')
+
+        document = json.loads(response.content.decode('utf-8'))
+        self.assertEqual(self.url, '/oauth2/.well-known/openid-configuration')
+        self.assertEqual(document['issuer'], 'https://example.com/oauth2')
+        self.assertEqual(document['authorization_endpoint'], 'https://example.com/oauth2/authorize')
+        self.assertEqual(document['token_endpoint'], 'https://example.com/oauth2/access_token')
+        self.assertEqual(document['userinfo_endpoint'], 'https://example.com/oauth2/user_info')
+        self.assertEqual(document['end_session_endpoint'], 'https://example.com/oauth2/logout')
+        self.assertEqual(document['jwks_uri'], 'https://example.com/oauth2/.well-known/jwks.json')
+        self.assertIn('openid', document['scopes_supported'])
+        self.assertNotIn('default', document['scopes_supported'])
+        self.assertIn('password', document['grant_types_supported'])
+
+        for claim in ('sub', 'email', 'preferred_username', 'test'):
+            self.assertIn(claim, document['claims_supported'])
+
+    def test_encoded_once(self):
+        response = self.client.get(self.url)
+
+        with self.assertNumQueries(0):
+            second = self.client.get(self.url)
+
+        self.assertIs(second.content, response.content)
+
+    def test_not_modified(self):
+        etag = self.client.get(self.url)['ETag']
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['ETag'], etag)
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH='"other", W/{}'.format(etag))
+        self.assertEqual(response.status_code, 304)
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH='"other"')
+        self.assertEqual(response.status_code, 200)
+
+    def test_jwks(self):
+        response = self.client.get(reverse('oauth2:jwks'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content.decode('utf-8')), {'keys': []})
@@ -0,0 +1,84 @@
+""" Tests for the indexed user email lookups. """
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import json
+
+import mock
+from django.core.management import call_command
+from django.core.urlresolvers import reverse
+from django.test import TestCase
+from provider.constants import PUBLIC
+from six import StringIO
+
+from ..forms import get_user_by_email
+from ..models import UserEmail
+from .factories import ClientFactory, UserFactory
+
+
+class UserEmailTest(TestCase):
+    """ Tests for the `UserEmail` table and lookups. """
+
+    def setUp(self):
+        super(UserEmailTest, self).setUp()
+        patcher = mock.patch('edx_oauth2_provider.constants.EMAIL_LOOKUP_INDEX', True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.user = UserFactory(email='Some.One@Example.com')
+
+    def test_sync(self):
+        self.assertEqual(UserEmail.objects.get(user=self.user).email, 'some.one@example.com')
+
+        self.user.email = 'other@example.com'
+        self.user.save()
+        self.assertEqual(UserEmail.objects.get(user=self.user).email, 'other@example.com')
+
+        self.user.delete()
+        self.assertFalse(UserEmail.objects.exists())
+
+    def test_sync_skips_other_fields(self):
+        with self.assertNumQueries(1):
+            self.user.save(update_fields=['last_login'])
+
+    def test_disabled(self):
+        with mock.patch('edx_oauth2_provider.constants.EMAIL_LOOKUP_INDEX', False):
+            user = UserFactory(email='disabled@example.com')
+            self.assertEqual(get_user_by_email('disabled@example.com'), user)
+            self.assertIsNone(get_user_by_email('DISABLED@example.com'))
+
+        self.assertFalse(UserEmail.objects.filter(user=user).exists())
+
+    def test_lookup(self):
+        for email in ('some.one@example.com', ' SOME.ONE@example.COM'):
+            with self.assertNumQueries(1):
+                self.assertEqual(get_user_by_email(email), self.user)
+
+        self.assertIsNone(get_user_by_email('nobody@example.com'))
+
+    def test_ambiguous_lookup(self):
+        UserFactory(email='some.one@example.COM')
+        self.assertIsNone(get_user_by_email('some.one@example.com'))
+
+    def test_password_grant(self):
+        client = ClientFactory(client_type=PUBLIC)
+        response = self.client.post(reverse('oauth2:access_token'), {
+            'grant_type': 'password',
+            'client_id': client.client_id,
+            'username': 'SOME.ONE@example.com',
+            'password': 'some_password',
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('access_token', json.loads(response.content.decode('utf-8')))
+
+    def test_sync_command(self):
+        with mock.patch('edx_oauth2_provider.constants.EMAIL_LOOKUP_INDEX', False):
+            users = [UserFactory() for _ in range(3)]
+            self.user.email = 'changed@example.com'
+            self.user.save()
+
+        out = StringIO()
+        call_command('sync_user_emails', chunk_size=2, stdout=out)
+        self.assertEqual(out.getvalue().strip(), 'Created 3 and updated 1 user emails.')
+
+        for user in users + [self.user]:
+            self.assertEqual(UserEmail.objects.get(user=user).email, user.email.lower())
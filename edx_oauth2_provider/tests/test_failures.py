@@ -0,0 +1,91 @@
+""" Tests for the logging of authentication failures. """
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import json
+
+import mock
+from django.test import TestCase
+
+from ..failures import FailureLog, LazyJson
+
+
+@mock.patch('edx_oauth2_provider.constants.AUTH_FAILURE_LOG_LIMIT', 2)
+@mock.patch('edx_oauth2_provider.constants.AUTH_FAILURE_LOG_INTERVAL', 60)
+class FailureLogTest(TestCase):
+    """ Tests for the sampled failure log. """
+
+    def setUp(self):
+        super(FailureLogTest, self).setUp()
+        patcher = mock.patch('edx_oauth2_provider.failures.log')
+        self.log = patcher.start()
+        self.addCleanup(patcher.stop)
+
+        patcher = mock.patch('edx_oauth2_provider.failures.threading.Timer')
+        self.timer = patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.failure_log = FailureLog()
+        self.failure_log.started = 1000
+
+    def test_sampling(self):
+        for index in range(5):
+            self.failure_log.record('invalid_credentials', {'username': 'user{}'.format(index)}, now=1000)
+        self.failure_log.record('unknown_client', {'client_id': 'client'}, now=1000)
+
+        self.assertEqual(self.log.warning.call_count, 3)
+        _message, event = self.log.warning.call_args_list[0][0]
+        self.assertEqual(json.loads(str(event)), {'reason': 'invalid_credentials', 'username': 'user0'})
+        self.assertFalse(self.log.info.called)
+
+    def test_flush(self):
+        for _index in range(5):
+            self.failure_log.record('invalid_credentials', {}, now=1000)
+
+        # The next failure after the interval logs the summary, and is
+        # logged itself.
+        self.failure_log.record('invalid_credentials', {}, now=1060)
+        self.assertEqual(self.log.warning.call_count, 3)
+
+        self.log.info.assert_called_once_with(mock.ANY, 60, mock.ANY, extra={
+            'oauth2_failure_counts': {'invalid_credentials': 5}
+        })
+
+        self.failure_log.flush(now=1070)
+        self.assertEqual(self.log.info.call_args[1]['extra'], {'oauth2_failure_counts': {'invalid_credentials': 1}})
+
+        self.failure_log.flush(now=1080)
+        self.assertEqual(self.log.info.call_count, 2)
+
+    def test_timer(self):
+        self.failure_log.record('invalid_credentials', {}, now=1010)
+        self.failure_log.record('invalid_credentials', {}, now=1020)
+
+        # A single timer is started, for the end of the interval.
+        self.timer.assert_called_once_with(50, self.failure_log._on_timer)  # pylint: disable=protected-access
+        self.assertTrue(self.timer.return_value.start.called)
+
+        with mock.patch('edx_oauth2_provider.failures.time.time', return_value=1060):
+            self.failure_log._on_timer()  # pylint: disable=protected-access
+        self.log.info.assert_called_once_with(mock.ANY, 60, mock.ANY, extra={
+            'oauth2_failure_counts': {'invalid_credentials': 2}
+        })
+        self.assertIsNone(self.failure_log.timer)
+
+    def test_early_timer(self):
+        self.failure_log.record('invalid_credentials', {}, now=1010)
+
+        # A failure ended the interval before the timer, so the timer waits
+        # for the end of the next interval.
+        self.failure_log.record('invalid_credentials', {}, now=1070)
+        with mock.patch('edx_oauth2_provider.failures.time.time', return_value=1071):
+            self.failure_log._on_timer()  # pylint: disable=protected-access
+
+        self.assertEqual(self.log.info.call_count, 1)
+        self.assertEqual(self.timer.call_args[0][0], 59)
+
+    def test_lazy_formatting(self):
+        with mock.patch('edx_oauth2_provider.failures.json.dumps') as mock_dumps:
+            self.failure_log.record('invalid_credentials', {'username': 'someone'}, now=1000)
+            self.assertFalse(mock_dumps.called)
+
+        self.assertEqual(str(LazyJson({'b': 1, 'a': 2})), '{"a": 2, "b": 1}')
@@ -5,7 +5,11 @@ from __future__ import absolute_import, division, print_function, unicode_litera
 
 import json
 
+import mock
 from django.test.utils import override_settings
+from provider.oauth2.models import AccessToken, RefreshToken
+
+from ..oidc import ClaimTimeoutError
 
 from .base import IDTokenTestCase
 
@@ -37,6 +41,17 @@ class OIDCScopeTest(IDTokenTestCase):
 
         self.assertEqual(ISSUER, claims['iss'])
 
+    def test_claim_timeout(self):
+        with mock.patch('edx_oauth2_provider.oidc.id_token', side_effect=ClaimTimeoutError('late')):
+            response = self.get_access_token_response('openid')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(json.loads(response.content.decode('utf-8'))['error'], 'temporarily_unavailable')
+
+        # The token the client never received is not left behind.
+        self.assertFalse(AccessToken.objects.exists())
+        self.assertFalse(RefreshToken.objects.exists())
+
     def test_sub_claim(self):
         # Verify that the 'sub' claim is unique for each user
         user_a = self.user
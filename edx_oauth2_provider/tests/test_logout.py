@@ -0,0 +1,97 @@
+""" Tests for the single sign-out view. """
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+from django.core.urlresolvers import reverse
+from django.test.utils import override_settings
+
+from ..constants import AUTHORIZED_CLIENTS_SESSION_KEY
+from ..views import LogoutView
+from .base import BaseTestCase
+from .factories import ClientFactory
+
+
+class LogoutViewTest(BaseTestCase):
+    """ Tests for the `LogoutView`. """
+
+    def setUp(self):
+        super(LogoutViewTest, self).setUp()
+        self.url = reverse('oauth2:logout')
+        self.clients = [
+            ClientFactory(logout_uri='https://a.example.com/logout'),
+            ClientFactory(logout_uri='https://b.example.com/logout'),
+            ClientFactory(logout_uri=None),
+            ClientFactory(logout_uri='javascript:alert(document.cookie)'),
+            ClientFactory(logout_uri='//relative.example.com/logout'),
+        ]
+        ClientFactory(logout_uri='https://unauthorized.example.com/logout')
+
+    def login(self, clients):
+        self.client.login(username=self.user.username, password=self.password)
+        session = self.client.session
+        session[AUTHORIZED_CLIENTS_SESSION_KEY] = [client.client_id for client in clients]
+        session.save()
+
+    def test_logout(self):
+        self.login(self.clients)
+        response = self.client.post(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['logout_uris'], [
+            'https://a.example.com/logout',
+            'https://b.example.com/logout',
+        ])
+        for logout_uri in response.context['logout_uris']:
+            self.assertContains(response, '<iframe src="{}"'.format(logout_uri))
+        self.assertNotContains(response, 'unauthorized.example.com')
+        self.assertNotContains(response, 'javascript:')
+        self.assertNotContains(response, 'relative.example.com')
+
+        self.assertNotIn('_auth_user_id', self.client.session)
+        self.assertNotIn(AUTHORIZED_CLIENTS_SESSION_KEY, self.client.session)
+
+    def test_logout_without_clients(self):
+        self.login([])
+        response = self.client.post(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['logout_uris'], [])
+        self.assertNotIn('_auth_user_id', self.client.session)
+
+    def test_single_client_query(self):
+        clients = self.clients + [ClientFactory(logout_uri='https://c{}.example.com/'.format(i)) for i in range(20)]
+        client_ids = [client.client_id for client in clients]
+
+        with self.assertNumQueries(1):
+            logout_uris = LogoutView().get_logout_uris(client_ids)
+        self.assertEqual(len(logout_uris), 22)
+
+    def test_confirm(self):
+        self.login(self.clients)
+        response = self.client.get(self.url, {'next': '/dashboard'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, 'edx_oauth2_provider/logout_confirm.html')
+        self.assertContains(response, '<form method="post">')
+        self.assertContains(response, 'csrfmiddlewaretoken')
+        self.assertContains(response, '<input type="hidden" name="next" value="/dashboard">')
+        self.assertNotContains(response, '<iframe')
+        self.assertIn('_auth_user_id', self.client.session)
+
+    @override_settings(LOGOUT_REDIRECT_URL='/goodbye')
+    def test_next(self):
+        response = self.client.post(self.url, {'next': '/dashboard'})
+        self.assertEqual(response.context['next'], '/dashboard')
+
+        response = self.client.post(self.url, {'next': 'https://evil.example.com/'})
+        self.assertEqual(response.context['next'], '/goodbye')
+
+        response = self.client.post(self.url)
+        self.assertEqual(response.context['next'], '/goodbye')
+
+        response = self.client.get(self.url, {'next': 'https://evil.example.com/'})
+        self.assertEqual(response.context['next'], '/goodbye')
+
+    @override_settings(LOGOUT_REDIRECT_URL='oauth2:logout')
+    def test_next_url_name(self):
+        response = self.client.post(self.url)
+        self.assertEqual(response.context['next'], reverse('oauth2:logout'))
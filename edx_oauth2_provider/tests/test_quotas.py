@@ -0,0 +1,118 @@
+""" Tests for the per-client request quotas. """
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import json
+
+import mock
+from django.core.cache import cache
+from django.core.urlresolvers import reverse
+from django.test import TestCase
+
+from ..models import ClientQuota
+from ..quotas import check_quota
+from .factories import AccessTokenFactory, ClientFactory, UserFactory
+
+
+class CheckQuotaTest(TestCase):
+    """ Tests for the sliding window counters. """
+
+    def setUp(self):
+        super(CheckQuotaTest, self).setUp()
+        cache.clear()
+        self.oauth_client = ClientFactory()
+        ClientQuota.objects.create(client=self.oauth_client, requests=4, period=60)
+
+    def test_window(self):
+        for _index in range(4):
+            self.assertIsNone(check_quota(self.oauth_client, 600))
+        self.assertEqual(check_quota(self.oauth_client, 630), 45)
+
+        # Half of the previous window still counts, so there is room for
+        # two requests.
+        self.assertIsNone(check_quota(self.oauth_client, 690))
+        self.assertIsNone(check_quota(self.oauth_client, 690))
+        self.assertEqual(check_quota(self.oauth_client, 690), 15)
+
+        self.assertIsNone(check_quota(self.oauth_client, 705))
+
+    def test_default_quota(self):
+        other = ClientFactory()
+        self.assertIsNone(check_quota(other, 600))
+
+        with mock.patch('edx_oauth2_provider.constants.CLIENT_QUOTA', (1, 60)):
+            cache.clear()
+            self.assertIsNone(check_quota(other, 600))
+            self.assertIsNotNone(check_quota(other, 600))
+
+            # The client quota overrides the default.
+            self.assertIsNone(check_quota(self.oauth_client, 600))
+            self.assertIsNone(check_quota(self.oauth_client, 600))
+
+    def test_unlimited(self):
+        ClientQuota.objects.filter(client=self.oauth_client).update(requests=0)
+        cache.clear()
+
+        with mock.patch('edx_oauth2_provider.constants.CLIENT_QUOTA', (1, 60)):
+            for _index in range(5):
+                self.assertIsNone(check_quota(self.oauth_client, 600))
+
+    def test_cached_limit(self):
+        check_quota(self.oauth_client, 600)
+
+        with self.assertNumQueries(0):
+            check_quota(self.oauth_client, 600)
+
+        quota = ClientQuota.objects.get(client=self.oauth_client)
+        quota.requests = 1
+        quota.save()
+        self.assertEqual(ClientQuota.get_limit(self.oauth_client), (1, 60))
+
+        quota.delete()
+        self.assertIsNone(ClientQuota.get_limit(self.oauth_client))
+
+
+@mock.patch('edx_oauth2_provider.constants.CLIENT_QUOTAS', True)
+class EndpointQuotaTest(TestCase):
+    """ Tests for the quotas of the token and user info endpoints. """
+
+    def setUp(self):
+        super(EndpointQuotaTest, self).setUp()
+        cache.clear()
+        self.user = UserFactory()
+        self.oauth_client = ClientFactory()
+        ClientQuota.objects.create(client=self.oauth_client, requests=1, period=60)
+
+    def assert_over_quota(self, response):
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(json.loads(response.content.decode('utf-8'))['error'], 'temporarily_unavailable')
+        self.assertGreater(int(response['Retry-After']), 0)
+
+    def test_user_info(self):
+        access_token = AccessTokenFactory(user=self.user, client=self.oauth_client)
+        auth = 'Bearer {}'.format(access_token.token)
+
+        response = self.client.get(reverse('oauth2:user_info'), HTTP_AUTHORIZATION=auth)
+        self.assertNotEqual(response.status_code, 429)
+
+        self.assert_over_quota(self.client.get(reverse('oauth2:user_info'), HTTP_AUTHORIZATION=auth))
+
+    def test_access_token(self):
+        data = {
+            'grant_type': 'password',
+            'client_id': self.oauth_client.client_id,
+            'client_secret': self.oauth_client.client_secret,
+            'username': self.user.username,
+            'password': 'some_password',
+        }
+
+        self.assertEqual(self.client.post(reverse('oauth2:access_token'), data).status_code, 200)
+        self.assert_over_quota(self.client.post(reverse('oauth2:access_token'), data))
+
+    def test_disabled(self):
+        access_token = AccessTokenFactory(user=self.user, client=self.oauth_client)
+        auth = 'Bearer {}'.format(access_token.token)
+
+        with mock.patch('edx_oauth2_provider.constants.CLIENT_QUOTAS', False):
+            for _index in range(3):
+                response = self.client.get(reverse('oauth2:user_info'), HTTP_AUTHORIZATION=auth)
+                self.assertNotEqual(response.status_code, 429)
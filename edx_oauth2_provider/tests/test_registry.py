@@ -0,0 +1,209 @@
+""" Tests for the memory-mapped client registry. """
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import os
+import shutil
+import stat
+import struct
+import tempfile
+
+import mock
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from six import StringIO
+
+from .. import registry
+from ..clients import get_client, is_trusted
+from ..models import TrustedClient
+from .factories import ClientFactory
+
+
+class ClientRegistryTest(TestCase):
+    """ Tests for compiling and reading the client registry. """
+
+    def setUp(self):
+        super(ClientRegistryTest, self).setUp()
+        cache.clear()
+
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, 'clients.bin')
+
+        for name, value in (('CLIENT_REGISTRY_PATH', self.path), ('CLIENT_REGISTRY_CHECK_INTERVAL', 0)):
+            patcher = mock.patch('edx_oauth2_provider.constants.' + name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        registry.reset()
+        self.addCleanup(registry.reset)
+
+        self.clients = [ClientFactory() for _index in range(5)]
+        self.trusted = self.clients[0]
+        TrustedClient.objects.create(client=self.trusted)
+
+    def compile(self):
+        out = StringIO()
+        call_command('compile_client_registry', stdout=out)
+        return out.getvalue()
+
+    def test_compile(self):
+        self.assertEqual(self.compile().strip(), 'Wrote 5 clients to {}.'.format(self.path))
+
+        client_registry = registry.get_registry()
+        self.assertEqual(len(client_registry), 5)
+
+        for client in self.clients:
+            record = client_registry.get_record(client.client_id)
+            self.assertEqual(record['client_secret'], client.client_secret)
+            self.assertEqual(record['trusted'], client == self.trusted)
+
+        self.assertIsNone(client_registry.get_record('missing'))
+
+    def test_get_client(self):
+        self.compile()
+
+        expected = self.clients[1]
+        with self.assertNumQueries(0):
+            client = get_client(expected.client_id)
+            self.assertTrue(is_trusted(self.trusted))
+            self.assertFalse(is_trusted(expected))
+
+        self.assertEqual(client, expected)
+        self.assertEqual(client.user_id, expected.user_id)
+        self.assertEqual(client.redirect_uri, expected.redirect_uri)
+        self.assertFalse(client._state.adding)  # pylint: disable=protected-access
+
+    def test_fallback(self):
+        self.compile()
+
+        client = ClientFactory()
+        self.assertEqual(get_client(client.client_id), client)
+        self.assertFalse(is_trusted(client))
+
+    def test_reload(self):
+        self.compile()
+        first = registry.get_registry()
+        self.assertIs(registry.get_registry(), first)
+
+        ClientFactory()
+        self.compile()
+        second = registry.get_registry()
+        self.assertIsNot(second, first)
+        self.assertEqual(len(second), 6)
+
+        # Lookups on the replaced snapshot keep working.
+        self.assertIsNotNone(first.get_record(self.clients[0].client_id))
+
+    def test_check_interval(self):
+        self.compile()
+        first = registry.get_registry()
+
+        with mock.patch('edx_oauth2_provider.constants.CLIENT_REGISTRY_CHECK_INTERVAL', 60):
+            self.compile()
+            self.assertIs(registry.get_registry(), first)
+
+    def test_file_mode(self):
+        self.compile()
+        self.assertEqual(stat.S_IMODE(os.stat(self.path).st_mode), 0o600)
+
+        with mock.patch('edx_oauth2_provider.constants.CLIENT_REGISTRY_FILE_MODE', 0o640):
+            self.compile()
+        self.assertEqual(stat.S_IMODE(os.stat(self.path).st_mode), 0o640)
+
+    def test_changed_client(self):
+        self.compile()
+        client = self.clients[1]
+        client.client_secret = 'rotated'
+        client.save()
+
+        # The snapshot is stale until it is written again.
+        self.assertIsNone(registry.get_registry())
+        self.assertEqual(get_client(client.client_id).client_secret, 'rotated')
+
+        self.compile()
+        self.assertIsNotNone(registry.get_registry())
+        self.assertEqual(get_client(client.client_id).client_secret, 'rotated')
+
+    def test_deleted_client(self):
+        self.compile()
+        client_id = self.clients[1].client_id
+        self.clients[1].delete()
+        self.assertIsNone(get_client(client_id))
+
+    def test_removed_trusted_client(self):
+        self.compile()
+        TrustedClient.objects.get(client=self.trusted).delete()
+        self.assertFalse(is_trusted(self.trusted))
+
+    def test_changed_in_other_process(self):
+        self.compile()
+        client_registry = registry.get_registry()
+
+        # Another process only writes the new version to the cache.
+        cache.set(registry.VERSION_CACHE_KEY, 'changed', None)
+        with mock.patch('edx_oauth2_provider.constants.CLIENT_REGISTRY_CHECK_INTERVAL', 60):
+            self.assertIs(registry.get_registry(), client_registry)
+        self.assertIsNone(registry.get_registry())
+
+    def test_missing_version(self):
+        self.compile()
+        self.assertIsNotNone(registry.get_registry())
+
+        # Changes may have been missed once the version is evicted.
+        cache.clear()
+        self.assertIsNone(registry.get_registry())
+        self.assertEqual(get_client(self.clients[1].client_id), self.clients[1])
+
+        self.compile()
+        self.assertIsNotNone(registry.get_registry())
+
+    def test_change_while_compiling(self):
+        get_or_create_version = registry.get_or_create_version
+
+        def change_client():
+            """ Return the version, and change a client before the clients are read. """
+            version = get_or_create_version()
+            TrustedClient.objects.create(client=self.clients[1])
+            return version
+
+        with mock.patch(
+            'edx_oauth2_provider.management.commands.compile_client_registry.get_or_create_version',
+            side_effect=change_client,
+        ):
+            self.compile()
+        self.assertIsNone(registry.get_registry())
+
+    def test_corrupt_record(self):
+        self.compile()
+        client = self.clients[1]
+        client_registry = registry.get_registry()
+
+        # Point every index entry past the end of the file.
+        with open(self.path, 'r+b') as registry_file:
+            for index in range(len(client_registry)):
+                position = registry.HEADER.size + index * registry.INDEX_ENTRY.size + 20
+                registry_file.seek(position)
+                registry_file.write(struct.pack(str('>II'), 10 ** 6, 10))
+        registry.reset()
+
+        self.assertIsNone(registry.get_registry().get_record(client.client_id))
+        self.assertEqual(get_client(client.client_id), client)
+
+    def test_missing_file(self):
+        self.assertIsNone(registry.get_registry())
+        self.assertEqual(get_client(self.clients[0].client_id), self.clients[0])
+
+    def test_invalid_file(self):
+        with open(self.path, 'wb') as registry_file:
+            registry_file.write(b'invalid registry file')
+
+        self.assertIsNone(registry.get_registry())
+        self.assertTrue(is_trusted(self.trusted))
+
+    def test_no_path(self):
+        with mock.patch('edx_oauth2_provider.constants.CLIENT_REGISTRY_PATH', None):
+            with self.assertRaises(CommandError):
+                call_command('compile_client_registry')
+            self.assertIsNone(registry.get_registry())
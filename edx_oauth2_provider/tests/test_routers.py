@@ -0,0 +1,164 @@
+""" Tests for the read replica routing. """
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import mock
+from django.core.cache import cache
+from django.core.urlresolvers import reverse
+from django.test import TestCase
+from provider.oauth2.models import AccessToken
+
+from .. import routers
+from ..clients import is_trusted
+from ..routers import ReadReplicaRouter, reading_from_replica, use_read_replica
+from ..views import UserInfoView
+from .base import UserInfoTestCase
+from .factories import ClientFactory
+
+# The tests use the default database as the replica, and check the routing
+# state of the queries instead.
+REPLICA = 'default'
+
+
+@mock.patch('edx_oauth2_provider.constants.READ_REPLICA_DATABASE', REPLICA)
+class ReadReplicaRouterTest(TestCase):
+    """ Tests for `ReadReplicaRouter`. """
+
+    def test_routing(self):
+        router = ReadReplicaRouter()
+        self.assertIsNone(router.db_for_read(AccessToken))
+
+        with use_read_replica():
+            self.assertEqual(router.db_for_read(AccessToken), REPLICA)
+            self.assertIsNone(router.db_for_write(AccessToken))
+
+            with use_read_replica(False):
+                self.assertIsNone(router.db_for_read(AccessToken))
+            self.assertTrue(reading_from_replica())
+
+        self.assertFalse(reading_from_replica())
+
+    def test_no_replica(self):
+        with mock.patch('edx_oauth2_provider.constants.READ_REPLICA_DATABASE', None):
+            with use_read_replica():
+                self.assertIsNone(ReadReplicaRouter().db_for_read(AccessToken))
+
+    def test_migrations(self):
+        with mock.patch('edx_oauth2_provider.constants.READ_REPLICA_DATABASE', 'replica'):
+            self.assertFalse(ReadReplicaRouter().allow_migrate('replica', 'oauth2'))
+            self.assertIsNone(ReadReplicaRouter().allow_migrate('default', 'oauth2'))
+
+    @mock.patch('edx_oauth2_provider.constants.READ_YOUR_WRITES_WINDOW', 10)
+    def test_recent_writes(self):
+        cache.clear()
+        self.assertFalse(routers.recently_written('token'))
+
+        routers.record_write('token')
+        self.assertTrue(routers.recently_written('token'))
+
+        with mock.patch('edx_oauth2_provider.constants.READ_YOUR_WRITES_WINDOW', 0):
+            self.assertFalse(routers.recently_written('token'))
+
+    def test_trusted(self):
+        client = ClientFactory()
+
+        def exists():
+            self.assertTrue(reading_from_replica())
+            return False
+
+        with mock.patch('django.db.models.query.QuerySet.exists', side_effect=exists):
+            self.assertFalse(is_trusted(client))
+
+
+@mock.patch('edx_oauth2_provider.constants.READ_REPLICA_DATABASE', REPLICA)
+class ProtectedViewReplicaTest(UserInfoTestCase):
+    """ Tests for the routing of protected views. """
+
+    def setUp(self):
+        super(ProtectedViewReplicaTest, self).setUp()
+        self.set_access_token_scope('openid')
+        self.routing = []
+
+        get_access_token = UserInfoView.get_access_token
+
+        def record_routing(view, token):
+            self.routing.append(reading_from_replica())
+            return get_access_token(view, token)
+
+        patcher = mock.patch.object(UserInfoView, 'get_access_token', autospec=True, side_effect=record_routing)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_user_info(self):
+        def userinfo_claims(*_args):
+            self.assertTrue(reading_from_replica())
+            return {}
+
+        with mock.patch.object(UserInfoView, 'userinfo_claims', side_effect=userinfo_claims):
+            response, _ = self.get_userinfo(self.access_token.token)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.routing, [True])
+
+    def test_replication_lag(self):
+        get_access_token = UserInfoView.get_access_token.side_effect
+
+        def missing_on_replica(view, token):
+            access_token = get_access_token(view, token)
+            return None if reading_from_replica() else access_token
+
+        UserInfoView.get_access_token.side_effect = missing_on_replica
+
+        response, _ = self.get_userinfo(self.access_token.token)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.routing, [True, False])
+
+    @mock.patch('edx_oauth2_provider.constants.READ_YOUR_WRITES_WINDOW', 10)
+    def test_read_your_writes(self):
+        cache.clear()
+        routers.record_write(self.access_token.token)
+
+        response, _ = self.get_userinfo(self.access_token.token)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.routing, [False])
+
+
+@mock.patch('edx_oauth2_provider.constants.READ_REPLICA_DATABASE', REPLICA)
+class AccessTokenDetailReplicaTest(UserInfoTestCase):
+    """ Tests for the routing of the access token detail view. """
+
+    def setUp(self):
+        super(AccessTokenDetailReplicaTest, self).setUp()
+        cache.clear()
+        self.url = reverse('oauth2:access_token_detail', kwargs={'token': self.access_token.token})
+        self.routing = []
+
+    def get_detail(self, missing_on_replica=False):
+        get_token = AccessToken.objects.get_token
+
+        def record_routing(token):
+            self.routing.append(reading_from_replica())
+            if missing_on_replica and reading_from_replica():
+                raise AccessToken.DoesNotExist
+            return get_token(token)
+
+        with mock.patch.object(AccessToken.objects, 'get_token', side_effect=record_routing):
+            return self.client.get(self.url)
+
+    def test_replica(self):
+        self.assertEqual(self.get_detail().status_code, 200)
+        self.assertEqual(self.routing, [True])
+
+    def test_replication_lag(self):
+        self.assertEqual(self.get_detail(missing_on_replica=True).status_code, 200)
+        self.assertEqual(self.routing, [True, False])
+
+    @mock.patch('edx_oauth2_provider.constants.READ_YOUR_WRITES_WINDOW', 10)
+    def test_read_your_writes(self):
+        routers.record_write(self.access_token.token)
+        self.assertEqual(self.get_detail().status_code, 200)
+        self.assertEqual(self.routing, [False])
+
+    def test_missing_token(self):
+        self.url = reverse('oauth2:access_token_detail', kwargs={'token': 'missing'})
+        self.assertEqual(self.get_detail().status_code, 400)
+        self.assertEqual(self.routing, [True, False])
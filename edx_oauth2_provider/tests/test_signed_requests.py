@@ -0,0 +1,117 @@
+""" Tests for authorization requests carried in signed parameters. """
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import json
+
+import mock
+from django.core import signing
+from django.core.urlresolvers import reverse
+from django.http import QueryDict
+from django.test import RequestFactory
+
+from six.moves.urllib.parse import urlparse  # pylint: disable=import-error, wrong-import-order
+
+from ..views import SIGNED_REQUEST_PARAM, SIGNED_REQUEST_SALT, Authorize
+from .base import OAuth2TestCase
+from .factories import UserFactory
+from .util import normpath
+
+
+@mock.patch('edx_oauth2_provider.constants.SIGNED_AUTHORIZATION_REQUESTS', True)
+class SignedRequestTest(OAuth2TestCase):
+    """ Tests for the authorization flow with `OAUTH_SIGNED_AUTHORIZATION_REQUESTS`. """
+
+    def setUp(self):
+        super(SignedRequestTest, self).setUp()
+        self.client.login(username=self.user.username, password=self.password)
+        self.payload = {
+            'client_id': self.auth_client.client_id,
+            'redirect_uri': self.auth_client.redirect_uri,
+            'response_type': 'code',
+            'state': 'some_state',
+            'scope': 'openid profile',
+        }
+
+    def capture(self):
+        response = self.client.get(reverse('oauth2:capture'), self.payload)
+        self.assertEqual(response.status_code, 302)
+
+        location = urlparse(response['Location'])
+        self.assertEqual(normpath(location.path), reverse('oauth2:authorize'))
+        return QueryDict(location.query)[SIGNED_REQUEST_PARAM]
+
+    def assertNoSessionData(self):
+        self.assertFalse([key for key in self.client.session.keys() if key.startswith('oauth:')])
+
+    def assertRedirectsWithCode(self, response):
+        # The code is not carried through the redirect view in a signed request.
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(response['Location'].startswith(self.auth_client.redirect_uri))
+
+        query = QueryDict(urlparse(response['Location']).query)
+        self.assertNotIn(SIGNED_REQUEST_PARAM, query)
+        self.assertEqual(query['state'], 'some_state')
+        return query['code']
+
+    def test_trusted_flow(self):
+        self.set_trusted(self.auth_client)
+        signed_request = self.capture()
+
+        response = self.client.get(reverse('oauth2:authorize'), {SIGNED_REQUEST_PARAM: signed_request})
+        code = self.assertRedirectsWithCode(response)
+        self.assertNoSessionData()
+
+        response = self.client.post(reverse('oauth2:access_token'), {
+            'grant_type': 'authorization_code',
+            'client_id': self.auth_client.client_id,
+            'client_secret': self.client_secret,
+            'code': code,
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('id_token', json.loads(response.content.decode('utf-8')))
+
+    def test_authorization_form(self):
+        signed_request = self.capture()
+
+        response = self.client.get(reverse('oauth2:authorize'), {SIGNED_REQUEST_PARAM: signed_request})
+        self.assertEqual(response.status_code, 200)
+        signed_request = response.context['oauth_request']
+
+        response = self.client.post(reverse('oauth2:authorize'), {
+            SIGNED_REQUEST_PARAM: signed_request,
+            'authorize': 'Authorize',
+            'scope': ['openid', 'profile'],
+        })
+        self.assertRedirectsWithCode(response)
+        self.assertNoSessionData()
+
+    def test_client_secret(self):
+        request = RequestFactory().get(reverse('oauth2:authorize'))
+        request.user = self.user
+
+        view = Authorize()
+        view.cache_data(request, self.auth_client.serialize(), 'client')
+
+        data = signing.loads(view.get_signed_request(request), salt=SIGNED_REQUEST_SALT)
+        self.assertNotIn('client_secret', data['client'])
+        self.assertEqual(data['client']['client_id'], self.auth_client.client_id)
+
+    def assertExpired(self, signed_request):
+        response = self.client.get(reverse('oauth2:authorize'), {SIGNED_REQUEST_PARAM: signed_request})
+        self.assertEqual(response.context['error'], 'expired_authorization')
+
+    def test_tampered_request(self):
+        self.assertExpired(self.capture()[:-1])
+        self.assertExpired('')
+
+    def test_expired_request(self):
+        signed_request = self.capture()
+        with mock.patch('edx_oauth2_provider.constants.SIGNED_AUTHORIZATION_REQUEST_MAX_AGE', -1):
+            self.assertExpired(signed_request)
+
+    def test_other_user(self):
+        signed_request = self.capture()
+
+        user = UserFactory()
+        self.client.login(username=user.username, password=self.password)
+        self.assertExpired(signed_request)
@@ -0,0 +1,140 @@
+""" Tests for the throttling of password grants. """
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import json
+
+import mock
+from django.core.cache import cache
+from django.core.urlresolvers import reverse
+from django.test import RequestFactory, TestCase
+from provider.constants import PUBLIC
+
+from ..throttling import get_client_ip, throttle_password_grant
+from .factories import ClientFactory, UserFactory
+
+RATES = {'username': (2, 60), 'ip': (5, 60)}
+
+
+@mock.patch('edx_oauth2_provider.constants.PASSWORD_GRANT_RATES', RATES)
+class ThrottlePasswordGrantTest(TestCase):
+    """ Tests for the token buckets. """
+
+    def setUp(self):
+        super(ThrottlePasswordGrantTest, self).setUp()
+        cache.clear()
+        self.factory = RequestFactory()
+
+    def request(self, username='someone', ip_address='127.0.0.1', **extra):
+        data = {'grant_type': 'password', 'client_id': 'client', 'username': username}
+        return self.factory.post('/', data, REMOTE_ADDR=ip_address, **extra)
+
+    def test_username(self):
+        now = 1000
+        self.assertIsNone(throttle_password_grant(self.request(), now))
+        self.assertIsNone(throttle_password_grant(self.request('SomeOne '), now))
+        self.assertEqual(throttle_password_grant(self.request(), now), 30)
+
+        # Other users are not affected.
+        self.assertIsNone(throttle_password_grant(self.request('other'), now))
+
+        # The bucket refills over time.
+        self.assertEqual(throttle_password_grant(self.request(), now + 15), 15)
+        self.assertIsNone(throttle_password_grant(self.request(), now + 30))
+
+    def test_ip_address(self):
+        now = 1000
+        for index in range(5):
+            self.assertIsNone(throttle_password_grant(self.request('user{}'.format(index)), now))
+
+        self.assertEqual(throttle_password_grant(self.request('other'), now), 12)
+        self.assertIsNone(throttle_password_grant(self.request('other', '127.0.0.2'), now))
+
+    def test_client_not_throttled(self):
+        # Public client ids are known, so a client has no bucket anyone could empty.
+        with mock.patch('edx_oauth2_provider.constants.PASSWORD_GRANT_RATES', dict(RATES, client=(1, 60))):
+            self.assertIsNone(throttle_password_grant(self.request('first'), 1000))
+            self.assertIsNone(throttle_password_grant(self.request('second', '127.0.0.2'), 1000))
+
+    def test_trusted_proxies(self):
+        request = self.request(ip_address='10.0.0.1', HTTP_X_FORWARDED_FOR='1.1.1.1, 2.2.2.2, 10.0.0.2')
+        self.assertEqual(get_client_ip(request), '10.0.0.1')
+
+        with mock.patch('edx_oauth2_provider.constants.TRUSTED_PROXY_COUNT', 2):
+            self.assertEqual(get_client_ip(request), '2.2.2.2')
+            self.assertEqual(get_client_ip(self.request(ip_address='10.0.0.1')), '10.0.0.1')
+
+        # Clients behind the same proxy have their own bucket.
+        with mock.patch('edx_oauth2_provider.constants.TRUSTED_PROXY_COUNT', 1):
+            for index in range(6):
+                request = self.request('user{}'.format(index), '10.0.0.1', HTTP_X_FORWARDED_FOR='1.1.1.1')
+                retry_after = throttle_password_grant(request, 1000)
+            self.assertIsNotNone(retry_after)
+
+            request = self.request('other', '10.0.0.1', HTTP_X_FORWARDED_FOR='2.2.2.2')
+            self.assertIsNone(throttle_password_grant(request, 1000))
+
+    @mock.patch('edx_oauth2_provider.constants.CLIENT_IP_RESOLVER', __name__ + '.resolve_ip')
+    def test_ip_resolver(self):
+        self.assertEqual(get_client_ip(self.request(HTTP_X_REAL_IP='3.3.3.3')), '3.3.3.3')
+
+    def test_rejected_requests_take_no_tokens(self):
+        now = 1000
+        for index in range(5):
+            throttle_password_grant(self.request('user{}'.format(index)), now)
+
+        # The request is rejected because of the IP address bucket, so the
+        # username bucket is still full.
+        self.assertIsNotNone(throttle_password_grant(self.request('someone'), now))
+        self.assertIsNone(throttle_password_grant(self.request('someone', '127.0.0.2'), now))
+        self.assertIsNone(throttle_password_grant(self.request('someone', '127.0.0.3'), now))
+
+    def test_unconfigured_scope(self):
+        with mock.patch('edx_oauth2_provider.constants.PASSWORD_GRANT_RATES', {}):
+            for _index in range(5):
+                self.assertIsNone(throttle_password_grant(self.request(), 1000))
+
+
+def resolve_ip(request):
+    return request.META['HTTP_X_REAL_IP']
+
+
+@mock.patch('edx_oauth2_provider.constants.THROTTLE_PASSWORD_GRANTS', True)
+@mock.patch('edx_oauth2_provider.constants.PASSWORD_GRANT_RATES', RATES)
+class AccessTokenThrottlingTest(TestCase):
+    """ Tests for the throttling of the access token endpoint. """
+
+    def setUp(self):
+        super(AccessTokenThrottlingTest, self).setUp()
+        cache.clear()
+        self.user = UserFactory(password='password')
+        self.oauth_client = ClientFactory(client_type=PUBLIC)
+
+    def post(self, password):
+        return self.client.post(reverse('oauth2:access_token'), {
+            'grant_type': 'password',
+            'client_id': self.oauth_client.client_id,
+            'username': self.user.username,
+            'password': password,
+        })
+
+    def test_throttled(self):
+        self.assertEqual(self.post('wrong').status_code, 400)
+        self.assertEqual(self.post('password').status_code, 200)
+
+        with mock.patch('edx_oauth2_provider.forms.authenticate') as mock_authenticate:
+            response = self.post('password')
+            self.assertFalse(mock_authenticate.called)
+
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(json.loads(response.content.decode('utf-8'))['error'], 'temporarily_unavailable')
+        self.assertGreater(int(response['Retry-After']), 0)
+
+    def test_other_grants(self):
+        for _index in range(3):
+            response = self.client.post(reverse('oauth2:access_token'), {'grant_type': 'refresh_token'})
+            self.assertNotEqual(response.status_code, 429)
+
+    def test_disabled(self):
+        with mock.patch('edx_oauth2_provider.constants.THROTTLE_PASSWORD_GRANTS', False):
+            for _index in range(3):
+                self.assertEqual(self.post('password').status_code, 200)
@@ -0,0 +1,90 @@
+""" Tests for the access token digest index. """
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import mock
+from django.core.management import call_command
+from six import StringIO
+
+from ..models import AccessTokenDigest
+from .base import UserInfoTestCase
+from .factories import AccessTokenFactory, ClientFactory
+
+
+class AccessTokenDigestTest(UserInfoTestCase):
+    """ Tests for `AccessTokenDigest` and the token lookups using it. """
+
+    def setUp(self):
+        patcher = mock.patch('edx_oauth2_provider.constants.TOKEN_DIGEST_INDEX', True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        super(AccessTokenDigestTest, self).setUp()
+        self.set_access_token_scope('openid')
+
+    def test_digest(self):
+        digest = AccessTokenDigest.digest_for('token')
+        self.assertEqual(digest, AccessTokenDigest.digest_for(b'token'))
+        self.assertNotEqual(digest, AccessTokenDigest.digest_for('other'))
+        self.assertTrue(-2 ** 63 <= digest < 2 ** 63)
+
+    def test_created_on_issuance(self):
+        digest = AccessTokenDigest.objects.get(access_token=self.access_token)
+        self.assertEqual(digest.digest, AccessTokenDigest.digest_for(self.access_token.token))
+
+    def test_lookup(self):
+        self.assertEqual(AccessTokenDigest.get_access_token(self.access_token.token), self.access_token)
+        self.assertIsNone(AccessTokenDigest.get_access_token('missing'))
+
+        with self.assertNumQueries(1):
+            response, _ = self.get_userinfo(self.access_token.token)
+        self.assertEqual(response.status_code, 200)
+
+    def test_digest_collision(self):
+        other = AccessTokenFactory(user=self.user, client=ClientFactory(), token='other')
+        AccessTokenDigest.objects.filter(access_token=other).update(
+            digest=AccessTokenDigest.digest_for(self.access_token.token)
+        )
+
+        self.assertEqual(AccessTokenDigest.get_access_token(self.access_token.token), self.access_token)
+        self.assertIsNone(AccessTokenDigest.get_access_token('other'))
+
+    def test_fallback(self):
+        AccessTokenDigest.objects.all().delete()
+
+        with self.assertNumQueries(2):
+            response, _ = self.get_userinfo(self.access_token.token)
+        self.assertEqual(response.status_code, 200)
+
+        # Lookups do not write to the digest table.
+        self.assertFalse(AccessTokenDigest.objects.exists())
+
+    @mock.patch('edx_oauth2_provider.constants.TOKEN_DIGEST_FALLBACK', False)
+    def test_no_fallback(self):
+        with self.assertNumQueries(1):
+            response, _ = self.get_userinfo('missing')
+        self.assertEqual(response.status_code, 401)
+
+        AccessTokenDigest.objects.all().delete()
+        response, _ = self.get_userinfo(self.access_token.token)
+        self.assertEqual(response.status_code, 401)
+
+    def test_invalid_token(self):
+        with self.assertNumQueries(2):
+            response, _ = self.get_userinfo('missing')
+        self.assertEqual(response.status_code, 401)
+
+    def test_sync_command(self):
+        AccessTokenDigest.objects.all().delete()
+        with mock.patch('edx_oauth2_provider.constants.TOKEN_DIGEST_INDEX', False):
+            tokens = [AccessTokenFactory(user=self.user, client=ClientFactory()) for _index in range(3)]
+
+        out = StringIO()
+        call_command('sync_access_token_digests', chunk_size=2, stdout=out)
+        self.assertEqual(out.getvalue().strip(), 'Created 4 access token digests.')
+
+        for access_token in tokens + [self.access_token]:
+            self.assertEqual(AccessTokenDigest.get_access_token(access_token.token), access_token)
+
+        out = StringIO()
+        call_command('sync_access_token_digests', stdout=out)
+        self.assertEqual(out.getvalue().strip(), 'Created 0 access token digests.')
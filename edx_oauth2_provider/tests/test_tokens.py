@@ -0,0 +1,159 @@
+""" Tests for the bulk revocation of tokens. """
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import ddt
+import mock
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from provider.oauth2.models import AccessToken, RefreshToken
+from provider.utils import now
+from six import StringIO
+
+from ..routers import recently_written
+from ..tokens import (
+    evict_reusable_tokens,
+    get_reusable_token,
+    reusable_token_key,
+    revoke_tokens,
+    set_reusable_token
+)
+from .factories import ClientFactory, UserFactory
+
+
+@ddt.ddt
+class RevokeTokensTest(TestCase):
+    """ Tests for `revoke_tokens` and the `revoke_tokens` command. """
+
+    def setUp(self):
+        super(RevokeTokensTest, self).setUp()
+        cache.clear()
+        self.user = UserFactory()
+        self.other_user = UserFactory()
+        self.client_a = ClientFactory()
+        self.client_b = ClientFactory()
+
+        for user in (self.user, self.other_user):
+            for client in (self.client_a, self.client_b):
+                for _index in range(2):
+                    self.create_tokens(user, client)
+
+    def create_tokens(self, user, client):
+        access_token = AccessToken.objects.create(user=user, client=client, scope=1)
+        RefreshToken.objects.create(user=user, client=client, access_token=access_token)
+        return access_token
+
+    def active_tokens(self, **filters):
+        return (
+            AccessToken.objects.filter(expires__gt=now(), **filters).count(),
+            RefreshToken.objects.filter(expired=False, **filters).count(),
+        )
+
+    def test_revoke_user(self):
+        self.assertEqual(revoke_tokens(self.user, chunk_size=3), (4, 4))
+        self.assertEqual(self.active_tokens(user=self.user), (0, 0))
+        self.assertEqual(self.active_tokens(user=self.other_user), (4, 4))
+
+        # Revoked tokens are not revoked again.
+        self.assertEqual(revoke_tokens(self.user), (0, 0))
+
+    def test_revoke_client(self):
+        self.assertEqual(revoke_tokens(client=self.client_a, chunk_size=1), (4, 4))
+        self.assertEqual(self.active_tokens(client=self.client_a), (0, 0))
+        self.assertEqual(self.active_tokens(client=self.client_b), (4, 4))
+
+    def test_revoke_user_and_client(self):
+        self.assertEqual(revoke_tokens(self.user, self.client_a), (2, 2))
+        self.assertEqual(self.active_tokens(), (6, 6))
+
+    def test_chunks(self):
+        # A query for the clients, and two queries for each chunk, plus the last empty chunk.
+        with self.assertNumQueries(1 + 5 + 5):
+            revoke_tokens(self.user, chunk_size=2)
+
+    @mock.patch('provider.constants.DELETE_EXPIRED', True)
+    def test_delete(self):
+        self.assertEqual(revoke_tokens(self.user), (4, 4))
+        self.assertFalse(AccessToken.objects.filter(user=self.user).exists())
+        self.assertFalse(RefreshToken.objects.filter(user=self.user).exists())
+        self.assertEqual(AccessToken.objects.filter(user=self.other_user).count(), 4)
+
+    @mock.patch('provider.constants.DELETE_EXPIRED', True)
+    @mock.patch('edx_oauth2_provider.constants.CLIENT_CREDENTIALS_TOKEN_REUSE', True)
+    def test_delete_evicts_once(self):
+        with mock.patch('edx_oauth2_provider.tokens.evict_reusable_tokens') as evict:
+            revoke_tokens(self.user)
+        self.assertEqual(sorted(call[0][0] for call in evict.call_args_list), [self.client_a.pk, self.client_b.pk])
+
+        # Tokens deleted outside of revocations are still evicted.
+        with mock.patch('edx_oauth2_provider.tokens.evict_reusable_tokens') as evict:
+            AccessToken.objects.filter(user=self.other_user, client=self.client_a).first().delete()
+        evict.assert_called_once_with(self.client_a.pk)
+
+    @mock.patch('edx_oauth2_provider.constants.READ_REPLICA_DATABASE', 'default')
+    @mock.patch('edx_oauth2_provider.constants.READ_YOUR_WRITES_WINDOW', 10)
+    def test_recent_writes(self):
+        revoked = list(AccessToken.objects.filter(user=self.user).values_list('token', flat=True))
+        other = list(AccessToken.objects.filter(user=self.other_user).values_list('token', flat=True))
+        revoke_tokens(self.user, chunk_size=3)
+
+        # Revoked tokens are read from the primary, not from a lagging replica.
+        self.assertTrue(all(recently_written(token) for token in revoked))
+        self.assertFalse(any(recently_written(token) for token in other))
+
+    def test_missing_arguments(self):
+        with self.assertRaises(ValueError):
+            revoke_tokens()
+
+    def test_cache_eviction(self):
+        access_token = AccessToken.objects.filter(user=self.user, client=self.client_a).first()
+        other_token = AccessToken.objects.filter(user=self.other_user, client=self.client_b).first()
+        set_reusable_token(reusable_token_key(self.client_a.pk, 7), access_token)
+        set_reusable_token(reusable_token_key(self.client_b.pk, 7), other_token)
+
+        revoke_tokens(self.user, self.client_a)
+        self.assertIsNone(get_reusable_token(reusable_token_key(self.client_a.pk, 7)))
+        self.assertEqual(get_reusable_token(reusable_token_key(self.client_b.pk, 7)), other_token)
+
+    def test_revoked_while_issuing(self):
+        # The key is read before the token is issued, and the token revoked before it is cached.
+        key = reusable_token_key(self.client_a.pk, 7)
+        access_token = AccessToken.objects.filter(user=self.user, client=self.client_a).first()
+        revoke_tokens(self.user, self.client_a)
+        set_reusable_token(key, access_token)
+
+        self.assertIsNone(get_reusable_token(reusable_token_key(self.client_a.pk, 7)))
+
+    def test_eviction_generation(self):
+        access_token = AccessToken.objects.filter(client=self.client_a).first()
+        for scope in (1, 2 ** 20):
+            set_reusable_token(reusable_token_key(self.client_a.pk, scope), access_token)
+
+        # Every scope is evicted with a single cache update.
+        with mock.patch.object(cache, 'delete_many') as delete_many:
+            evict_reusable_tokens(self.client_a.pk)
+            evict_reusable_tokens(self.client_a.pk)
+        self.assertFalse(delete_many.called)
+
+        for scope in (1, 2 ** 20):
+            self.assertIsNone(get_reusable_token(reusable_token_key(self.client_a.pk, scope)))
+
+        set_reusable_token(reusable_token_key(self.client_a.pk, 1), access_token)
+        self.assertEqual(get_reusable_token(reusable_token_key(self.client_a.pk, 1)), access_token)
+
+    def test_command(self):
+        out = StringIO()
+        call_command(
+            'revoke_tokens', username=self.user.username, client_id=self.client_b.client_id, chunk_size=1, stdout=out
+        )
+        self.assertEqual(out.getvalue().strip(), 'Revoked 2 access tokens and 2 refresh tokens.')
+        self.assertEqual(self.active_tokens(user=self.user, client=self.client_b), (0, 0))
+
+    @ddt.data(
+        {},
+        {'username': 'missing'},
+        {'client_id': 'missing'},
+    )
+    def test_command_errors(self, options):
+        with self.assertRaises(CommandError):
+            call_command('revoke_tokens', **options)
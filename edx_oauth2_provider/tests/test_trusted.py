@@ -3,8 +3,12 @@ Trusted client tests.
 """
 from __future__ import absolute_import, division, print_function, unicode_literals
 
+import mock
+from django.contrib.sessions.backends.db import SessionStore
 from django.core.urlresolvers import reverse
 
+from ..constants import AUTHORIZED_CLIENTS_SESSION_KEY
+from ..views import Authorize
 from .base import OAuth2TestCase
 from .util import normpath
 
@@ -26,3 +30,64 @@ class TrustedClientTest(OAuth2TestCase):
         # Check if consent form is being shown
         form_action = 'action="{}"'.format(normpath(reverse("oauth2:authorize")))
         self.assertContains(response, form_action, status_code=200)
+
+
+class AuthorizedClientsTest(OAuth2TestCase):
+    """
+    Tests for the list of clients authorized during a session.
+    """
+    def setUp(self):
+        super(AuthorizedClientsTest, self).setUp()
+        self.session = SessionStore()
+
+    def test_add_client(self):
+        Authorize().add_authorized_client(self.session, 'first')
+        Authorize().add_authorized_client(self.session, 'second')
+
+        self.assertTrue(self.session.modified)
+        self.assertEqual(self.session[AUTHORIZED_CLIENTS_SESSION_KEY], ['first', 'second'])
+
+    def test_existing_client(self):
+        self.session[AUTHORIZED_CLIENTS_SESSION_KEY] = ['first', 'second']
+        self.session.save()
+        self.session = SessionStore(self.session.session_key)
+
+        Authorize().add_authorized_client(self.session, 'first')
+
+        self.assertFalse(self.session.modified)
+        self.assertEqual(self.session[AUTHORIZED_CLIENTS_SESSION_KEY], ['first', 'second'])
+
+    @mock.patch('edx_oauth2_provider.constants.AUTHORIZED_CLIENTS_MAX', 2)
+    def test_max_clients(self):
+        for client_id in ('first', 'second', 'third'):
+            Authorize().add_authorized_client(self.session, client_id)
+
+        self.assertEqual(self.session[AUTHORIZED_CLIENTS_SESSION_KEY], ['second', 'third'])
+
+    @mock.patch('edx_oauth2_provider.constants.AUTHORIZED_CLIENTS_MAX', 0)
+    def test_no_clients(self):
+        Authorize().add_authorized_client(self.session, 'first')
+
+        self.assertFalse(self.session.modified)
+        self.assertNotIn(AUTHORIZED_CLIENTS_SESSION_KEY, self.session)
+
+    def test_authorize_again(self):
+        self.login_and_authorize(trusted=True)
+
+        add_authorized_client = Authorize.add_authorized_client
+        calls = []
+
+        def record_client_ids(view, session, client_id):
+            """ Record the list of clients before and after adding `client_id`. """
+            before = session[AUTHORIZED_CLIENTS_SESSION_KEY]
+            add_authorized_client(view, session, client_id)
+            calls.append((before, session[AUTHORIZED_CLIENTS_SESSION_KEY]))
+
+        with mock.patch.object(Authorize, 'add_authorized_client', autospec=True, side_effect=record_client_ids):
+            self.login_and_authorize(trusted=True)
+
+        # The list is neither changed nor assigned to the session again.
+        self.assertEqual(len(calls), 1)
+        before, after = calls[0]
+        self.assertIs(after, before)
+        self.assertEqual(self.client.session[AUTHORIZED_CLIENTS_SESSION_KEY], [self.auth_client.client_id])
@@ -3,7 +3,11 @@ Userinfo tests.
 """
 from __future__ import absolute_import, division, print_function, unicode_literals
 
+import time
+
+import mock
 import six
+from django.utils.module_loading import import_string
 
 from .base import UserInfoTestCase
 
@@ -86,3 +90,90 @@ class UserInfoViewTest(UserInfoTestCase):
         response, claims = self.get_userinfo(token, scope_request, claims_request)
 
         self.assertIn('test', claims)
+
+    def test_invalid_claims_request(self):
+        token = self.access_token.token
+        self.set_access_token_scope('openid')
+
+        response = self.get_with_authorization(self.path, token, {'claims': '{"userinfo": '})
+        self.assertEqual(response.status_code, 400)
+
+    def test_single_query(self):
+        # The token, user and client should be loaded in one query.
+        token = self.access_token.token
+        self.set_access_token_scope('openid profile email')
+
+        with self.assertNumQueries(1):
+            response, _ = self.get_userinfo(token)
+        self.assertEqual(response.status_code, 200)
+
+    def test_cache_headers(self):
+        self.set_access_token_scope('openid profile')
+        token = self.access_token.token
+
+        response, _ = self.get_userinfo(token)
+        self.assertEqual(response['Cache-Control'], 'private, max-age=60')
+        self.assertEqual(response['Vary'], 'Authorization')
+
+        etag = response['ETag']
+        self.assertTrue(etag.startswith('"'))
+
+        response = self.get_with_authorization(self.path, token)
+        self.assertEqual(response['ETag'], etag)
+
+        # Different claims have a different ETag.
+        response, _ = self.get_userinfo(token, 'openid')
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_cache_max_age(self):
+        self.set_access_token_scope('openid')
+        token = self.access_token.token
+
+        with mock.patch('provider.oauth2.models.AccessToken.get_expire_delta', return_value=10):
+            response, _ = self.get_userinfo(token)
+        self.assertEqual(response['Cache-Control'], 'private, max-age=10')
+
+    def test_not_modified(self):
+        self.set_access_token_scope('openid')
+        token = self.access_token.token
+        etag = self.get_userinfo(token)[0]['ETag']
+
+        response = self.client.get(self.path, HTTP_AUTHORIZATION='Bearer ' + token, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['ETag'], etag)
+
+        self.user.username = 'changed'
+        self.user.save()
+        self.set_access_token_scope('openid profile')
+        response = self.client.get(self.path, HTTP_AUTHORIZATION='Bearer ' + token, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    @mock.patch('edx_oauth2_provider.oidc.collect._executor', None)
+    @mock.patch('edx_oauth2_provider.constants.HANDLER_MAX_WORKERS', 2)
+    def test_essential_claim_timeout(self):
+        self.set_access_token_scope('openid')
+        token = self.access_token.token
+        handlers = [import_string('edx_oauth2_provider.oidc.handlers.BasicUserInfoHandler'), TimeoutHandler]
+
+        with mock.patch.dict('edx_oauth2_provider.oidc.core.HANDLERS', {'userinfo': handlers}):
+            response, claims = self.get_userinfo(token, 'openid', {'late': {'essential': False}})
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('late', claims)
+            self.assertIn('sub', claims)
+
+            response, claims = self.get_userinfo(token, 'openid', {'late': {'essential': True}})
+            self.assertEqual(response.status_code, 503)
+            self.assertEqual(claims['error'], 'temporarily_unavailable')
+
+
+class TimeoutHandler(object):
+    """ Handler whose claim is never available in time. """
+    timeout = 0
+
+    def scope_openid(self, data):  # pylint: disable=unused-argument
+        return ['late']
+
+    def claim_late(self, data):  # pylint: disable=unused-argument
+        time.sleep(0.5)
+        return 'late'
@@ -0,0 +1,124 @@
+"""
+Batch userinfo tests.
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import json
+
+import mock
+from django.core.urlresolvers import reverse
+
+from ..oidc import collect
+from ..oidc.handlers import ProfileHandler
+from .base import UserInfoTestCase
+from .factories import AccessTokenFactory, UserFactory
+
+
+class PrefetchHandler(ProfileHandler):
+    """ Profile handler loading the usernames of the batch at once. """
+
+    prefetched = []
+
+    def prefetch(self, data):
+        self.prefetched.append(data)
+        self.usernames = {user.pk: user.username.upper() for user in data['users']}
+
+    def claim_preferred_username(self, data):
+        return self.usernames[data['user'].pk]
+
+
+class BatchUserInfoViewTest(UserInfoTestCase):
+    """ Tests for `BatchUserInfoView`. """
+
+    def setUp(self):
+        super(BatchUserInfoViewTest, self).setUp()
+        self.batch_path = reverse('oauth2:user_info_batch')
+        self.auth_client.user = self.user
+        self.auth_client.save()
+        self.set_access_token_scope('openid profile')
+        self.set_trusted(self.auth_client)
+        self.users = [UserFactory() for _index in range(3)]
+
+    def post_batch(self, user_ids, token=None, **payload):
+        payload['user_ids'] = ','.join(str(user_id) for user_id in user_ids)
+        token = token or self.access_token.token
+        return self.client.post(self.batch_path, payload, HTTP_AUTHORIZATION='Bearer {}'.format(token))
+
+    def get_lines(self, response):
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        content = b''.join(response.streaming_content).decode('utf-8')
+        return [json.loads(line) for line in content.splitlines()]
+
+    def test_batch(self):
+        user_ids = [user.pk for user in self.users]
+        lines = self.get_lines(self.post_batch(user_ids + [0]))
+
+        self.assertEqual([line['user_id'] for line in lines], user_ids + [0])
+        for user, line in zip(self.users, lines):
+            self.assertEqual(line['claims']['sub'], str(user.pk))
+            self.assertEqual(line['claims']['preferred_username'], user.username)
+        self.assertEqual(lines[-1], {'user_id': 0, 'error': 'not_found'})
+
+    def test_scope(self):
+        lines = self.get_lines(self.post_batch([self.users[0].pk], scope='openid'))
+        self.assertEqual(lines[0]['claims'], {'sub': str(self.users[0].pk)})
+
+        # Scopes missing from the access token are ignored.
+        lines = self.get_lines(self.post_batch([self.users[0].pk], scope='openid email'))
+        self.assertNotIn('email', lines[0]['claims'])
+
+    def test_bulk_loading(self):
+        users = [UserFactory() for _index in range(20)]
+        response = self.post_batch([user.pk for user in users])
+
+        # A single query loads the users of each chunk.
+        with self.assertNumQueries(1):
+            lines = self.get_lines(response)
+        self.assertEqual(len(lines), 20)
+
+    def test_prefetch(self):
+        PrefetchHandler.prefetched = []
+        with mock.patch.dict(collect._indexes):  # pylint: disable=protected-access
+            with mock.patch.dict('edx_oauth2_provider.oidc.core.HANDLERS', userinfo=[PrefetchHandler]):
+                lines = self.get_lines(self.post_batch([user.pk for user in self.users]))
+
+        self.assertEqual(len(PrefetchHandler.prefetched), 1)
+        self.assertEqual(PrefetchHandler.prefetched[0]['users'], self.users)
+        for user, line in zip(self.users, lines):
+            self.assertEqual(line['claims']['preferred_username'], user.username.upper())
+
+    def test_untrusted_client(self):
+        self.set_trusted(self.auth_client, False)
+        response = self.post_batch([self.users[0].pk])
+        self.assertEqual(response.status_code, 403)
+
+    def test_user_token(self):
+        # Tokens of a trusted client issued for another user than its owner.
+        access_token = AccessTokenFactory(user=self.users[0], client=self.auth_client, scope=self.access_token.scope)
+        response = self.post_batch([self.users[1].pk], token=access_token.token)
+        self.assertEqual(response.status_code, 403)
+
+        self.auth_client.user = None
+        self.auth_client.save()
+        response = self.post_batch([self.users[1].pk])
+        self.assertEqual(response.status_code, 403)
+
+    def test_missing_openid_scope(self):
+        self.set_access_token_scope('profile')
+        response = self.post_batch([self.users[0].pk])
+        self.assertEqual(response.status_code, 400)
+
+    def test_invalid_user_ids(self):
+        response = self.client.post(
+            self.batch_path, {'user_ids': '1,abc'}, HTTP_AUTHORIZATION='Bearer {}'.format(self.access_token.token)
+        )
+        self.assertEqual(response.status_code, 400)
+
+        with mock.patch('edx_oauth2_provider.constants.USERINFO_BATCH_MAX_SIZE', 2):
+            response = self.post_batch([user.pk for user in self.users])
+        self.assertEqual(response.status_code, 400)
+
+    def test_invalid_token(self):
+        response = self.post_batch([self.users[0].pk], token='invalid')
+        self.assertEqual(response.status_code, 401)
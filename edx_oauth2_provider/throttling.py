@@ -0,0 +1,109 @@
+"""
+Throttling of password grants.
+
+Every password grant costs at least one password hash, so repeated guesses
+against the token endpoint are limited before any credentials are checked.
+Each request takes one token from a bucket for its username and its source
+IP address. Buckets are stored in the Django cache, and refill over time
+according to `OAUTH_PASSWORD_GRANT_RATES`.
+
+There is no bucket per client: requests are throttled before the client is
+authenticated, and the ids of public clients are not secret, so anyone could
+empty the bucket of a public client and block all of its users.
+
+The source IP address is `REMOTE_ADDR`, or, behind `OAUTH_TRUSTED_PROXY_COUNT`
+reverse proxies, the address added to `X-Forwarded-For` by the first of them.
+`OAUTH_CLIENT_IP_RESOLVER` can instead be the dotted path of a function
+returning the address of a request.
+
+Buckets are read and written without locking, so concurrent requests may
+take a few more tokens than configured.
+
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import hashlib
+import math
+import time
+
+from django.core.cache import cache
+from django.utils.encoding import force_bytes
+from django.utils.module_loading import import_string
+
+from . import constants
+
+CACHE_KEY = 'edx_oauth2_provider.throttle.{scope}.{digest}'
+
+
+def get_identifiers(request):
+    """ Return the username and IP address of a password grant request, by throttling scope. """
+    username = request.POST.get('username')
+
+    return {
+        'username': username.strip().lower() if username else None,
+        'ip': get_client_ip(request),
+    }
+
+
+def get_client_ip(request):
+    """ Return the IP address of the client of `request`. """
+    if constants.CLIENT_IP_RESOLVER:
+        return import_string(constants.CLIENT_IP_RESOLVER)(request)
+
+    if constants.TRUSTED_PROXY_COUNT > 0:
+        # Each proxy appends the address it received the request from, so
+        # only the last addresses, added by the trusted proxies, are reliable.
+        forwarded_for = [
+            address.strip() for address in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',') if address.strip()
+        ]
+        if len(forwarded_for) >= constants.TRUSTED_PROXY_COUNT:
+            return forwarded_for[-constants.TRUSTED_PROXY_COUNT]
+
+    return request.META.get('REMOTE_ADDR')
+
+
+def throttle_password_grant(request, now=None):
+    """
+    Take a token from each bucket of a password grant request.
+
+    Returns None if the request is allowed, or the number of seconds to wait
+    before retrying if any of its buckets is empty. Rejected requests do not
+    take tokens.
+
+    """
+    now = time.time() if now is None else now
+
+    rates = {}
+    for scope, identifier in get_identifiers(request).items():
+        if identifier and scope in constants.PASSWORD_GRANT_RATES:
+            rates[_cache_key(scope, identifier)] = constants.PASSWORD_GRANT_RATES[scope]
+
+    if not rates:
+        return None
+
+    buckets = cache.get_many(list(rates))
+
+    retry_after = 0
+    tokens = {}
+    for key, (capacity, period) in rates.items():
+        available, updated = buckets.get(key, (capacity, now))
+        available = min(capacity, available + (now - updated) * capacity / period)
+
+        if available < 1:
+            retry_after = max(retry_after, (1 - available) * period / capacity)
+        tokens[key] = available - 1
+
+    if retry_after:
+        return int(math.ceil(retry_after))
+
+    # A bucket left alone for its whole period is full again, so it can expire.
+    for key, available in tokens.items():
+        cache.set(key, (available, now), int(math.ceil(rates[key][1])))
+
+    return None
+
+
+def _cache_key(scope, identifier):
+    """ Return the cache key of a bucket. Identifiers are hashed, so any value is a valid key. """
+    digest = hashlib.sha1(force_bytes(identifier)).hexdigest()
+    return CACHE_KEY.format(scope=scope, digest=digest)
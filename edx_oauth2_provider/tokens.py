@@ -0,0 +1,161 @@
+"""
+Reuse of client credentials access tokens.
+
+Service clients using the client credentials grant usually request a new
+token far more often than their tokens expire. When
+`OAUTH_CLIENT_CREDENTIALS_TOKEN_REUSE` is enabled, the token issued to a
+client is kept in the Django cache, keyed by the client and the requested
+scope, and returned again to the following requests. Tokens are kept until
+`OAUTH_CLIENT_CREDENTIALS_MIN_LIFETIME` seconds before they expire, so
+clients never get a token about to expire.
+
+Tokens of a user or client can be revoked in bulk with :func:`revoke_tokens`,
+which also removes the revoked tokens from the cache, once per client. Cached
+tokens of a client are also removed when any of its tokens is saved or
+deleted, for instance from the admin, or by the cleanup of expired tokens.
+
+Revoked access tokens are read from the primary database during the
+read-your-writes window, see `edx_oauth2_provider.routers`. Without the
+window, a lagging replica accepts them until the revocation reaches it.
+
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import logging
+import threading
+from datetime import timedelta
+
+import provider.constants
+from django.core.cache import cache
+from provider.oauth2.models import AccessToken, RefreshToken
+from provider.utils import now
+
+from . import constants
+from .routers import record_writes
+
+log = logging.getLogger(__name__)
+
+CACHE_KEY = 'edx_oauth2_provider.client_credentials.{client_pk}.{generation}.{scope}'
+
+# Generation of the cached tokens of a client, part of their keys, and
+# incremented to evict all of them at once.
+GENERATION_CACHE_KEY = 'edx_oauth2_provider.client_credentials.{client_pk}.generation'
+
+_local = threading.local()
+
+
+def reusable_token_key(client_pk, scope):
+    """
+    Return the cache key of the token of a client for the requested `scope`.
+
+    The key is in the current generation of the client, so it is read before
+    issuing a new token: a revocation made while the token is issued moves the
+    client to a new generation, where the token is never found.
+
+    """
+    generation = cache.get(GENERATION_CACHE_KEY.format(client_pk=client_pk), 0)
+    return CACHE_KEY.format(client_pk=client_pk, generation=generation, scope=scope)
+
+
+def get_reusable_token(key):
+    """ Return the access token cached under `key`, see `reusable_token_key`, or None. """
+    return cache.get(key)
+
+
+def set_reusable_token(key, access_token):
+    """ Cache `access_token` under `key`, see `reusable_token_key`, until shortly before it expires. """
+    timeout = access_token.get_expire_delta() - constants.CLIENT_CREDENTIALS_MIN_LIFETIME
+    if timeout > 0:
+        cache.set(key, access_token, timeout)
+
+
+def evict_reusable_tokens(client_pk):
+    """ Remove the cached tokens of a client, for every requested scope, by moving to a new generation. """
+    key = GENERATION_CACHE_KEY.format(client_pk=client_pk)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Without a generation, tokens are cached in generation 0.
+        cache.set(key, 1, None)
+
+
+def revoking_tokens():
+    """ Return whether the current thread is revoking tokens, and removes the cached tokens once done. """
+    return getattr(_local, 'revoking', False)
+
+
+def revoke_tokens(user=None, client=None, chunk_size=1000):
+    """
+    Revoke all the active access and refresh tokens of `user`, `client`, or both.
+
+    Tokens are expired, or deleted if `OAUTH_DELETE_EXPIRED` is enabled, with
+    one statement per chunk of `chunk_size` tokens, and the cached tokens of
+    their clients are removed.
+
+    Returns the number of revoked access tokens and refresh tokens.
+
+    """
+    if user is None and client is None:
+        raise ValueError('A user or a client is required to revoke tokens.')
+
+    filters = {}
+    if user is not None:
+        filters['user'] = user
+    if client is not None:
+        filters['client'] = client
+
+    # Refresh tokens first, so deleting access tokens does not cascade to them.
+    refresh_tokens = RefreshToken.objects.filter(expired=False, **filters)
+    access_tokens = AccessToken.objects.filter(expires__gt=now(), **filters)
+    client_pks = set(access_tokens.values_list('client_id', flat=True).distinct())
+
+    _local.revoking = True
+    try:
+        refresh_count = _revoke_in_chunks(refresh_tokens, chunk_size, expired=True)
+        access_count = _revoke_in_chunks(
+            access_tokens, chunk_size, record_tokens=True, expires=now() - timedelta(milliseconds=1)
+        )
+    finally:
+        _local.revoking = False
+
+    for client_pk in client_pks:
+        evict_reusable_tokens(client_pk)
+
+    log.info(
+        'Revoked %d access tokens and %d refresh tokens of user %s and client %s.',
+        access_count, refresh_count,
+        getattr(user, 'pk', None), getattr(client, 'client_id', None),
+    )
+
+    return access_count, refresh_count
+
+
+def _revoke_in_chunks(queryset, chunk_size, record_tokens=False, **values):
+    """
+    Update the tokens of `queryset` with `values`, or delete them, in chunks.
+
+    If `record_tokens` is set, the revoked tokens are recorded as recent
+    writes, so they are read from the primary database. Returns the number of
+    tokens.
+
+    """
+    count = 0
+    last_pk = 0
+    while True:
+        rows = list(queryset.filter(pk__gt=last_pk).order_by('pk').values_list('pk', 'token')[:chunk_size])
+        if not rows:
+            break
+        pks = [pk for pk, _token in rows]
+        last_pk = pks[-1]
+
+        chunk = queryset.model.objects.filter(pk__in=pks)
+        if provider.constants.DELETE_EXPIRED:
+            chunk.delete()
+        else:
+            chunk.update(**values)
+        count += len(pks)
+
+        if record_tokens:
+            record_writes(token for _pk, token in rows)
+
+    return count
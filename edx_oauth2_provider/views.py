@@ -4,64 +4,217 @@ Customized django-oauth2-provider views, aligned with the OpenID specification.
 """
 from __future__ import absolute_import, division, print_function, unicode_literals
 
+import hashlib
 import json
 
-from django.http import HttpResponse
-from django.views.generic import View
-
+from django.conf import settings
+from django.contrib.auth import get_user_model, logout
+from django.core import signing
+from django.core.urlresolvers import reverse
+from django.http import HttpResponse, HttpResponseNotModified, QueryDict, StreamingHttpResponse
+from django.shortcuts import resolve_url
+from django.utils.cache import patch_vary_headers
+from django.utils.http import is_safe_url, urlencode
+from django.views.generic import TemplateView, View
+
+import provider.constants
 import provider.oauth2.forms
 import provider.oauth2.views
 import provider.scope
-from provider.oauth2.models import AccessToken
-from provider.oauth2.views import Capture, OAuthError, Redirect  # pylint: disable=unused-import
+from provider.oauth2.models import AccessToken, Client
+from provider.oauth2.views import OAuthError
+from six.moves.urllib.parse import urlparse  # pylint: disable=import-error
 
 from . import constants, oidc
-from .backends import PublicPasswordBackend
+from .audit import record_event
+from .backends import BasicClientBackend, PublicPasswordBackend, RequestParamsClientBackend
+from .clients import get_client, is_trusted
+from .codes import encode_code
 from .forms import (
     AuthorizationCodeGrantForm,
     AuthorizationForm,
     AuthorizationRequestForm,
+    ClientCredentialsGrantForm,
     PasswordGrantForm,
     RefreshTokenGrantForm
 )
-from .models import TrustedClient
+from .models import AccessTokenDigest
+from .quotas import check_quota
+from .routers import record_write, use_read_replica, use_replica_for
+from .throttling import throttle_password_grant
+from .tokens import get_reusable_token, reusable_token_key, set_reusable_token
+
+
+QUOTA_EXCEEDED_ERROR = {
+    'error': 'temporarily_unavailable',
+    'error_description': 'The client request quota has been exceeded, retry later.'
+}
+
+# Number of users loaded and serialized at a time by the batch UserInfo endpoint.
+USERINFO_BATCH_CHUNK_SIZE = 100
+
+
+SIGNED_REQUEST_PARAM = 'oauth_request'
+SIGNED_REQUEST_SALT = 'edx_oauth2_provider.signed_request'
+
+
+class SignedRequestMixin(object):
+    """
+    Carries the authorization request between the `Capture`, `Authorize`
+    and `Redirect` views.
+
+    By default the request is stored in the session. When
+    `OAUTH_SIGNED_AUTHORIZATION_REQUESTS` is enabled, it is instead signed,
+    and passed to the next view in the `oauth_request` parameter of its URL.
+    Signed requests are bound to the user, and expire after
+    `OAUTH_SIGNED_AUTHORIZATION_REQUEST_MAX_AGE` seconds.
+
+    Signed requests are readable by the user, and end up in logs and in the
+    browser history, so the authorization code is never signed: once it is
+    issued, the user is redirected to the client directly, instead of going
+    through the `Redirect` view.
+
+    """
+    _signed_data = None
+
+    def get_data(self, request, key='params'):
+        if not constants.SIGNED_AUTHORIZATION_REQUESTS:
+            return super(SignedRequestMixin, self).get_data(request, key)
+        return self.get_signed_data(request).get(key)
+
+    def cache_data(self, request, data, key='params'):
+        if not constants.SIGNED_AUTHORIZATION_REQUESTS:
+            return super(SignedRequestMixin, self).cache_data(request, data, key)
+
+        if isinstance(data, QueryDict):
+            data = data.dict()
+        elif key == 'client':
+            # Signed data is readable by the user, so it must not include the client secret.
+            data = {'client_id': data['client_id'], 'redirect_uri': data['redirect_uri']}
+
+        self.get_signed_data(request)[key] = data
+
+    def clear_data(self, request):
+        if not constants.SIGNED_AUTHORIZATION_REQUESTS:
+            return super(SignedRequestMixin, self).clear_data(request)
+        self._signed_data = {}
+
+    def get_redirect_url(self, request):
+        url = super(SignedRequestMixin, self).get_redirect_url(request)
+        if not constants.SIGNED_AUTHORIZATION_REQUESTS:
+            return url
+
+        if 'code' in self.get_signed_data(request):
+            redirect = Redirect()
+            redirect._signed_data = self.get_signed_data(request)  # pylint: disable=protected-access
+            return redirect.get(request)['Location']
+
+        return '{}?{}'.format(url, urlencode({SIGNED_REQUEST_PARAM: self.get_signed_request(request)}))
+
+    def get_signed_data(self, request):
+        """ Return the data of the signed request, or an empty dict if it is missing or invalid. """
+        if self._signed_data is None:
+            value = request.GET.get(SIGNED_REQUEST_PARAM) or request.POST.get(SIGNED_REQUEST_PARAM)
+            self._signed_data = {}
+            if value:
+                try:
+                    data = signing.loads(
+                        value, salt=SIGNED_REQUEST_SALT, max_age=constants.SIGNED_AUTHORIZATION_REQUEST_MAX_AGE
+                    )
+                except signing.BadSignature:
+                    data = {}
+                if data.pop('user', None) == request.user.pk:
+                    self._signed_data = data
+        return self._signed_data
+
+    def get_signed_request(self, request):
+        """ Return the signed request carrying the current data. """
+        data = dict(self.get_signed_data(request), user=request.user.pk)
+        return signing.dumps(data, salt=SIGNED_REQUEST_SALT, compress=True)
+
+
+class Capture(SignedRequestMixin, provider.oauth2.views.Capture):
+    """ Captures the authorization request parameters, see `SignedRequestMixin`. """
+
+
+class Redirect(SignedRequestMixin, provider.oauth2.views.Redirect):
+    """ Redirects the user back to the client, see `SignedRequestMixin`. """
 
 
 # pylint: disable=abstract-method
-class Authorize(provider.oauth2.views.Authorize):
+class Authorize(SignedRequestMixin, provider.oauth2.views.Authorize):
     """
     edX customized authorization view:
       - Introduces trusted clients, which do not require user consent.
     """
+    def get_client(self, client_id):
+        return get_client(client_id)
+
     def get_request_form(self, client, data):
         return AuthorizationRequestForm(data, client=client)
 
     def get_authorization_form(self, _request, client, data, client_data):
         # Check if the client is trusted. If so, bypass user
         # authorization by filling the data in the form.
-        trusted = TrustedClient.objects.filter(client=client).exists()
-        if trusted:
+        if is_trusted(client):
             scope_names = provider.scope.to_names(client_data['scope'])
             data = {'authorize': ['Authorize'], 'scope': scope_names, 'nonce': client_data.get('nonce', '')}
 
         form = AuthorizationForm(data)
         return form
 
+    def save_authorization(self, request, client, form, client_data):
+        if not constants.SIGNED_AUTHORIZATION_CODES:
+            return super(Authorize, self).save_authorization(request, client, form, client_data)
+
+        grant = form.save(commit=False)
+
+        if grant is None:
+            return None
+
+        grant.user = request.user
+        grant.client = client
+        grant.redirect_uri = client_data.get('redirect_uri', '')
+        return encode_code(grant)
+
+    def render_to_response(self, context, **response_kwargs):
+        if constants.SIGNED_AUTHORIZATION_REQUESTS:
+            # Authorization forms must post the signed request back, in an `oauth_request` field.
+            context = dict(context, oauth_request=self.get_signed_request(self.request))
+        return super(Authorize, self).render_to_response(context, **response_kwargs)
+
     def handle(self, request, post_data=None):
         response = super(Authorize, self).handle(request, post_data)
 
         if response.status_code < 400:
             # Store the ID of the client being used for authorization. We will use
             # this later to determine which clients to log out.
-            client_id = request.session.get('oauth:client', {}).get('client_id')
+            client_id = (self.get_data(request, 'client') or {}).get('client_id')
 
             if client_id:
-                client_ids = set(request.session.get(constants.AUTHORIZED_CLIENTS_SESSION_KEY, []))
-                client_ids.add(client_id)
-                request.session[constants.AUTHORIZED_CLIENTS_SESSION_KEY] = list(client_ids)
+                self.add_authorized_client(request.session, client_id)
 
         return response
 
+    def add_authorized_client(self, session, client_id):
+        """
+        Add `client_id` to the list of clients authorized during the session.
+
+        The session is only modified if the client is not already in the list.
+        Only the most recently authorized `OAUTH_OIDC_AUTHORIZED_CLIENTS_MAX`
+        clients are kept, so the session does not keep growing. No clients are
+        kept if it is 0.
+
+        """
+        if constants.AUTHORIZED_CLIENTS_MAX <= 0:
+            return
+
+        client_ids = session.get(constants.AUTHORIZED_CLIENTS_SESSION_KEY, [])
+
+        if client_id not in client_ids:
+            client_ids = list(client_ids) + [client_id]
+            session[constants.AUTHORIZED_CLIENTS_SESSION_KEY] = client_ids[-constants.AUTHORIZED_CLIENTS_MAX:]
+
 
 # pylint: disable=abstract-method
 class AccessTokenView(provider.oauth2.views.AccessTokenView):
@@ -79,12 +232,52 @@ class AccessTokenView(provider.oauth2.views.AccessTokenView):
 
     """
 
-    # Add custom authentication provider, to support email as username.
-    authentication = (provider.oauth2.views.AccessTokenView.authentication +
-                      (PublicPasswordBackend, ))
+    # Use the client cache to authenticate clients, and a custom public
+    # client backend, to support email as username.
+    authentication = (
+        BasicClientBackend,
+        RequestParamsClientBackend,
+        PublicPasswordBackend,
+    )
+
+    def post(self, request):
+        if constants.THROTTLE_PASSWORD_GRANTS and request.POST.get('grant_type') == 'password':
+            retry_after = throttle_password_grant(request)
+            if retry_after is not None:
+                response = self.error_response({
+                    'error': 'temporarily_unavailable',
+                    'error_description': 'Too many password grant attempts, retry later.'
+                }, status=429)
+                response['Retry-After'] = str(retry_after)
+                return response
+
+        return super(AccessTokenView, self).post(request)
+
+    def get_handler(self, grant_type):
+        handler = super(AccessTokenView, self).get_handler(grant_type)
+
+        if handler is None or not constants.CLIENT_QUOTAS:
+            return handler
+
+        def check_quota_handler(request, data, client):
+            """ Count the request against the client quota before handling it. """
+            retry_after = check_quota(client)
+            if retry_after is not None:
+                response = self.error_response(QUOTA_EXCEEDED_ERROR, status=429)
+                response['Retry-After'] = str(retry_after)
+                return response
+            return handler(request, data, client)
+
+        return check_quota_handler
 
     # The following grant overrides make sure the view uses our customized forms.
 
+    def create_access_token(self, request, user, scope, client):
+        access_token = super(AccessTokenView, self).create_access_token(request, user, scope, client)
+        # Tokens issued by this request are deleted if the response fails, see `get_id_token`.
+        access_token.issued_by_request = True
+        return access_token
+
     # pylint: disable=no-member
     def get_authorization_code_grant(self, _request, data, client):
         form = AuthorizationCodeGrantForm(data, client=client)
@@ -92,6 +285,11 @@ class AccessTokenView(provider.oauth2.views.AccessTokenView):
             raise OAuthError(form.errors)
         return form.cleaned_data.get('grant')
 
+    def invalidate_grant(self, grant):
+        # Signed codes are never saved, and were already marked as used.
+        if grant.pk is not None:
+            super(AccessTokenView, self).invalidate_grant(grant)
+
     # pylint: disable=no-member
     def get_refresh_token_grant(self, _request, data, client):
         form = RefreshTokenGrantForm(data, client=client)
@@ -99,6 +297,13 @@ class AccessTokenView(provider.oauth2.views.AccessTokenView):
             raise OAuthError(form.errors)
         return form.cleaned_data.get('refresh_token')
 
+    # pylint: disable=no-member
+    def get_client_credentials_grant(self, _request, data, client):
+        form = ClientCredentialsGrantForm(data, client=client)
+        if not form.is_valid():
+            raise OAuthError(form.errors)
+        return form.cleaned_data
+
     # pylint: disable=no-member
     def get_password_grant(self, _request, data, client):
         # Use customized form to allow use of user email during authentication.
@@ -107,6 +312,42 @@ class AccessTokenView(provider.oauth2.views.AccessTokenView):
             raise OAuthError(form.errors)
         return form.cleaned_data
 
+    def client_credentials(self, request, data, client):
+        """
+        Handle client credentials grants, issuing tokens to the user of the client.
+
+        Only confidential clients with a user can use this grant. When
+        `OAUTH_CLIENT_CREDENTIALS_TOKEN_REUSE` is enabled, unexpired tokens
+        are returned again from the cache, see `edx_oauth2_provider.tokens`.
+
+        """
+        if client.client_type != provider.constants.CONFIDENTIAL or client.user_id is None:
+            raise OAuthError({'error': 'unauthorized_client'})
+
+        scope = self.get_client_credentials_grant(request, data, client).get('scope')
+
+        if constants.CLIENT_CREDENTIALS_TOKEN_REUSE:
+            cache_key = reusable_token_key(client.pk, scope)
+            access_token = get_reusable_token(cache_key)
+            if access_token is not None:
+                return self.access_token_response(access_token)
+
+        access_token, _refresh_token = self.get_access_and_refresh_tokens(
+            request,
+            user=client.user,
+            scope=scope,
+            client=client,
+            reuse_existing_access_token=provider.constants.SINGLE_ACCESS_TOKEN,
+            create_refresh_token=False,
+        )
+        response = self.access_token_response(access_token)
+
+        # Cache the token once the response has updated its scope.
+        if constants.CLIENT_CREDENTIALS_TOKEN_REUSE:
+            set_reusable_token(cache_key, access_token)
+
+        return response
+
     # pylint: disable=super-on-old-class
     def access_token_response_data(self, access_token, response_type=None, nonce=''):
         """
@@ -131,9 +372,22 @@ class AccessTokenView(provider.oauth2.views.AccessTokenView):
             extra_data['id_token'] = self.encode_id_token(id_token).decode('utf-8')
             scope = provider.scope.to_int(*id_token.scopes)
 
-        # Update the token scope, so it includes only authorized values.
-        access_token.scope = scope
-        access_token.save()
+        # Update the token scope, so it includes only authorized values. The
+        # token has already been persisted, so only write it back if the
+        # scope actually changed, and then only the scope column.
+        if access_token.scope != scope:
+            access_token.scope = scope
+            access_token.save(update_fields=['scope'])
+
+        # Read the new token from the primary until it reaches the replica.
+        record_write(access_token.token)
+
+        record_event(
+            'token_issued',
+            client_id=access_token.client.client_id,
+            user_id=access_token.user_id,
+            scope=' '.join(provider.scope.to_names(access_token.scope)),
+        )
 
         # Get the main fields for OAuth2 response.
         response_data = super(AccessTokenView, self).access_token_response_data(access_token)
@@ -147,10 +401,25 @@ class AccessTokenView(provider.oauth2.views.AccessTokenView):
     def get_id_token(self, access_token, nonce):
         """ Return an ID token for the given Access Token. """
 
-        claims_string = self.request.POST.get('claims')
-        claims_request = json.loads(claims_string) if claims_string else {}
+        try:
+            claims_request = oidc.parse_claims_request(self.request.POST.get('claims'))
+        except ValueError as exception:
+            raise OAuthError({
+                'error': 'invalid_request',
+                'error_description': str(exception)
+            })
 
-        return oidc.id_token(access_token, nonce, claims_request)
+        try:
+            return oidc.id_token(access_token, nonce, claims_request)
+        except oidc.ClaimTimeoutError as exception:
+            # The client never gets a token issued by this request, so it
+            # must not stay behind. Its refresh token is deleted with it.
+            if getattr(access_token, 'issued_by_request', False):
+                access_token.delete()
+            raise OAuthError({
+                'error': 'temporarily_unavailable',
+                'error_description': str(exception)
+            })
 
     def encode_id_token(self, id_token):
         """
@@ -181,6 +450,7 @@ class ProtectedView(View):
 
     access_token = None
     user = None
+    replica = False
 
     def dispatch(self, request, *args, **kwargs):
         error_msg = None
@@ -191,13 +461,19 @@ class ProtectedView(View):
         # Trim the Bearer portion
         token = token.replace('Bearer ', '')
 
+        # Protected views only read, so they can use the read replica, unless
+        # the token was just issued on the primary.
+        replica = use_replica_for(token)
+        self.replica = replica
+
         if token:
             # Verify token exists and is valid
-            access_token = AccessToken.objects.filter(token=token)
-            if access_token:
-                access_token = access_token[0]
-            else:
-                access_token = None
+            with use_read_replica(replica):
+                access_token = self.get_access_token(token)
+
+            # The token may not have reached the replica yet.
+            if access_token is None and replica:
+                access_token = self.get_access_token(token)
 
             if access_token is None or access_token.get_expire_delta() <= 0:
                 error_msg = 'invalid_token'
@@ -211,7 +487,59 @@ class ProtectedView(View):
         if error_msg:
             return JsonResponse({'error': error_msg}, status=401)
 
-        return super(ProtectedView, self).dispatch(request, *args, **kwargs)
+        if constants.CLIENT_QUOTAS:
+            retry_after = check_quota(self.access_token.client)
+            if retry_after is not None:
+                response = JsonResponse(QUOTA_EXCEEDED_ERROR, status=429)
+                response['Retry-After'] = str(retry_after)
+                return response
+
+        with use_read_replica(replica):
+            return super(ProtectedView, self).dispatch(request, *args, **kwargs)
+
+    def get_access_token(self, token):
+        """
+        Return the access token matching `token`, or None if it does not exist.
+
+        The token user and client are needed by every protected endpoint, so
+        they are loaded in the same query. This keeps token validation to a
+        single database round trip per request.
+
+        When `OAUTH_TOKEN_DIGEST_INDEX` is enabled, tokens are looked up with
+        their digest. Tokens missing from the digest table are only looked up
+        with the token column if `OAUTH_TOKEN_DIGEST_FALLBACK` is enabled.
+
+        """
+        queryset = AccessToken.objects.select_related('user', 'client')
+
+        if constants.TOKEN_DIGEST_INDEX:
+            access_token = AccessTokenDigest.get_access_token(token, queryset)
+            if access_token is not None or not constants.TOKEN_DIGEST_FALLBACK:
+                return access_token
+
+        return queryset.filter(token=token).first()
+
+
+class AccessTokenDetailView(provider.oauth2.views.AccessTokenDetailView):
+    """
+    Details of an access token, read from the replica as in :class:`ProtectedView`.
+
+    Tokens issued within the read-your-writes window are read from the
+    primary, and tokens missing from the replica are looked up again on the
+    primary.
+
+    """
+
+    def get(self, request, *args, **kwargs):
+        if use_replica_for(kwargs['token']):
+            with use_read_replica():
+                response = super(AccessTokenDetailView, self).get(request, *args, **kwargs)
+
+            # The token may not have reached the replica yet.
+            if response.status_code != 400:
+                return response
+
+        return super(AccessTokenDetailView, self).get(request, *args, **kwargs)
 
 
 class UserInfoView(ProtectedView):
@@ -255,20 +583,42 @@ class UserInfoView(ProtectedView):
         scope_string = request.GET.get('scope')
         scope_request = scope_string.split() if scope_string else None
 
-        claims_string = request.GET.get('claims')
-        claims_request = json.loads(claims_string) if claims_string else None
-
         if not provider.scope.check(constants.OPEN_ID_SCOPE, access_token.scope):
             return self._bad_request('Missing openid scope.')
 
         try:
+            claims_request = oidc.parse_claims_request(request.GET.get('claims'))
             claims = self.userinfo_claims(access_token, scope_request, claims_request)
         except ValueError as exception:
             return self._bad_request(str(exception))
+        except oidc.ClaimTimeoutError as exception:
+            return JsonResponse({'error': 'temporarily_unavailable', 'error_description': str(exception)}, status=503)
 
         # TODO: Encode and sign responses if requested.
 
-        response = JsonResponse(claims)
+        record_event(
+            'userinfo',
+            client_id=access_token.client.client_id,
+            user_id=access_token.user_id,
+            scope=' '.join(provider.scope.to_names(access_token.scope)),
+            claims=sorted(claims),
+        )
+
+        # Claims are serialized once, to compute a strong ETag, and only sent
+        # if the client does not already have them.
+        content = json.dumps(claims, sort_keys=True).encode('utf-8')
+        etag = '"{}"'.format(hashlib.sha1(content).hexdigest())
+
+        if etag_matches(request, etag):
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(content, content_type='application/json')
+
+        # The response may be cached by the client until the token expires.
+        max_age = max(0, min(constants.USERINFO_MAX_AGE, access_token.get_expire_delta()))
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, max-age={}'.format(max_age)
+        patch_vary_headers(response, ('Authorization',))
 
         return response
 
@@ -282,6 +632,238 @@ class UserInfoView(ProtectedView):
         return JsonResponse({'error': msg}, status=400)
 
 
+class BatchUserInfoView(ProtectedView):
+    """
+    UserInfo claims of a batch of users, for trusted clients.
+
+    Only service tokens are accepted: tokens issued to a trusted client for
+    the user owning it, as with the `client_credentials` grant. Tokens issued
+    to the client for any other user are denied.
+
+    Accepts POST requests with a `user_ids` parameter, a comma separated
+    list of user ids, and an optional `scope` parameter, as in the UserInfo
+    endpoint. Only the scopes of the access token are considered.
+
+    The response is streamed as JSON lines, one per requested user, in
+    request order. Each line holds the `user_id` and either the `claims` of
+    the user, or a `not_found` error.
+
+    """
+
+    def post(self, request, *_args, **_kwargs):
+        """ Respond to a batch UserInfo request. """
+        access_token = self.access_token
+
+        if not (self.is_service_token(access_token) and is_trusted(access_token.client)):
+            return JsonResponse({'error': 'access_denied'}, status=403)
+
+        if not provider.scope.check(constants.OPEN_ID_SCOPE, access_token.scope):
+            return self._bad_request('Missing openid scope.')
+
+        try:
+            user_ids = [int(user_id) for user_id in request.POST.get('user_ids', '').split(',') if user_id.strip()]
+        except ValueError:
+            return self._bad_request('Invalid user_ids.')
+
+        if len(user_ids) > constants.USERINFO_BATCH_MAX_SIZE:
+            return self._bad_request('Too many user_ids, the maximum is {}.'.format(constants.USERINFO_BATCH_MAX_SIZE))
+
+        scope_string = request.POST.get('scope')
+        scope_request = scope_string.split() if scope_string else None
+
+        record_event(
+            'userinfo_batch',
+            client_id=access_token.client.client_id,
+            user_id=access_token.user_id,
+            scope=' '.join(provider.scope.to_names(access_token.scope)),
+            user_ids=user_ids,
+        )
+
+        lines = self.userinfo_lines(access_token, user_ids, scope_request)
+        return StreamingHttpResponse(lines, content_type='application/x-ndjson')
+
+    def is_service_token(self, access_token):
+        """ Return whether `access_token` was issued for the user owning its client. """
+        client_user_id = access_token.client.user_id
+        return client_user_id is not None and access_token.user_id == client_user_id
+
+    def userinfo_lines(self, access_token, user_ids, scope_request):
+        """ Yield the JSON lines of the users, loading them in chunks. """
+        replica = self.replica
+
+        for start in range(0, len(user_ids), USERINFO_BATCH_CHUNK_SIZE):
+            chunk = user_ids[start:start + USERINFO_BATCH_CHUNK_SIZE]
+
+            # The response is streamed after the view returns, so the chunks
+            # set up the database routing themselves. Lines are built before
+            # yielding, to keep the routing from leaking out of the generator.
+            with use_read_replica(replica):
+                users = get_user_model().objects.in_bulk(chunk)
+                found = [users[user_id] for user_id in chunk if user_id in users]
+                claims = {
+                    user.pk: user_claims
+                    for user, user_claims in oidc.userinfo_batch(
+                        found, access_token.client, access_token.scope, scope_request
+                    )
+                }
+
+            for user_id in chunk:
+                if user_id in claims:
+                    line = {'user_id': user_id, 'claims': claims[user_id]}
+                else:
+                    line = {'user_id': user_id, 'error': 'not_found'}
+                yield json.dumps(line, sort_keys=True) + '\n'
+
+    def _bad_request(self, msg):
+        """ Return a 400 error with JSON content. """
+        return JsonResponse({'error': msg}, status=400)
+
+
+class LogoutView(TemplateView):
+    """
+    Single sign-out view.
+
+    A GET renders a confirmation page, so that the user cannot be logged out
+    by a cross-site request. Submitting it logs the user out, and renders a
+    page that loads the `logout_uri` of each client authorized during the
+    session in a hidden iframe, so that every client can clear its own
+    session. The frames load in parallel, and the user is redirected to the
+    `next` URL once all of them have loaded, or after
+    `OAUTH_OIDC_LOGOUT_TIMEOUT` seconds.
+
+    """
+
+    template_name = 'edx_oauth2_provider/logout.html'
+    confirm_template_name = 'edx_oauth2_provider/logout_confirm.html'
+
+    def get(self, request, *_args, **_kwargs):
+        return self.response_class(
+            request=request,
+            template=[self.confirm_template_name],
+            context={'next': self.get_next_url(request.GET.get('next'))},
+            using=self.template_engine,
+        )
+
+    def post(self, request, *_args, **_kwargs):
+        client_ids = request.session.get(constants.AUTHORIZED_CLIENTS_SESSION_KEY, [])
+        logout_uris = self.get_logout_uris(client_ids)
+        next_url = self.get_next_url(request.POST.get('next'))
+
+        logout(request)
+
+        return self.render_to_response({
+            'logout_uris': logout_uris,
+            'next': next_url,
+            'timeout_ms': int(constants.LOGOUT_TIMEOUT * 1000),
+        })
+
+    def get_next_url(self, next_url):
+        """ Return `next_url` if it is safe, or else the `LOGOUT_REDIRECT_URL`. """
+        if next_url and is_safe_url(next_url, allowed_hosts={self.request.get_host()}):
+            return next_url
+        return resolve_url(getattr(settings, 'LOGOUT_REDIRECT_URL', None) or '/')
+
+    def get_logout_uris(self, client_ids):
+        """
+        Return the logout URIs of the given clients, using a single query.
+
+        Only http and https URIs are returned, so a stored URI such as a
+        `javascript:` one can't run in the origin of the provider.
+
+        """
+        if not client_ids:
+            return []
+
+        logout_uris = Client.objects.filter(client_id__in=client_ids).values_list('logout_uri', flat=True)
+        return sorted(set(uri for uri in logout_uris if uri and urlparse(uri).scheme in ('http', 'https')))
+
+
+class DiscoveryView(View):
+    """
+    OpenID Connect discovery document, as described in:
+
+    - http://openid.net/specs/openid-connect-discovery-1_0.html#ProviderConfig
+
+    The document only depends on the settings and the URL configuration, so
+    it is encoded once per process, on the first request, and served with
+    an ETag and a `Cache-Control` max age of `OAUTH_OIDC_DISCOVERY_MAX_AGE`.
+
+    """
+
+    # Encoded documents and their ETags, by URL namespace.
+    documents = {}
+
+    def get(self, request, *_args, **_kwargs):
+        namespace = request.resolver_match.namespace
+        document = self.documents.get(namespace)
+
+        if document is None:
+            content = json.dumps(self.get_document(namespace), sort_keys=True).encode('utf-8')
+            document = (content, '"{}"'.format(hashlib.sha1(content).hexdigest()))
+            self.documents[namespace] = document
+
+        content, etag = document
+        if etag_matches(request, etag):
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(content, content_type='application/json')
+
+        response['ETag'] = etag
+        response['Cache-Control'] = 'public, max-age={}'.format(constants.DISCOVERY_MAX_AGE)
+        return response
+
+    def get_document(self, namespace):
+        """ Return the discovery document, with the endpoints of the views in `namespace`. """
+        issuer = urlparse(constants.OAUTH_OIDC_ISSUER)
+
+        def endpoint(name):
+            """ Return the absolute URL of a view, on the issuer host. """
+            path = reverse('{}:{}'.format(namespace, name) if namespace else name)
+            return '{}://{}{}'.format(issuer.scheme, issuer.netloc, path)
+
+        return {
+            'issuer': constants.OAUTH_OIDC_ISSUER,
+            'authorization_endpoint': endpoint('capture'),
+            'token_endpoint': endpoint('access_token'),
+            'userinfo_endpoint': endpoint('user_info'),
+            'end_session_endpoint': endpoint('logout'),
+            'jwks_uri': endpoint('jwks'),
+            'scopes_supported': [name for value, name in constants.SCOPES if value != constants.DEFAULT_SCOPE],
+            'response_types_supported': list(provider.constants.RESPONSE_TYPE_CHOICES),
+            'grant_types_supported': list(AccessTokenView.grant_types),
+            'subject_types_supported': ['public'],
+            'id_token_signing_alg_values_supported': ['HS256'],
+            'token_endpoint_auth_methods_supported': ['client_secret_basic', 'client_secret_post', 'none'],
+            'claims_supported': oidc.claims_supported(),
+            'claims_parameter_supported': True,
+        }
+
+
+class JwksView(View):
+    """
+    JSON Web Key Set of the provider, referenced by the `jwks_uri` of the discovery document.
+
+    ID tokens are signed with HS256 and the secret of their client, so the
+    provider has no public keys, and the set is empty.
+
+    """
+
+    def get(self, request, *_args, **_kwargs):  # pylint: disable=unused-argument
+        response = JsonResponse({'keys': []})
+        response['Cache-Control'] = 'public, max-age={}'.format(constants.DISCOVERY_MAX_AGE)
+        return response
+
+
+def etag_matches(request, etag):
+    """ Return whether the `If-None-Match` header of `request` matches `etag`. """
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if not if_none_match:
+        return False
+
+    etags = [value.strip() for value in if_none_match.split(',')]
+    return '*' in etags or etag in etags or 'W/' + etag in etags
+
+
 class JsonResponse(HttpResponse):
     """ Simple JSON Response wrapper. """
     def __init__(self, content, status=None, content_type='application/json'):
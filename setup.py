@@ -29,6 +29,7 @@ setup(
     install_requires=[
         'django>=1.8.7,<2.0',
         'edx-django-oauth2-provider>=1.2.1,<2.0.0',
+        'futures>=3.0.0; python_version == "2.7"',
         'PyJWT>=1.4.0,<2.0.0'
     ]
 )
@@ -25,6 +25,8 @@ DATABASES = {
 }
 
 
+DATABASE_ROUTERS = ('edx_oauth2_provider.routers.ReadReplicaRouter',)
+
 SITE_ID = 1
 
 # Make this unique, and don't share it with anybody.